@@ -1,11 +1,12 @@
 import streamlit as st
-from pdf_utils import extract_text_from_pdf
+from pdf_utils import iter_pdf_pages, build_extraction_result
 from legal_agent import (
-    summarize_notice,
-    research_support,
-    draft_final_document,
+    stream_summarize_notice,
+    summarize_notice_structured,
     create_word_document,
 )
+from llm_scheduler import set_user
+from jobs import submit_draft_job, get_job, cancel_job, queue_position
 from styles import inject_custom_css
 from ui_components import (
     render_sidebar_navigation,
@@ -13,6 +14,8 @@ from ui_components import (
     render_info_card,
     render_expandable_section,
     render_status_badge,
+    render_token_usage,
+    render_job_status,
     render_main_header,
     init_session_state,
 )
@@ -31,6 +34,44 @@ inject_custom_css()
 # Initialize session state
 init_session_state()
 
+# Queue this session's LLM calls fairly against other users'
+set_user(st.session_state.session_id)
+
+# Seconds between UI polls of a running draft job
+JOB_POLL_SECONDS = 1.0
+
+# A reconnecting tab finds its draft job through the job ID in the URL
+if st.session_state.job_id is None and "job" in st.query_params:
+    st.session_state.job_id = st.query_params["job"]
+
+draft_job = get_job(st.session_state.job_id) if st.session_state.job_id else None
+if draft_job is not None:
+    if st.session_state.notice_summary is None:
+        # New session for an existing job: restore what the job was run on
+        st.session_state.notice_summary = draft_job.notice_summary
+        st.session_state.instructions = draft_job.instructions
+        st.session_state.steps_completed.update({1, 2})
+        st.session_state.current_step = 3
+    if draft_job.status == "done" and st.session_state.get("collected_job_id") != draft_job.id:
+        st.session_state.collected_job_id = draft_job.id
+        st.session_state.research_note = draft_job.research_note
+        st.session_state.final_draft = draft_job.final_draft
+        st.session_state.current_step = 4
+        st.session_state.steps_completed.update({3, 4})
+        st.session_state.celebrate = True
+
+
+def render_running_job(job_id):
+    """Polled (as a fragment) while the draft job runs."""
+    job = get_job(job_id)
+    if job is None or not job.active:
+        # Finished: rerun the whole page so the results are picked up
+        st.rerun()
+    render_job_status(job, queue_position(job))
+    if st.button("✖ Cancel", key="cancel_draft_job"):
+        cancel_job(job_id)
+
+
 # SIDEBAR NAVIGATION
 with st.sidebar:
     render_sidebar_navigation()
@@ -81,8 +122,52 @@ with tab1:
                 help="Check this if your PDF is a scanned image"
             )
 
-            with st.spinner("📖 Reading PDF and extracting text (this may take a moment for scanned PDFs)..."):
-                extraction_result = extract_text_from_pdf(uploaded_pdf, use_ocr_first=force_ocr)
+            # Reruns (typing, ticking a box, switching tabs) reuse the
+            # extraction of this upload instead of reading every page again
+            extraction_key = st.session_state.extraction_memo.key(
+                uploaded_pdf.getvalue(), force_ocr
+            )
+            extraction_result = st.session_state.extraction_memo.get(extraction_key)
+            if extraction_result is None:
+                extraction_progress = st.progress(0.0, text="📖 Reading PDF...")
+                running_text = st.empty()
+                page_results = []
+
+                try:
+                    for page_result in iter_pdf_pages(
+                        uploaded_pdf, use_ocr_first=force_ocr, hybrid=True
+                    ):
+                        page_results.append(page_result)
+                        extraction_progress.progress(
+                            page_result['page'] / page_result['page_count'],
+                            text=(
+                                f"📖 Page {page_result['page']} of {page_result['page_count']} "
+                                f"({page_result['method']}, {page_result['seconds']:.1f}s)"
+                            ),
+                        )
+                        if page_result['text']:
+                            running_text.text(page_result['text'][-1000:])
+                    extraction_result = build_extraction_result(page_results)
+                except ValueError as e:
+                    # The PDF could not be opened
+                    extraction_result = {
+                        'success': False,
+                        'text': None,
+                        'method': None,
+                        'error': str(e)
+                    }
+                except Exception as e:
+                    # OCR (EasyOCR / torch) or MuPDF failing partway through
+                    extraction_result = {
+                        'success': False,
+                        'text': None,
+                        'method': None,
+                        'error': f'OCR error: {str(e)}'
+                    }
+
+                extraction_progress.empty()
+                running_text.empty()
+                st.session_state.extraction_memo.put(extraction_key, extraction_result)
 
             if extraction_result['success']:
                 st.session_state.pdf_text = extraction_result['text']
@@ -90,6 +175,12 @@ with tab1:
                     method_text = "PyMuPDF (text extraction)"
                 elif extraction_result['method'] == 'ocr':
                     method_text = "EasyOCR (scanned document recognition)"
+                elif extraction_result['method'] == 'hybrid':
+                    ocr_pages = extraction_result['page_methods'].count('ocr')
+                    method_text = (
+                        f"PyMuPDF + EasyOCR ({ocr_pages} of "
+                        f"{len(extraction_result['page_methods'])} pages OCR'd)"
+                    )
                 else:
                     method_text = "text extraction"
                 st.success(f"✓ Text extracted successfully\n**Method:** {method_text}")
@@ -121,11 +212,31 @@ with tab1:
         st.session_state.pdf_text = manual_text
         st.success("✓ Notice text updated")
 
+    # Off by default: the prose summary streams, the record only appears once
+    # the whole extraction call has finished
+    structured_summary = st.checkbox(
+        "Structured summary (faster research and drafting)",
+        value=False,
+        help="Extracts GSTIN, period, provisions, demands, allegations and evidence "
+             "once, and gives research and drafting that record instead of the prose. "
+             "The summary is shown when extraction finishes instead of streaming.",
+    )
+
     # Auto-summarize on upload
     if st.session_state.pdf_text and st.session_state.notice_summary is None:
-        with st.spinner("🔄 Analyzing notice and generating summary..."):
-            summary = summarize_notice(st.session_state.pdf_text)
-        st.session_state.notice_summary = summary
+        if structured_summary:
+            with st.spinner("🔄 Extracting notice details..."):
+                st.session_state.notice_summary = summarize_notice_structured(
+                    st.session_state.pdf_text
+                )
+        else:
+            live_summary = st.empty()
+            with live_summary.container():
+                st.markdown("### 🔄 Analyzing notice and generating summary...")
+                summary_stream = stream_summarize_notice(st.session_state.pdf_text)
+                st.write_stream(summary_stream)
+            live_summary.empty()
+            st.session_state.notice_summary = summary_stream.result
         st.session_state.current_step = 2
         st.session_state.steps_completed.add(1)
 
@@ -138,6 +249,7 @@ with tab1:
             content=st.session_state.notice_summary,
             icon="📋",
         )
+        render_token_usage(st.session_state.notice_summary)
 
         render_status_badge("completed", "Summarization Complete")
 
@@ -184,44 +296,36 @@ with tab3:
             "The AI will research relevant case laws and draft your legal response."
         )
 
-        if st.button("🚀 Generate Draft", type="primary", use_container_width=True):
-            # Progress indicators
-            progress_placeholder = st.empty()
-            status_placeholder = st.empty()
-            progress_bar = st.progress(0)
-
-            # Step 1: Research
-            status_placeholder.markdown(
-                "### 🔍 Step 1/2: Researching Case Laws & Provisions"
-            )
-            progress_bar.progress(10)
-
-            with st.spinner("Querying legal databases..."):
-                research_note = research_support(
-                    st.session_state.instructions, st.session_state.notice_summary
-                )
-            st.session_state.research_note = research_note
-            progress_bar.progress(50)
+        by_allegation = st.checkbox(
+            "Draft SCN reply allegation by allegation (faster for long notices)",
+            help="Answers each allegation in parallel and assembles one numbered reply.",
+        )
 
-            # Step 2: Draft
-            status_placeholder.markdown(
-                "### 📝 Step 2/2: Drafting Legal Document"
+        job_running = draft_job is not None and draft_job.active
+        if st.button(
+            "🚀 Generate Draft", type="primary", use_container_width=True, disabled=job_running
+        ):
+            # Research and drafting run in the background (see jobs); this
+            # page only polls the job, so reruns and reconnects don't stop it
+            draft_job = submit_draft_job(
+                st.session_state.session_id,
+                st.session_state.instructions,
+                st.session_state.notice_summary,
+                by_allegation=by_allegation,
             )
-            progress_bar.progress(75)
-
-            with st.spinner("Generating professional response..."):
-                final_draft = draft_final_document(
-                    st.session_state.instructions,
-                    st.session_state.notice_summary,
-                    st.session_state.research_note,
-                )
-            st.session_state.final_draft = final_draft
-            st.session_state.current_step = 4
-            st.session_state.steps_completed.add(3)
-            st.session_state.steps_completed.add(4)
-
-            progress_bar.progress(100)
-            status_placeholder.markdown("### ✅ Draft Generation Complete!")
+            st.session_state.job_id = draft_job.id
+            st.query_params["job"] = draft_job.id
+            st.session_state.research_note = None
+            st.session_state.final_draft = None
+            job_running = True
+
+        if job_running:
+            st.fragment(render_running_job, run_every=JOB_POLL_SECONDS)(draft_job.id)
+        elif draft_job is not None and draft_job.status in ("failed", "cancelled"):
+            render_job_status(draft_job)
+
+        if st.session_state.pop("celebrate", False):
+            st.markdown("### ✅ Draft Generation Complete!")
             st.balloons()
 
         st.divider()
@@ -233,6 +337,7 @@ with tab3:
                 content=st.session_state.research_note,
                 icon="🔍",
             )
+            render_token_usage(st.session_state.research_note)
 
         # Display final draft
         if st.session_state.final_draft:
@@ -241,6 +346,7 @@ with tab3:
                 content=st.session_state.final_draft,
                 icon="📝",
             )
+            render_token_usage(st.session_state.final_draft)
             render_status_badge("completed", "Draft Generation Complete")
 
 
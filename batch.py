@@ -0,0 +1,489 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import legal_agent
+import pdf_utils
+
+# ---------------------------------------------------------
+# BATCH PROCESSING OF NOTICE FOLDERS
+# ---------------------------------------------------------
+# Runs every PDF in a folder through extraction, summarize_notice and
+# (optionally) research and drafting, e.g. overnight at month end:
+#
+#     python batch.py notices/ --out summaries/ [--research] [--draft]
+#
+# Each stage has its own bounded pool and documents flow through them as a
+# pipeline, so OCR of one notice overlaps the LLM calls of others (which
+# llm_scheduler keeps under the provider limits). Every finished stage is
+# appended to a manifest in the output folder together with the PDF's
+# content hash and the options it ran with; an interrupted run started
+# again with the same arguments skips what is already done (a changed PDF,
+# or a stage whose options changed, is redone) and retries what failed.
+# The run ends with a throughput report, also saved as report.json.
+
+STAGES = ("extract", "summarize", "research", "draft")
+
+# Documents in flight per stage: extraction is CPU-bound (OCR), the LLM
+# stages mostly wait on the network
+STAGE_WORKERS = {
+    "extract": max(1, (os.cpu_count() or 2) // 2),
+    "summarize": 4,
+    "research": 2,
+    "draft": 4,
+}
+
+OUTPUT_FILES = {
+    "extract": "text.txt",
+    "summarize": "summary.md",
+    "research": "research.md",
+    "draft": "draft.md",
+}
+# Options that change a stage's output; a stage also depends on the options
+# of the stages before it, since it works from their output
+STAGE_OPTIONS = {
+    "extract": ("force_ocr",),
+    "summarize": ("structured",),
+    "research": ("instructions",),
+    "draft": ("by_allegation",),
+}
+
+RECORD_FILE = "record.json"
+MANIFEST_NAME = "manifest.jsonl"
+REPORT_NAME = "report.json"
+
+DEFAULT_INSTRUCTIONS = (
+    "Draft a reply to the show cause notice, answering every allegation on facts and on law."
+)
+
+USAGE_COUNTERS = ("input_tokens", "output_tokens", "calls", "cache_hits")
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    # Written in full before the manifest says the stage is done
+    with open(path + ".tmp", "w", encoding="utf-8") as handle:
+        handle.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def find_pdfs(folder):
+    """Relative paths of the PDFs under folder, sorted."""
+    found = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                found.append(os.path.relpath(os.path.join(root, name), folder))
+    return sorted(found)
+
+
+class Manifest:
+    """Append-only JSON-lines log of finished (and failed) stages."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line torn by the interruption is simply redone
+                        continue
+                    if entry.get("status") == "done":
+                        self._done[(entry["file"], entry["stage"])] = entry
+
+    def finished(self, name, digest, stage, options):
+        entry = self._done.get((name, stage))
+        return (
+            entry is not None
+            and entry["sha256"] == digest
+            and entry.get("options") == options
+        )
+
+    def record(self, entry):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                handle.flush()
+                os.fsync(handle.fileno())
+            if entry["status"] == "done":
+                self._done[(entry["file"], entry["stage"])] = entry
+
+
+class BatchRun:
+    """One pass over a folder; see run_batch."""
+
+    def __init__(self, folder, output_dir, stages, workers, instructions,
+                 structured, by_allegation, force_ocr, use_cache, quiet):
+        self.folder = folder
+        self.output_dir = output_dir
+        self.stages = stages
+        self.workers = workers
+        self.instructions = instructions
+        self.structured = structured
+        self.by_allegation = by_allegation
+        self.force_ocr = force_ocr
+        self.use_cache = use_cache
+        self.quiet = quiet
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest = Manifest(os.path.join(output_dir, MANIFEST_NAME))
+        self._lock = threading.Lock()
+        self._all_done = threading.Event()
+        self._pending = 0
+        self._finished = 0
+        self._total = 0
+        self.documents = []
+        self.interrupted = False
+        self.results = {stage: {"done": [], "skipped": 0, "failed": 0} for stage in stages}
+        self.usage = {key: 0 for key in USAGE_COUNTERS}
+        self.failed_documents = []
+
+    def stage_options(self, stage):
+        """Options the output of stage depends on (its own and earlier stages')."""
+        options = {}
+        for earlier in STAGES[:STAGES.index(stage) + 1]:
+            for option in STAGE_OPTIONS[earlier]:
+                options[option] = getattr(self, option)
+        return options
+
+    # -------------------------
+    # Stages
+    # -------------------------
+    def _extract(self, document):
+        with open(document["path"], "rb") as handle:
+            result = pdf_utils.extract_text_from_pdf(
+                handle, use_ocr_first=self.force_ocr, hybrid=not self.force_ocr
+            )
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+        return result["text"], {"method": result["method"]}
+
+    def _summarize(self, document):
+        summarize = (
+            legal_agent.summarize_notice_structured if self.structured
+            else legal_agent.summarize_notice
+        )
+        summary = summarize(document["extract"], use_cache=self.use_cache)
+        record = getattr(summary, "record", None)
+        record_path = os.path.join(document["output"], RECORD_FILE)
+        if record is not None:
+            _write_atomic(record_path, json.dumps(record._asdict(), ensure_ascii=False, indent=2))
+        elif os.path.exists(record_path):
+            os.remove(record_path)
+        return summary, summary.usage
+
+    def _research(self, document):
+        research = legal_agent.research_support(
+            self.instructions, document["summarize"], use_cache=self.use_cache
+        )
+        return research, research.usage
+
+    def _draft(self, document):
+        draft = (
+            legal_agent.draft_reply_by_allegation if self.by_allegation
+            else legal_agent.draft_final_document
+        )
+        result = draft(
+            self.instructions, document["summarize"], document["research"],
+            use_cache=self.use_cache,
+        )
+        return result, result.usage
+
+    def _load(self, document, stage):
+        """Output of a stage finished by an earlier run."""
+        with open(os.path.join(document["output"], OUTPUT_FILES[stage]), encoding="utf-8") as handle:
+            text = handle.read()
+        if stage != "summarize":
+            return text
+
+        summary = legal_agent.LLMText(text)
+        record_path = os.path.join(document["output"], RECORD_FILE)
+        if os.path.exists(record_path):
+            with open(record_path, encoding="utf-8") as handle:
+                summary.record = legal_agent.NoticeRecord(**json.load(handle))
+        return summary
+
+    # -------------------------
+    # Scheduling
+    # -------------------------
+    def _run_stage(self, document, index):
+        # Whatever goes wrong, a document whose next stage was not queued
+        # counts as finished, or run() would wait for it forever
+        queued_next = False
+        try:
+            queued_next = self._process(document, index)
+        except Exception as e:
+            stage = self.stages[index]
+            with self._lock:
+                self.results[stage]["failed"] += 1
+                self.failed_documents.append(
+                    {"file": document["name"], "stage": stage, "error": str(e)}
+                )
+            self._progress(document["name"], stage, f"FAILED: {e}")
+        finally:
+            if not queued_next:
+                self._document_finished()
+
+    def _process(self, document, index):
+        """Run (or resume) one stage; True if the document's next stage was queued."""
+        stage = self.stages[index]
+        name = document["name"]
+        output_path = os.path.join(document["output"], OUTPUT_FILES[stage])
+        options = self.stage_options(stage)
+
+        if (self.manifest.finished(name, document["sha256"], stage, options)
+                and os.path.exists(output_path)):
+            try:
+                document[stage] = self._load(document, stage)
+                with self._lock:
+                    self.results[stage]["skipped"] += 1
+                return self._next(document, index)
+            except (OSError, ValueError, TypeError):
+                pass  # unreadable output: run the stage again
+
+        started = time.perf_counter()
+        try:
+            output, details = getattr(self, f"_{stage}")(document)
+            _write_atomic(output_path, str(output))
+        except Exception as e:
+            seconds = time.perf_counter() - started
+            self.manifest.record({
+                "file": name, "sha256": document["sha256"], "stage": stage,
+                "options": options, "status": "failed", "seconds": round(seconds, 3),
+                "error": str(e), "finished_at": time.time(),
+            })
+            with self._lock:
+                self.results[stage]["failed"] += 1
+                self.failed_documents.append({"file": name, "stage": stage, "error": str(e)})
+            self._progress(name, stage, f"FAILED after {seconds:.1f}s: {e}")
+            return False
+
+        seconds = time.perf_counter() - started
+        document[stage] = output
+        usage = {key: details[key] for key in USAGE_COUNTERS if key in details}
+        self.manifest.record({
+            "file": name, "sha256": document["sha256"], "stage": stage,
+            "options": options, "status": "done", "seconds": round(seconds, 3),
+            "output": os.path.relpath(output_path, self.output_dir),
+            "details": {key: value for key, value in details.items()
+                        if key in USAGE_COUNTERS or key == "method"},
+            "finished_at": time.time(),
+        })
+        with self._lock:
+            self.results[stage]["done"].append(seconds)
+            for key, value in usage.items():
+                self.usage[key] += value
+        self._progress(name, stage, f"{seconds:.1f}s")
+        return self._next(document, index)
+
+    def _next(self, document, index):
+        """Queue the document's next stage; False when it has none."""
+        if self.stages[index] == "summarize":
+            # Later stages work from the summary; don't hold every notice's text
+            document.pop("extract", None)
+        if index + 1 < len(self.stages):
+            self._submit(document, index + 1)
+            return True
+        return False
+
+    def _submit(self, document, index):
+        self._executors[self.stages[index]].submit(self._run_stage, document, index)
+
+    def _document_finished(self):
+        with self._lock:
+            self._finished += 1
+            self._pending -= 1
+            if self._pending == 0:
+                self._all_done.set()
+
+    def _progress(self, name, stage, message):
+        if self.quiet:
+            return
+        with self._lock:
+            finished = self._finished
+        print(f"[{finished}/{self._total}] {stage:<9} {name}: {message}", flush=True)
+
+    def run(self):
+        documents = self.documents
+        for name in find_pdfs(self.folder):
+            path = os.path.join(self.folder, name)
+            documents.append({
+                "name": name,
+                "path": path,
+                "sha256": _file_digest(path),
+                "output": os.path.join(self.output_dir, os.path.splitext(name)[0]),
+            })
+        for document in documents:
+            os.makedirs(document["output"], exist_ok=True)
+
+        self._total = self._pending = len(documents)
+        if not documents:
+            self._all_done.set()
+
+        # Extraction threads share one in-process OCR reader; split the
+        # cores between them instead of letting each torch call use them all
+        pdf_utils.set_ocr_threads(max(1, (os.cpu_count() or 1) // self.workers["extract"]))
+
+        started = time.perf_counter()
+        self._executors = {
+            stage: ThreadPoolExecutor(
+                max_workers=self.workers[stage], thread_name_prefix=f"batch-{stage}"
+            )
+            for stage in self.stages
+        }
+        try:
+            for document in documents:
+                self._submit(document, 0)
+            # Short waits keep Ctrl+C responsive
+            while not self._all_done.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            self.interrupted = True
+            print("\nInterrupted: finishing the stages in progress; run again to resume.", flush=True)
+        finally:
+            # On Ctrl+C, queued work is dropped; stages already running finish
+            # and are recorded, so the next run resumes after them
+            for executor in self._executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        return self.report(time.perf_counter() - started)
+
+    def report(self, elapsed):
+        stages = {}
+        for stage, result in self.results.items():
+            seconds = sorted(result["done"])
+            stages[stage] = {
+                "done": len(seconds),
+                "skipped": result["skipped"],
+                "failed": result["failed"],
+                "workers": self.workers[stage],
+                "p50_seconds": seconds[len(seconds) // 2] if seconds else 0.0,
+                "p95_seconds": seconds[min(len(seconds) - 1, int(0.95 * len(seconds)))] if seconds else 0.0,
+                "busy_seconds": sum(seconds),
+            }
+
+        last = self.stages[-1]
+        completed = sum(
+            self.manifest.finished(
+                document["name"], document["sha256"], last, self.stage_options(last)
+            )
+            for document in self.documents
+        )
+        processed = len(self.results[last]["done"])
+        return {
+            "documents": self._total,
+            "completed": completed,
+            "interrupted": self.interrupted,
+            "processed_this_run": processed,
+            "failed": self.failed_documents,
+            "elapsed_seconds": elapsed,
+            "documents_per_hour": 3600 * processed / elapsed if elapsed and processed else 0.0,
+            "stages": stages,
+            "usage": dict(self.usage),
+        }
+
+
+def run_batch(folder, output_dir, research=False, draft=False, workers=None,
+              instructions=DEFAULT_INSTRUCTIONS, structured=False, by_allegation=False,
+              force_ocr=False, use_cache=True, quiet=False):
+    """
+    Process every PDF under folder, resuming from output_dir's manifest.
+
+    Args:
+        folder: Folder of notice PDFs (searched recursively)
+        output_dir: Per-notice outputs, manifest.jsonl and report.json go here
+        research: Also run research_support
+        draft: Also draft a reply (implies research)
+        workers: {stage: concurrency} overriding STAGE_WORKERS
+        instructions: Instructions given to research and drafting
+        structured: Use summarize_notice_structured
+        by_allegation: Draft with draft_reply_by_allegation
+        force_ocr: OCR every page instead of using the text layer
+
+    Returns:
+        dict: { documents, completed, interrupted, processed_this_run, failed,
+                elapsed_seconds, documents_per_hour, stages, usage }
+    """
+    stages = list(STAGES[:2])
+    if research or draft:
+        stages.append("research")
+    if draft:
+        stages.append("draft")
+
+    run = BatchRun(
+        folder, output_dir, stages, {**STAGE_WORKERS, **(workers or {})},
+        instructions, structured, by_allegation, force_ocr, use_cache, quiet,
+    )
+    report = run.run()
+    with open(os.path.join(output_dir, REPORT_NAME), "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['documents']} notices: {report['completed']} complete, "
+          f"{len(report['failed'])} failed, {report['processed_this_run']} processed this run "
+          f"in {report['elapsed_seconds']:.1f}s ({report['documents_per_hour']:.0f} notices/hour)")
+    print(f"\n{'stage':<11}{'workers':>8}{'done':>7}{'resumed':>9}{'failed':>8}"
+          f"{'p50 s':>8}{'p95 s':>8}{'busy s':>9}")
+    for stage, result in report["stages"].items():
+        print(f"{stage:<11}{result['workers']:>8}{result['done']:>7}{result['skipped']:>9}"
+              f"{result['failed']:>8}{result['p50_seconds']:>8.1f}{result['p95_seconds']:>8.1f}"
+              f"{result['busy_seconds']:>9.1f}")
+    usage = report["usage"]
+    print(f"\nTokens: {usage['input_tokens']:,} in / {usage['output_tokens']:,} out, "
+          f"{usage['calls']} call(s), {usage['cache_hits']} from cache")
+    for failure in report["failed"]:
+        print(f"FAILED {failure['file']} ({failure['stage']}): {failure['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarise (and optionally research and draft replies to) a folder of GST notices."
+    )
+    parser.add_argument("folder", help="folder of notice PDFs")
+    parser.add_argument("--out", default="batch_output", help="output folder (holds the manifest)")
+    parser.add_argument("--research", action="store_true", help="also run research")
+    parser.add_argument("--draft", action="store_true", help="also draft replies (implies --research)")
+    parser.add_argument("--instructions", default=DEFAULT_INSTRUCTIONS)
+    parser.add_argument("--structured", action="store_true", help="structured summaries")
+    parser.add_argument("--by-allegation", action="store_true", help="draft allegation by allegation")
+    parser.add_argument("--force-ocr", action="store_true")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the response cache")
+    parser.add_argument("--quiet", action="store_true", help="no per-stage progress lines")
+    for stage in STAGES:
+        parser.add_argument(
+            f"--{stage}-workers", type=int, default=STAGE_WORKERS[stage],
+            help=f"concurrent notices in the {stage} stage (default {STAGE_WORKERS[stage]})",
+        )
+    args = parser.parse_args()
+
+    report = run_batch(
+        args.folder, args.out,
+        research=args.research, draft=args.draft,
+        workers={stage: getattr(args, f"{stage}_workers") for stage in STAGES},
+        instructions=args.instructions, structured=args.structured,
+        by_allegation=args.by_allegation, force_ocr=args.force_ocr,
+        use_cache=not args.no_cache, quiet=args.quiet,
+    )
+    print_report(report)
+    raise SystemExit(1 if report["failed"] or report["interrupted"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Throughput and resumption of the batch CLI against the fake LLM server.
+
+Writes --notices text PDFs to a temporary folder and runs batch.run_batch
+over them (summaries, plus research and drafting with --draft): once
+with one notice in flight per stage, once with the default per-stage
+pools, then a resumed run over the same output folder after one PDF was
+changed, which should redo only that notice, and one with --structured,
+which should reuse every extraction and redo every summary.
+
+Usage:
+    python -m benchmarks.batch [--notices 40] [--pages 10] [--draft]
+        [--latency lognormal:0.8,0.5]
+"""
+
+import argparse
+import os
+import tempfile
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from benchmarks.pipeline import make_text_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notices", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--latency", default="lognormal:0.8,0.5")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--draft", action="store_true")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.latency, tokens_per_second=args.tokens_per_second)
+
+    # Point legal_agent at the fake server before importing it
+    os.environ["PERPLEXITY_URL"] = server.completions_url
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    workdir = tempfile.mkdtemp()
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "bench.sqlite3")
+    import batch
+
+    folder = os.path.join(workdir, "notices")
+    os.makedirs(folder)
+    for notice in range(args.notices):
+        with open(os.path.join(folder, f"notice_{notice:04d}.pdf"), "wb") as handle:
+            handle.write(make_text_pdf(args.pages, notice))
+
+    print(f"{args.notices} notices x {args.pages} pages, latency {args.latency}"
+          f"{', with research and draft' if args.draft else ''}")
+    serial = {stage: 1 for stage in batch.STAGES}
+    for label, workers, output in (
+        ("one per stage", serial, "serial"),
+        ("default pools", None, "pooled"),
+    ):
+        report = batch.run_batch(
+            folder, os.path.join(workdir, output), draft=args.draft,
+            workers=workers, use_cache=False, quiet=True,
+        )
+        print(f"\n== {label} ==")
+        batch.print_report(report)
+
+    # Change one notice, then resume the pooled run: only it is redone
+    with open(os.path.join(folder, "notice_0000.pdf"), "wb") as handle:
+        handle.write(make_text_pdf(args.pages, "changed"))
+    report = batch.run_batch(
+        folder, os.path.join(workdir, "pooled"), draft=args.draft, use_cache=False, quiet=True,
+    )
+    print("\n== resumed after changing one notice ==")
+    batch.print_report(report)
+
+    # Different summary options: extractions are reused, summaries are not
+    report = batch.run_batch(
+        folder, os.path.join(workdir, "pooled"), draft=args.draft, structured=True,
+        use_cache=False, quiet=True,
+    )
+    print("\n== resumed with --structured ==")
+    batch.print_report(report)
+
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
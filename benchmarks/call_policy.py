@@ -0,0 +1,126 @@
+"""
+Fault-injection checks of the LLM call policy against the fake server.
+
+Each scenario scripts faults into benchmarks.fake_llm_server, makes real
+ask_chatgpt / ask_perplexity calls through it (cache bypassed) and checks
+what the policy did: retries, Retry-After, deadlines, hedging and the
+circuit breaker. Backoff and cooldowns are shortened so the run is quick.
+Exits non-zero if any scenario misbehaves.
+
+Usage:
+    python -m benchmarks.call_policy
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_llm_server import FakeLLMServer
+
+
+def main():
+    server = FakeLLMServer(latency=0.01)
+
+    # Point legal_agent at the fake server before importing it
+    os.environ["PERPLEXITY_URL"] = server.completions_url
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    import legal_agent
+    import llm_policy
+
+    llm_policy.BACKOFF_BASE_SECONDS = 0.05
+    llm_policy.STAGE_DEADLINES_SECONDS["bench_short"] = 1.0
+    asks = {"openai": legal_agent.ask_chatgpt, "perplexity": legal_agent.ask_perplexity}
+    async_asks = {
+        "openai": legal_agent.ask_chatgpt_async,
+        "perplexity": legal_agent.ask_perplexity_async,
+    }
+
+    def run(provider, faults, stage=None, use_async=False):
+        server.reset()
+        server.script(*faults)
+        started = time.perf_counter()
+        try:
+            if use_async:
+                asyncio.run(async_asks[provider]("policy check", use_cache=False, stage=stage))
+            else:
+                asks[provider]("policy check", use_cache=False, stage=stage)
+            outcome = "ok"
+        except Exception as exc:
+            outcome = type(exc).__name__
+        return outcome, server.requests, time.perf_counter() - started
+
+    failures = 0
+    print(f"{'scenario':<34}{'provider':<12}{'outcome':<20}{'requests':>9}{'seconds':>9}  check")
+
+    def check(name, provider, result, expected_outcome, expected_requests, seconds_ok=lambda s: True):
+        nonlocal failures
+        outcome, requests, seconds = result
+        ok = outcome == expected_outcome and requests == expected_requests and seconds_ok(seconds)
+        failures += not ok
+        print(f"{name:<34}{provider:<12}{outcome:<20}{requests:>9}{seconds:>9.2f}  "
+              f"{'ok' if ok else 'FAILED'}")
+
+    for provider in asks:
+        llm_policy._breakers.clear()
+        check("5xx twice, then success", provider,
+              run(provider, [{"status": 503}, {"status": 502}]), "ok", 3)
+        check("429 with Retry-After: 1", provider,
+              run(provider, [{"status": 429, "retry_after": 1}]), "ok", 2,
+              lambda seconds: seconds >= 1.0)
+        check("dropped connection", provider,
+              run(provider, [{"drop": True}]), "ok", 2)
+        check("400 is not retried", provider,
+              run(provider, [{"status": 400}]), _status_error(provider), 1)
+        check("slow provider vs 1s deadline", provider,
+              run(provider, [{"delay": 3}] * 4, stage="bench_short"), "DeadlineExceeded", 1,
+              lambda seconds: seconds < 1.5)
+        check("async: 5xx, 429, then success", provider,
+              run(provider, [{"status": 503}, {"status": 429, "retry_after": 0.3}], use_async=True),
+              "ok", 3, lambda seconds: seconds >= 0.3)
+        check("async: slow vs 1s deadline", provider,
+              run(provider, [{"delay": 3}] * 4, stage="bench_short", use_async=True),
+              "DeadlineExceeded", 1, lambda seconds: seconds < 1.5)
+
+    # Hedging: build a latency history, then make the next request stall
+    llm_policy._breakers.clear()
+    llm_policy.HEDGE_REQUESTS = True
+    for provider in asks:
+        for _ in range(llm_policy.HEDGE_MIN_SAMPLES):
+            run(provider, [])
+        hedge_wins = llm_policy.policy_stats()[provider]["hedge_wins"]
+        check("stalled request is hedged", provider,
+              run(provider, [{"delay": 2}]), "ok", 2, lambda seconds: seconds < 0.5)
+        if llm_policy.policy_stats()[provider]["hedge_wins"] != hedge_wins + 1:
+            failures += 1
+            print(f"  {provider}: hedge did not win")
+    llm_policy.HEDGE_REQUESTS = False
+
+    # Circuit breaker: repeated 5xx open it, calls then fail fast, a trial closes it
+    llm_policy.BREAKER_FAILURE_THRESHOLD = 3
+    llm_policy.BREAKER_COOLDOWN_SECONDS = 0.5
+    for provider in asks:
+        llm_policy._breakers.clear()
+        check("5xx until the circuit opens", provider,
+              run(provider, [{"status": 500}] * 10), "CircuitOpenError", 3)
+        check("open circuit fails fast", provider,
+              run(provider, []), "CircuitOpenError", 0, lambda seconds: seconds < 0.05)
+        time.sleep(llm_policy.BREAKER_COOLDOWN_SECONDS)
+        check("half-open trial closes it", provider, run(provider, []), "ok", 1)
+
+    print()
+    for provider, stats in llm_policy.policy_stats().items():
+        print(provider, stats)
+    server.close()
+    sys.exit(1 if failures else 0)
+
+
+def _status_error(provider):
+    return "BadRequestError" if provider == "openai" else "HTTPError"
+
+
+if __name__ == "__main__":
+    main()
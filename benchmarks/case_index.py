@@ -0,0 +1,145 @@
+"""
+Local case-law lookups versus Perplexity round-trips for research_support.
+
+Writes a synthetic library of --judgments judgment texts (each on one of a
+handful of recurring GST issues, plus filler), builds the case_index over
+it (full and incremental rebuild timed), then measures index lookup
+latency per issue and research_support end to end with and without the
+local index against the fake LLM server. Issues the library does not
+cover still go to Perplexity, including a three-word issue whose terms all
+appear in an unrelated (e-way bill) judgment; a known issue stated with
+its amount and year stays covered.
+
+Usage:
+    python -m benchmarks.case_index [--judgments 2000] [--latency lognormal:2,0.4]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fake_llm_server import FakeLLMServer
+
+TOPICS = {
+    "Extended limitation under section 74 invoked without suppression or fraud":
+        "Section 74 extended period of limitation requires fraud, wilful misstatement "
+        "or suppression of facts; mere non-payment does not show suppression.",
+    "Input tax credit denied under section 16(4) as claimed after the due date":
+        "Input tax credit availed after the time limit in section 16(4); the proviso "
+        "inserted as section 16(5) and the time limit for claiming credit.",
+    "Input tax credit reversed because the supplier did not pay tax":
+        "Recipient denied input tax credit under section 16(2)(c) for the supplier's "
+        "default in payment of tax; bona fide purchaser with valid invoices.",
+    "Penalty under section 129 for e-way bill expiry without intent to evade":
+        "Detention under section 129 for expired e-way bill; technical breach "
+        "without intention to evade tax does not justify penalty.",
+    "Interest under section 50 demanded on the gross tax liability":
+        "Interest under section 50 is payable only on the net cash liability, "
+        "not on tax paid through the electronic credit ledger.",
+}
+UNCOVERED_ISSUE = "Classification of cloud kitchen services as restaurant service"
+# Every term appears in DECOY, which is not on the point
+VAGUE_ISSUE = "Excess ITC availed."
+DECOY = (
+    "Title: Transporter v. State of Gujarat\nCourt: High Court of Gujarat\nYear: 2021\n"
+    "Detention under section 129 for an expired e-way bill. The officer alleged excess "
+    "quantity over the invoice; the ITC availed by the buyer was not in issue.\n"
+)
+# A known issue as a notice states it, with amount and period
+SPECIFIC_ISSUE = (
+    "Interest of Rs 3,45,678 under section 50 demanded on the gross tax liability "
+    "for FY 2018-19"
+)
+FILLER = (
+    "The appellant filed the appeal against the order of the adjudicating authority. "
+    "The learned counsel submitted that the proceedings were contrary to the statute "
+    "and the principles of natural justice. "
+)
+
+
+def write_library(folder, judgments, rng):
+    topics = list(TOPICS.items())
+    for number in range(judgments):
+        title, holding = topics[number % len(topics)]
+        court = rng.choice(["High Court of Gujarat", "High Court of Delhi", "AAAR Karnataka"])
+        with open(os.path.join(folder, f"judgment_{number:05d}.txt"), "w", encoding="utf-8") as handle:
+            handle.write(f"Title: Assessee {number} v. Union of India\n")
+            handle.write(f"Court: {court}\nYear: {2018 + number % 7}\n")
+            handle.write(f"URL: https://example.org/judgments/{number}\n")
+            handle.write(FILLER * rng.randint(5, 40))
+            handle.write(f"\nIssue: {title}.\nHeld: {holding}\n")
+            handle.write(FILLER * rng.randint(5, 40))
+    with open(os.path.join(folder, "decoy.txt"), "w", encoding="utf-8") as handle:
+        handle.write(DECOY)
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--judgments", type=int, default=2000)
+    parser.add_argument("--latency", default="lognormal:2,0.4")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    library = os.path.join(workdir, "case_law")
+    os.makedirs(library)
+    write_library(library, args.judgments, random.Random(0))
+
+    server = FakeLLMServer(args.latency)
+
+    # Point legal_agent at the fake server and the benchmark index before importing it
+    os.environ["PERPLEXITY_URL"] = server.completions_url
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "bench.sqlite3")
+    os.environ["CASE_INDEX_PATH"] = os.path.join(workdir, "case_index.sqlite3")
+    import case_index
+    import legal_agent
+
+    started = time.perf_counter()
+    counts = case_index.build_index(library)
+    print(f"full build:        {time.perf_counter() - started:7.2f}s  {counts}")
+    started = time.perf_counter()
+    counts = case_index.build_index(library)
+    print(f"incremental build: {time.perf_counter() - started:7.2f}s  {counts}\n")
+
+    known = list(TOPICS) + [SPECIFIC_ISSUE]
+    issues = known + [UNCOVERED_ISSUE, VAGUE_ISSUE]
+    print(f"{'issue':<78}{'p50 ms':>8}{'p95 ms':>8}  covered")
+    for issue in issues:
+        latencies = []
+        for _ in range(20):
+            started = time.perf_counter()
+            judgments = case_index.covering_judgments(issue)
+            latencies.append(1000 * (time.perf_counter() - started))
+        print(f"{issue[:76]:<78}{percentile(latencies, 0.5):>8.1f}"
+              f"{percentile(latencies, 0.95):>8.1f}  {'yes' if judgments else 'no'}")
+
+    print(f"\nresearch_support over {len(issues)} issues, {args.runs} runs, latency {args.latency}")
+    print(f"{'':<30}{'p50 s':>8}{'max s':>8}{'calls':>7}{'local':>7}")
+    for label, use_local_index in (("perplexity only", False), ("index first", True)):
+        for scope in (issues, known):
+            scoped = "Main allegations:\n" + "\n".join(f"- {issue}" for issue in scope)
+            durations = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                result = legal_agent.research_support(
+                    "Draft a reply", scoped, use_cache=False, use_local_index=use_local_index
+                )
+                durations.append(time.perf_counter() - started)
+            name = f"{label}{'' if scope is issues else ' (all known)'}"
+            print(f"{name:<30}{percentile(durations, 0.5):>8.2f}{max(durations):>8.2f}"
+                  f"{result.usage.get('calls', 0):>7}{result.usage.get('local_issues', 0):>7}")
+
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
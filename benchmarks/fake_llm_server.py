@@ -0,0 +1,281 @@
+"""
+Local stand-in for the OpenAI and Perplexity chat-completion APIs.
+
+Answers POST .../chat/completions like the real APIs: a JSON completion,
+or server-sent-event chunks when the request has "stream": true (with a
+final usage chunk and [DONE]). Time to first token is drawn from a
+latency distribution and the reply is generated at --tokens-per-second,
+so long replies take longer, as they do for real models. New connections
+can be charged --connect-delay-ms to stand in for DNS + TCP + TLS setup.
+
+Latency distributions (seconds):
+  0.2                   fixed
+  uniform:0.1,0.5       uniform between the two
+  lognormal:0.8,0.5     log-normal with median 0.8 and sigma 0.5 (long tail)
+
+It can also be told to misbehave: a script of faults is applied to the
+next requests in order, and a background error rate applies to the rest.
+A rate limit (N requests per sliding window) answers the excess with 429
+and a Retry-After, like the real providers.
+
+A fault is a dict with any of:
+  status       HTTP status to answer with instead of 200
+  retry_after  Retry-After header (seconds) sent with that status
+  delay        seconds to wait before answering (replaces the base latency)
+  drop         close the connection without answering
+
+Usage (standalone, e.g. to point the Streamlit app at it):
+    python -m benchmarks.fake_llm_server [--port 8765] [--latency lognormal:0.8,0.5]
+        [--tokens-per-second 80] [--reply-words 300] [--error-rate 0.05]
+"""
+
+import argparse
+import json
+import math
+import random
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+REPLY_WORDS = (
+    "The noticee submits that the demand is not sustainable on facts or in "
+    "law and that the input tax credit was availed on genuine invoices"
+).split()
+
+
+def parse_latency(spec):
+    """Sampler (no arguments, returns seconds) for a latency spec; see module docstring."""
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        value = float(kind)
+        return lambda: value
+    values = [float(value) for value in params.split(",")]
+    if kind == "uniform":
+        return lambda: random.uniform(*values)
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+def _usage(prompt_tokens, completion_tokens):
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def completion_body(content="fake reply", prompt_tokens=10, completion_tokens=2):
+    return {
+        "id": "fake",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "fake",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(prompt_tokens, completion_tokens),
+    }
+
+
+def chunk_body(content=None, usage=None):
+    return {
+        "id": "fake",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "fake",
+        "choices": [] if content is None else [{
+            "index": 0,
+            "delta": {"content": content},
+            "finish_reason": None,
+        }],
+        "usage": usage,
+    }
+
+
+class FakeLLMServer:
+    """Threaded fake chat-completions server on 127.0.0.1; call close() when done."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=503, port=0,
+                 tokens_per_second=None, reply_words=2, connect_delay=0.0, rate_limit=None):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.tokens_per_second = tokens_per_second
+        self.reply_words = reply_words
+        self.connect_delay = connect_delay
+        self.rate_limit = rate_limit  # (requests, window seconds) or None
+        self.requests = 0
+        self.rate_limited = 0
+        self._recent = deque()
+        self._faults = deque()
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+            def setup(self):
+                time.sleep(fake.connect_delay)
+                # Without this, delayed ACKs add ~40 ms to every reused connection
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                super().setup()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                fake._respond(self, json.loads(body or b"{}"), fake._next_fault())
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 256  # the default of 5 drops bursts of new connections
+
+            def handle_error(self, request, client_address):
+                pass  # clients that gave up (deadlines, hedges) are expected
+
+        self._server = Server(("127.0.0.1", port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def completions_url(self):
+        return f"{self.url}/chat/completions"
+
+    def script(self, *faults):
+        """Apply these faults, in order, to the next requests."""
+        with self._lock:
+            self._faults.extend(faults)
+
+    def reset(self):
+        with self._lock:
+            self._faults.clear()
+            self._recent.clear()
+            self.requests = 0
+            self.rate_limited = 0
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _next_fault(self):
+        with self._lock:
+            self.requests += 1
+            if self._faults:
+                return self._faults.popleft()
+            if self.rate_limit:
+                limit, window = self.rate_limit
+                now = time.monotonic()
+                while self._recent and self._recent[0] <= now - window:
+                    self._recent.popleft()
+                if len(self._recent) >= limit:
+                    self.rate_limited += 1
+                    retry_after = self._recent[0] + window - now
+                    return {"status": 429, "retry_after": f"{retry_after:.2f}", "delay": 0}
+                self._recent.append(now)
+        if self.error_rate and random.random() < self.error_rate:
+            return {"status": self.error_status}
+        return {}
+
+    def _reply(self, request):
+        """Reply words and usage for a request (~4 characters per prompt token)."""
+        prompt = "".join(
+            str(message.get("content", "")) for message in request.get("messages", [])
+        )
+        words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(self.reply_words)]
+        return words, _usage(len(prompt) // 4 + 1, len(words))
+
+    def _generation_seconds(self, tokens):
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _respond(self, handler, request, fault):
+        time.sleep(fault["delay"] if "delay" in fault else self.latency())
+
+        if fault.get("drop"):
+            handler.close_connection = True
+            handler.request.shutdown(socket.SHUT_RDWR)
+            return
+
+        status = fault.get("status", 200)
+        if status == 200 and request.get("stream"):
+            self._stream(handler, request)
+            return
+
+        if status == 200:
+            words, usage = self._reply(request)
+            time.sleep(self._generation_seconds(len(words)))
+            body = completion_body(
+                " ".join(words), usage["prompt_tokens"], usage["completion_tokens"]
+            )
+        else:
+            body = {"error": {"message": f"injected {status}", "type": "fake_error"}}
+        payload = json.dumps(body).encode("utf-8")
+
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        if "retry_after" in fault:
+            handler.send_header("Retry-After", str(fault["retry_after"]))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _stream(self, handler, request):
+        words, usage = self._reply(request)
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            handler.wfile.flush()
+
+        for index, word in enumerate(words):
+            time.sleep(self._generation_seconds(1))
+            send_event(json.dumps(chunk_body(word if index == 0 else " " + word)))
+        send_event(json.dumps(chunk_body(usage=usage)))
+        send_event("[DONE]")
+        handler.wfile.write(b"0\r\n\r\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:0.8,0.5")
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--reply-words", type=int, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(
+        args.latency, args.error_rate, args.error_status, port=args.port,
+        tokens_per_second=args.tokens_per_second, reply_words=args.reply_words,
+    )
+    print(f"OPENAI_BASE_URL={server.url}")
+    print(f"PERPLEXITY_URL={server.completions_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Per-call transport overhead of the LLM helpers against a local stub server.
+
+The stub (benchmarks.fake_llm_server) answers chat-completion requests
+after --latency-ms, and sleeps --connect-delay-ms whenever a NEW
+connection is accepted to stand in for the DNS + TCP + TLS setup of the
+real APIs (plain local HTTP would otherwise make it look free). Compared:
+
+  fresh   requests.post per call, the previous ask_perplexity transport
+  pooled  ask_perplexity on the shared keep-alive session
+  async   ask_perplexity_async / ask_chatgpt_async, all calls in flight at once
+
+Usage:
+    python -m benchmarks.http_transport [--calls 20] [--latency-ms 50] [--connect-delay-ms 40]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import requests
+
+from benchmarks.fake_llm_server import FakeLLMServer
+
+def timed(label, calls, run):
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28}{elapsed:>9.2f}s{1000 * elapsed / calls:>12.1f} ms/call")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--connect-delay-ms", type=float, default=40)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(
+        latency=args.latency_ms / 1000, connect_delay=args.connect_delay_ms / 1000
+    )
+
+    # Point legal_agent at the stub before importing it
+    os.environ["PERPLEXITY_URL"] = server.completions_url
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    import legal_agent
+
+    prompts = [f"benchmark prompt {i}" for i in range(args.calls)]
+    print(f"{args.calls} calls, {args.latency_ms:.0f} ms server latency, "
+          f"{args.connect_delay_ms:.0f} ms simulated connection setup\n")
+
+    def fresh():
+        headers, _ = legal_agent._perplexity_request("")
+        for prompt in prompts:
+            _, data = legal_agent._perplexity_request(prompt)
+            response = requests.post(legal_agent.PERPLEXITY_URL, json=data, headers=headers)
+            response.raise_for_status()
+
+    def pooled():
+        for prompt in prompts:
+            legal_agent.ask_perplexity(prompt, use_cache=False)
+
+    async def concurrent(ask):
+        await asyncio.gather(*(ask(prompt, use_cache=False) for prompt in prompts))
+
+    fresh_seconds = timed("fresh connection per call", args.calls, fresh)
+    pooled_seconds = timed("pooled keep-alive (sync)", args.calls, pooled)
+    timed("async perplexity, gathered", args.calls,
+          lambda: asyncio.run(concurrent(legal_agent.ask_perplexity_async)))
+    timed("async chatgpt, gathered", args.calls,
+          lambda: asyncio.run(concurrent(legal_agent.ask_chatgpt_async)))
+
+    saved = 1000 * (fresh_seconds - pooled_seconds) / args.calls
+    print(f"\nper-call overhead removed by pooling: {saved:.1f} ms")
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Import-time budget for the Streamlit app.
+
+Runs app.py once in a fresh interpreter (Streamlit "bare" mode, no upload)
+and fails if the cold start exceeds APP_IMPORT_BUDGET_SECONDS or if any of
+the heavy OCR modules got imported along the way. The slowest imports are
+printed so a regression is easy to pin down.
+
+Usage:
+    python -m benchmarks.import_time [--budget 3.0] [--runs 3]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cold start of app.py (best of --runs) must stay under this
+APP_IMPORT_BUDGET_SECONDS = 3.0
+
+# These must only be loaded when OCR actually runs
+HEAVY_MODULES = ("easyocr", "torch", "torchvision", "cv2")
+
+_PROBE = """
+import json, logging, sys, time
+logging.disable(logging.WARNING)
+started = time.perf_counter()
+import runpy
+runpy.run_path("app.py", run_name="__main__")
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "heavy": [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe():
+    env = dict(os.environ)
+    # legal_agent builds its OpenAI client at import time
+    env.setdefault("OPENAI_API_KEY", "import-time-probe")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["importtime"] = completed.stderr
+    return result
+
+
+def slowest_imports(importtime_log, limit=10):
+    """Parse `-X importtime` output into top-level (cumulative_us, module), slowest first."""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line.split("|", 2)
+        if module.startswith("  "):
+            continue  # nested import, already counted in its parent
+        rows.append((int(cumulative_us), module.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=float, default=APP_IMPORT_BUDGET_SECONDS)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    results = [run_probe() for _ in range(args.runs)]
+    best = min(results, key=lambda result: result["seconds"])
+
+    print(f"app.py cold start: {best['seconds']:.2f}s (best of {args.runs}, budget {args.budget:.2f}s)")
+    print("slowest imports (cumulative):")
+    for cumulative_us, module in slowest_imports(best["importtime"]):
+        print(f"  {cumulative_us / 1e6:7.3f}s  {module}")
+
+    failures = []
+    if best["seconds"] > args.budget:
+        failures.append(f"cold start {best['seconds']:.2f}s is over the {args.budget:.2f}s budget")
+    if best["heavy"]:
+        failures.append(f"heavy OCR modules imported at startup: {', '.join(best['heavy'])}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
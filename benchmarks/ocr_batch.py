@@ -0,0 +1,56 @@
+"""
+Throughput of per-page vs batched OCR on a multi-page scanned fixture.
+
+Every batch size is checked against the per-page output, so the table
+only reports a speed-up when the extracted text is identical. The cache
+is bypassed so every run does real OCR work.
+
+Usage:
+    python -m benchmarks.ocr_batch [--pages 16] [--batch-sizes 2 4 8]
+"""
+
+import argparse
+import time
+
+import fitz  # PyMuPDF
+
+import pdf_utils
+from benchmarks.ocr_render import PAGE_SIZES, make_scanned_pdf
+
+
+def run(pdf_document, batch_size):
+    page_numbers = list(range(pdf_document.page_count))
+    started = time.perf_counter()
+    texts = pdf_utils._ocr_pages(
+        pdf_document, None, page_numbers, use_cache=False, batch_size=batch_size
+    )
+    return time.perf_counter() - started, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=16)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+
+    pdf_document = fitz.open(
+        stream=make_scanned_pdf(PAGE_SIZES["A4"], args.pages), filetype="pdf"
+    )
+
+    # Load the reader up front so model start-up is not billed to the first run
+    pdf_utils.get_ocr_reader()
+
+    baseline_seconds, baseline_texts = run(pdf_document, None)
+    print(f"{'batch':>6}{'seconds':>10}{'pages/s':>10}{'speed-up':>10}  identical")
+    print(f"{1:>6}{baseline_seconds:>10.2f}{args.pages / baseline_seconds:>10.2f}{1.0:>10.2f}  -")
+
+    for batch_size in args.batch_sizes:
+        seconds, texts = run(pdf_document, batch_size)
+        print(
+            f"{batch_size:>6}{seconds:>10.2f}{args.pages / seconds:>10.2f}"
+            f"{baseline_seconds / seconds:>10.2f}  {texts == baseline_texts}"
+        )
+
+
+if __name__ == "__main__":
+    main()
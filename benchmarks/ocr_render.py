@@ -0,0 +1,143 @@
+"""
+Benchmark the OCR page handoff: the old fixed-scale RGB PPM encode/decode
+path against the zero-copy grayscale array path with adaptive resolution.
+
+Synthetic "scanned" A4 and US-legal pages (a full-page raster image with
+no text layer) are rendered repeatedly by each path in a fresh process so
+that peak RSS can be compared.
+
+Usage:
+    python -m benchmarks.ocr_render [--pages 20] [--ocr]
+
+--ocr also runs EasyOCR on the result, which is slow but shows end-to-end
+time; without it only the render/handoff stage is measured.
+"""
+
+import argparse
+import multiprocessing
+import resource
+import time
+from io import BytesIO
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+PAGE_SIZES = {
+    "A4": fitz.paper_rect("a4"),
+    "legal": fitz.paper_rect("legal"),
+}
+
+SAMPLE_TEXT = (
+    "SHOW CAUSE NOTICE UNDER SECTION 73(1) OF THE CGST ACT, 2017\n"
+    "Whereas M/s Example Traders (GSTIN 27AAAAA0000A1Z5) has availed input tax "
+    "credit in excess of that reflected in GSTR-2A for the period 2019-20 ..."
+)
+
+
+def make_scanned_pdf(page_rect, pages):
+    """Build a PDF whose pages are 200 dpi raster images of typed text."""
+    source = fitz.open()
+    page = source.new_page(width=page_rect.width, height=page_rect.height)
+    page.insert_textbox(page_rect + (48, 48, -48, -48), SAMPLE_TEXT * 12, fontsize=10)
+    scan = page.get_pixmap(dpi=200, colorspace=fitz.csRGB).tobytes("png")
+
+    document = fitz.open()
+    for _ in range(pages):
+        scanned_page = document.new_page(width=page_rect.width, height=page_rect.height)
+        scanned_page.insert_image(page_rect, stream=scan)
+    return document.tobytes()
+
+
+def legacy_handoff(page):
+    """Pre-change path: fixed 1.3x RGB render, PPM encode, decode for OCR."""
+    pix = page.get_pixmap(matrix=fitz.Matrix(1.3, 1.3))
+    img_bytes = pix.tobytes("ppm")
+    return np.array(Image.open(BytesIO(img_bytes)))
+
+
+def array_handoff(page):
+    """New path: adaptive-scale grayscale render viewed as a numpy array."""
+    from pdf_utils import render_page_array
+
+    array, pix = render_page_array(page)
+    return array
+
+
+def _reset_peak_rss():
+    """Reset the kernel's high-water mark (Linux only); return the baseline in KB."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+    return _peak_rss_kb()
+
+
+def _peak_rss_kb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run(variant, pdf_bytes, with_ocr, queue):
+    import pdf_utils  # noqa: F401  (import cost is not part of the measurement)
+
+    handoff = legacy_handoff if variant == "legacy" else array_handoff
+    reader = None
+    if with_ocr:
+        import easyocr
+        reader = easyocr.Reader(["en"], verbose=False)
+
+    document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    baseline_kb = _reset_peak_rss()
+
+    started = time.perf_counter()
+    pixels = 0
+    for page in document:
+        image = handoff(page)
+        pixels += image.size
+        if reader is not None:
+            reader.readtext(image, detail=0)
+        del image
+    elapsed = time.perf_counter() - started
+
+    peak_kb = _peak_rss_kb()
+    queue.put((elapsed, max(peak_kb - baseline_kb, 0), pixels))
+
+
+def measure(variant, pdf_bytes, with_ocr):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(variant, pdf_bytes, with_ocr, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--ocr", action="store_true", help="also run EasyOCR")
+    args = parser.parse_args()
+
+    print(f"{'size':<7}{'path':<8}{'seconds':>10}{'ms/page':>10}{'peak MB':>10}{'Mpx':>8}")
+    for size_name, page_rect in PAGE_SIZES.items():
+        pdf_bytes = make_scanned_pdf(page_rect, args.pages)
+        for variant in ("legacy", "array"):
+            elapsed, peak_kb, pixels = measure(variant, pdf_bytes, args.ocr)
+            print(
+                f"{size_name:<7}{variant:<8}{elapsed:>10.2f}"
+                f"{1000 * elapsed / args.pages:>10.1f}"
+                f"{peak_kb / 1024:>10.1f}{pixels / 1e6:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Wall-clock time of one-shot vs allegation-by-allegation SCN reply drafting.
+
+ask_chatgpt is replaced by a simulated model whose latency is a fixed
+time-to-first-token plus output length over a generation rate, which is
+what dominates real drafting calls. Sleeps are shortened by --time-scale
+and the reported seconds scaled back up, so the run is quick. Both modes
+produce the same amount of reply text; the parallel mode also pays for the
+allegation listing call.
+
+Usage:
+    python -m benchmarks.parallel_draft [--allegations 10] [--tokens-per-second 100]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fake_llm_server import FakeLLMServer
+
+# Simulated output length (tokens) of each part of the reply
+ANSWER_TOKENS = 600
+FRAME_TOKENS = 250
+
+
+def simulated_chatgpt(allegations, first_token_seconds, tokens_per_second, time_scale):
+    from legal_agent import LLMText
+
+    def ask_chatgpt(prompt, use_cache=True, stage=None):
+        if "JSON array" in prompt:
+            text = json.dumps([f"Allegation {index}" for index in range(1, allegations + 1)])
+            output_tokens = 20 * allegations
+        elif "YOUR PART" in prompt:
+            output_tokens = ANSWER_TOKENS if "allegation only" in prompt else FRAME_TOKENS
+            text = "Submission. " * (output_tokens // 2)
+        else:
+            output_tokens = ANSWER_TOKENS * allegations + 2 * FRAME_TOKENS
+            text = "Submission. " * (output_tokens // 2)
+
+        time.sleep((first_token_seconds + output_tokens / tokens_per_second) * time_scale)
+        return LLMText(text, {"input_tokens": 0, "output_tokens": output_tokens, "calls": 1})
+
+    return ask_chatgpt
+
+
+def timed(time_scale, draft, *args):
+    started = time.perf_counter()
+    result = draft(*args)
+    return (time.perf_counter() - started) / time_scale, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--allegations", type=int, default=10)
+    parser.add_argument("--first-token-seconds", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=100)
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    args = parser.parse_args()
+
+    # ask_chatgpt is simulated, but point legal_agent at the fake server
+    # before importing it so no call can leave the machine
+    server = FakeLLMServer(latency=0.01)
+    os.environ["PERPLEXITY_URL"] = server.completions_url
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    import legal_agent
+
+    legal_agent.ask_chatgpt = simulated_chatgpt(
+        args.allegations, args.first_token_seconds, args.tokens_per_second, args.time_scale
+    )
+    inputs = ("Draft a reply to the SCN", "Summary of the notice", "Research note")
+
+    single_seconds, single = timed(args.time_scale, legal_agent.draft_final_document, *inputs)
+    parallel_seconds, parallel = timed(args.time_scale, legal_agent.draft_reply_by_allegation, *inputs)
+
+    print(f"{args.allegations} allegations, "
+          f"{args.tokens_per_second:.0f} tokens/s, {args.first_token_seconds}s to first token\n")
+    print(f"{'mode':<24}{'seconds':>10}{'calls':>8}{'out tokens':>12}")
+    for name, seconds, result in (
+        ("one-shot", single_seconds, single),
+        ("by allegation", parallel_seconds, parallel),
+    ):
+        print(f"{name:<24}{seconds:>10.2f}{result.usage['calls']:>8}"
+              f"{result.usage['output_tokens']:>12}")
+    print(f"\nspeed-up: {single_seconds / parallel_seconds:.1f}x")
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+End-to-end latency of the legal_agent pipeline against the fake LLM server.
+
+Each matter runs the full app flow on its own text PDF: extraction,
+summarize_notice, research_support and draft_final_document. --matters
+matters run through a pool of --concurrency workers, once per
+concurrency level, and every stage reports p50 / p95 / p99 latency plus
+overall throughput. No real API is called and the response cache is
+bypassed, so numbers only move when the code (or the fake's latency
+model) does.
+
+--stream uses the streaming summary and draft calls the UI uses and adds
+time-to-first-chunk rows. --scanned uses raster-only pages (needs
+EasyOCR) instead of a text layer.
+
+Usage:
+    python -m benchmarks.pipeline [--matters 20] [--concurrency 1 4 8]
+        [--latency lognormal:0.8,0.5] [--tokens-per-second 80] [--error-rate 0]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import fitz  # PyMuPDF
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from benchmarks.ocr_render import PAGE_SIZES, SAMPLE_TEXT, make_scanned_pdf
+
+STAGES = ("extract", "summarize", "research", "draft")
+
+
+def make_text_pdf(pages, matter):
+    """A notice with a text layer; the matter number keeps every prompt unique."""
+    page_rect = PAGE_SIZES["A4"]
+    document = fitz.open()
+    for page_number in range(pages):
+        page = document.new_page(width=page_rect.width, height=page_rect.height)
+        page.insert_textbox(
+            page_rect + (48, 48, -48, -48),
+            f"Matter {matter}, page {page_number + 1}\n" + SAMPLE_TEXT * 10,
+            fontsize=10,
+        )
+    return document.tobytes()
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def run_matter(legal_agent, pdf_utils, pdf_bytes, stream):
+    """Run one matter; returns {stage: seconds}."""
+    timings = {}
+
+    started = time.perf_counter()
+    extraction = pdf_utils.extract_text_from_pdf(BytesIO(pdf_bytes), use_cache=False)
+    timings["extract"] = time.perf_counter() - started
+    if not extraction["success"]:
+        raise RuntimeError(extraction["error"])
+
+    def timed_stream(stage, llm_stream):
+        started = time.perf_counter()
+        for _ in llm_stream:
+            timings.setdefault(f"{stage} (first chunk)", time.perf_counter() - started)
+        timings[stage] = time.perf_counter() - started
+        return llm_stream.result
+
+    instructions = "Draft a reply to the show cause notice"
+    if stream:
+        summary = timed_stream(
+            "summarize",
+            legal_agent.stream_summarize_notice(extraction["text"], use_cache=False),
+        )
+    else:
+        started = time.perf_counter()
+        summary = legal_agent.summarize_notice(extraction["text"], use_cache=False)
+        timings["summarize"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    research = legal_agent.research_support(instructions, summary, use_cache=False)
+    timings["research"] = time.perf_counter() - started
+
+    if stream:
+        timed_stream(
+            "draft",
+            legal_agent.stream_draft_final_document(
+                instructions, summary, research, use_cache=False
+            ),
+        )
+    else:
+        started = time.perf_counter()
+        legal_agent.draft_final_document(instructions, summary, research, use_cache=False)
+        timings["draft"] = time.perf_counter() - started
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--matters", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--latency", default="lognormal:0.8,0.5")
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--reply-words", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--scanned", action="store_true")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(
+        args.latency, args.error_rate,
+        tokens_per_second=args.tokens_per_second, reply_words=args.reply_words,
+    )
+
+    # Point legal_agent at the fake server before importing it
+    os.environ["PERPLEXITY_URL"] = server.completions_url
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    import legal_agent
+    import pdf_utils
+
+    if args.scanned:
+        scanned = make_scanned_pdf(PAGE_SIZES["A4"], args.pages)
+        pdfs = [scanned] * args.matters
+    else:
+        pdfs = [make_text_pdf(args.pages, matter) for matter in range(args.matters)]
+
+    print(f"{args.matters} matters x {args.pages} pages, latency {args.latency}, "
+          f"{args.tokens_per_second:.0f} tokens/s, {args.reply_words} words per reply, "
+          f"error rate {args.error_rate:.0%}{', streamed' if args.stream else ''}\n")
+    print(f"{'workers':>7}  {'stage':<26}{'p50':>8}{'p95':>8}{'p99':>8}")
+
+    for concurrency in args.concurrency:
+        started = time.perf_counter()
+        results, errors = [], 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(run_matter, legal_agent, pdf_utils, pdf_bytes, args.stream)
+                for pdf_bytes in pdfs
+            ]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception:
+                    errors += 1
+        elapsed = time.perf_counter() - started
+
+        stages = [name for stage in STAGES for name in (stage, f"{stage} (first chunk)")]
+        for stage in stages:
+            values = [timings[stage] for timings in results if stage in timings]
+            if values:
+                print(f"{concurrency:>7}  {stage:<26}"
+                      f"{percentile(values, 0.5):>8.2f}{percentile(values, 0.95):>8.2f}"
+                      f"{percentile(values, 0.99):>8.2f}")
+        totals = [sum(timings[stage] for stage in STAGES) for timings in results]
+        if totals:
+            print(f"{concurrency:>7}  {'end to end':<26}"
+                  f"{percentile(totals, 0.5):>8.2f}{percentile(totals, 0.95):>8.2f}"
+                  f"{percentile(totals, 0.99):>8.2f}")
+        print(f"{'':>7}  {len(results)} done, {errors} failed in {elapsed:.1f}s "
+              f"({60 * len(results) / elapsed:.1f} matters/min)\n")
+
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
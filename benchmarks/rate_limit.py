@@ -0,0 +1,123 @@
+"""
+429s, throughput and fairness with and without the request scheduler.
+
+The fake server enforces a rate limit (default 10 requests per second)
+and answers the excess with 429 + Retry-After. One heavy user fires a
+burst of --heavy requests from many threads while --light-users users
+send a few requests each. Run once with llm_scheduler's limits disabled
+(only llm_policy's retries, as before the scheduler) and once with the
+scheduler set to the server's limit.
+
+Usage:
+    python -m benchmarks.rate_limit [--heavy 60] [--light-users 2] [--limit 10]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_llm_server import FakeLLMServer
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))] if ordered else 0.0
+
+
+def run(legal_agent, llm_scheduler, server, args):
+    server.reset()
+    latencies, failures = {}, {}
+    max_depth = [0]
+    done = threading.Event()
+
+    def watch_queue():
+        while not done.wait(0.05):
+            depth = llm_scheduler.scheduler("openai").stats()["queue_depth"]
+            max_depth[0] = max(max_depth[0], depth)
+
+    def request(user, index):
+        llm_scheduler.set_user(user)
+        started = time.perf_counter()
+        try:
+            legal_agent.ask_chatgpt(f"{user} request {index} {time.time()}", use_cache=False)
+            latencies.setdefault(user, []).append(time.perf_counter() - started)
+        except Exception:
+            failures[user] = failures.get(user, 0) + 1
+
+    jobs = [("heavy", index) for index in range(args.heavy)]
+    jobs += [
+        (f"light-{user}", index)
+        for index in range(args.light_requests)
+        for user in range(1, args.light_users + 1)
+    ]
+
+    watcher = threading.Thread(target=watch_queue, daemon=True)
+    watcher.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        for user, index in jobs:
+            executor.submit(request, user, index)
+    elapsed = time.perf_counter() - started
+    done.set()
+
+    completed = sum(len(values) for values in latencies.values())
+    light = [value for user, values in latencies.items() if user != "heavy" for value in values]
+    return {
+        "429s": server.rate_limited,
+        "failed": sum(failures.values()),
+        "req/s": completed / elapsed,
+        "heavy p50": percentile(latencies.get("heavy", []), 0.5),
+        "light p50": percentile(light, 0.5),
+        "light max": max(light, default=0.0),
+        "max queue": max_depth[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--heavy", type=int, default=60)
+    parser.add_argument("--light-users", type=int, default=2)
+    parser.add_argument("--light-requests", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=10, help="requests per second")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=0.05, rate_limit=(args.limit, 1.0))
+
+    # Point legal_agent at the fake server before importing it
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    import legal_agent
+    import llm_policy
+    import llm_scheduler
+
+    llm_policy.BACKOFF_BASE_SECONDS = 0.25
+    llm_scheduler.BUCKET_BURST_SECONDS = 1
+
+    print(f"{args.heavy} heavy + {args.light_users}x{args.light_requests} light requests, "
+          f"server limit {args.limit}/s\n")
+    columns = ("429s", "failed", "req/s", "heavy p50", "light p50", "light max", "max queue")
+    print(f"{'':<12}" + "".join(f"{column:>11}" for column in columns))
+
+    pause = llm_scheduler.pause
+    for label, rpm in (("unscheduled", 0), ("scheduled", args.limit * 60)):
+        llm_scheduler.PROVIDER_LIMITS["openai"] = {"rpm": rpm, "tpm": 0}
+        # Unscheduled also means no shared pause after a 429
+        llm_scheduler.pause = pause if rpm else (lambda provider, seconds: None)
+        llm_policy._breakers.clear()
+        result = run(legal_agent, llm_scheduler, server, args)
+        print(f"{label:<12}" + "".join(
+            f"{result[column]:>11.2f}" if isinstance(result[column], float)
+            else f"{result[column]:>11}"
+            for column in columns
+        ))
+
+    print("\nscheduler:", llm_scheduler.scheduler_stats()["openai"])
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
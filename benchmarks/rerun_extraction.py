@@ -0,0 +1,125 @@
+"""
+Cost of a Streamlit rerun with a scanned notice uploaded, with and without
+the per-session extraction memo.
+
+Each rerun of app.py used to extract the upload again: every page is
+re-opened, and OCR text comes back from the page cache at best (or from
+EasyOCR when the cache is off or evicted). With the memo a rerun hashes
+the upload and looks the result up. Also times flipping force OCR on a
+text-layer PDF: the first flip extracts once, flipping back is a lookup.
+The extraction cache is pointed at a temporary file.
+
+OCR runs on the real EasyOCR reader. Where EasyOCR (and torch) are not
+installed, --fake-ocr SECONDS swaps in a reader that spends that long per
+page and returns fixed boxes, so the uncached numbers reflect an assumed
+OCR rate rather than a measured one.
+
+Usage:
+    python -m benchmarks.rerun_extraction [--pages 50] [--reruns 5] [--fake-ocr 2.0]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from benchmarks.ocr_render import PAGE_SIZES, make_scanned_pdf
+from benchmarks.pipeline import make_text_pdf
+
+
+class FakeOCRReader:
+    """Stands in for easyocr.Reader: sleeps per page, returns detail=1 boxes."""
+
+    def __init__(self, seconds_per_page):
+        self.seconds_per_page = seconds_per_page
+
+    def readtext(self, image, detail=1):
+        time.sleep(self.seconds_per_page)
+        height, width = image.shape[:2]
+        lines = [f"Scanned notice line {number} of the page" for number in range(30)]
+        boxes = []
+        for number, line in enumerate(lines):
+            top = height * (0.15 + 0.023 * number)
+            corners = [[0, top], [width, top], [width, top + 12], [0, top + 12]]
+            boxes.append((corners, line, 0.9) if detail else line)
+        return boxes
+
+    def readtext_batched(self, images, detail=1):
+        return [self.readtext(image, detail) for image in images]
+
+
+def extract(pdf_utils, pdf_bytes, force_ocr, use_cache=True):
+    """What app.py runs for an upload (without the progress widgets)."""
+    return pdf_utils.build_extraction_result(list(pdf_utils.iter_pdf_pages(
+        BytesIO(pdf_bytes), use_ocr_first=force_ocr, hybrid=True, use_cache=use_cache,
+    )))
+
+
+def memoized(pdf_utils, memo, pdf_bytes, force_ocr):
+    key = memo.key(pdf_bytes, force_ocr)
+    result = memo.get(key)
+    if result is None:
+        result = extract(pdf_utils, pdf_bytes, force_ocr)
+        memo.put(key, result)
+    return result
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument(
+        "--fake-ocr", type=float, metavar="SECONDS",
+        help="use a fake OCR reader taking SECONDS per page instead of EasyOCR",
+    )
+    args = parser.parse_args()
+
+    os.environ["EXTRACTION_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "extraction.sqlite3")
+    import pdf_utils
+
+    if args.fake_ocr is not None:
+        pdf_utils._load_ocr_reader = lambda: FakeOCRReader(args.fake_ocr)
+
+    scanned = make_scanned_pdf(PAGE_SIZES["A4"], args.pages)
+    pdf_utils.get_ocr_reader()
+
+    ocr = f"fake OCR at {args.fake_ocr}s/page" if args.fake_ocr is not None else "EasyOCR"
+    print(f"{args.pages}-page scanned upload, {args.reruns} reruns each, {ocr}\n")
+    first = timed(extract, pdf_utils, scanned, False)
+    print(f"{'first extraction (OCR)':<40}{first:>10.3f}s")
+
+    rows = (
+        ("rerun, no memo, page cache off", lambda: extract(pdf_utils, scanned, False, False)),
+        ("rerun, no memo, page cache warm", lambda: extract(pdf_utils, scanned, False)),
+    )
+    for label, run in rows:
+        seconds = min(timed(run) for _ in range(args.reruns))
+        print(f"{label:<40}{seconds:>10.3f}s")
+
+    memo = pdf_utils.ExtractionMemo()
+    memoized(pdf_utils, memo, scanned, False)
+    seconds = min(timed(memoized, pdf_utils, memo, scanned, False) for _ in range(args.reruns))
+    print(f"{'rerun, memo':<40}{seconds:>10.3f}s")
+
+    print(f"\n{args.pages}-page text upload, force OCR flipped")
+    text_pdf = make_text_pdf(args.pages, 0)
+    memo = pdf_utils.ExtractionMemo()
+    for label, force_ocr in (
+        ("extract (text layer)", False),
+        ("force OCR on (extracts once)", True),
+        ("force OCR off again (memo)", False),
+        ("force OCR on again (memo)", True),
+    ):
+        seconds = timed(memoized, pdf_utils, memo, text_pdf, force_ocr)
+        print(f"{label:<40}{seconds:>10.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Statute reference detection on the text of a long notice.
+
+Builds a --pages page text PDF, extracts it with extract_text_from_pdf
+(as the app does) and times statutes.detect_provisions over the result,
+then lists what was found and how it resolved against the local
+provisions table. Pass --pdf to run on a real notice instead.
+
+Usage:
+    python -m benchmarks.statutes [--pages 500] [--repeat 5] [--pdf notice.pdf]
+"""
+
+import argparse
+import time
+from io import BytesIO
+
+import fitz  # PyMuPDF
+
+from benchmarks.ocr_render import PAGE_SIZES
+
+NOTICE_PAGE = (
+    "SHOW CAUSE NOTICE UNDER SECTION 73(1) OF THE CGST ACT, 2017 read with Section 20 "
+    "of the IGST Act, 2017.\n"
+    "Whereas M/s Example Traders (GSTIN 27AAAAA0000A1Z5) has availed input tax credit "
+    "in excess of that reflected in GSTR-2A for the period 2019-20, in contravention of "
+    "Sections 16(2)(c) and 16(4) of the Central Goods and Services Tax Act, 2017 read "
+    "with Rule 36(4) of the CGST Rules, 2017 and Circular No. 183/15/2022-GST.\n"
+    "Interest is payable u/s 50 and penalty is proposed under Section 122(2)(a); the "
+    "period of limitation is extended by Notification No. 13/2022-Central Tax.\n"
+)
+
+
+def make_notice_pdf(pages):
+    page_rect = PAGE_SIZES["A4"]
+    document = fitz.open()
+    for page_number in range(pages):
+        page = document.new_page(width=page_rect.width, height=page_rect.height)
+        page.insert_textbox(
+            page_rect + (48, 48, -48, -48),
+            f"Page {page_number + 1}\n" + NOTICE_PAGE * 6,
+            fontsize=9,
+        )
+    return document.tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pdf")
+    args = parser.parse_args()
+
+    import pdf_utils
+    import statutes
+
+    if args.pdf:
+        with open(args.pdf, "rb") as handle:
+            pdf_bytes = handle.read()
+    else:
+        pdf_bytes = make_notice_pdf(args.pages)
+
+    started = time.perf_counter()
+    extraction = pdf_utils.extract_text_from_pdf(BytesIO(pdf_bytes), use_cache=False)
+    extract_seconds = time.perf_counter() - started
+    if not extraction["success"]:
+        raise SystemExit(extraction["error"])
+    text = extraction["text"]
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        provisions = statutes.detect_provisions(text)
+        timings.append(time.perf_counter() - started)
+
+    print(f"{len(extraction['page_methods'])} pages, {len(text) / 1e6:.2f} MB of text "
+          f"(extracted in {extract_seconds:.2f}s)")
+    print(f"detect_provisions: best {1000 * min(timings):.1f} ms, "
+          f"worst {1000 * max(timings):.1f} ms over {args.repeat} runs\n")
+    for provision in provisions:
+        print(f"{provision.count:>6}  {provision.citation:<42}"
+              f"{'table' if provision.text else 'not in table'}")
+
+
+if __name__ == "__main__":
+    main()
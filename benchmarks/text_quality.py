@@ -0,0 +1,123 @@
+"""
+Garbled text-layer detection on clean and broken page fixtures.
+
+Scores a set of synthetic pages with text_quality: clean notice prose, a
+tabular invoice annexure (GSTINs, invoice numbers, dates, amounts; a
+perfect text layer with almost no dictionary words), a Hindi page, and
+broken encodings (letters shifted by a fixed offset, glyphs mapped to
+symbols, UTF-8 read as cp1252). Each verdict is checked against the
+expected one, so a routing regression (e.g. annexures sent to OCR) fails
+the run, and the per-page cost is timed.
+
+Usage:
+    python -m benchmarks.text_quality [--repeat 200]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from text_quality import text_quality
+
+PROSE = (
+    "Whereas it appears that the taxpayer registered under GSTIN 24AAACB1234C1Z5 "
+    "has availed input tax credit on invoices issued by a supplier whose "
+    "registration was cancelled from the date of its registration. The credit "
+    "so availed is not admissible under section 16 of the Central Goods and "
+    "Services Tax Act, 2017, and is liable to be reversed along with interest "
+    "under section 50 and penalty under section 74 of the said Act. You are "
+    "hereby called upon to show cause within thirty days of the receipt of this "
+    "notice as to why the amount mentioned above should not be demanded.\n"
+)
+
+HINDI = (
+    "यह कारण बताओ सूचना केंद्रीय माल और सेवा कर अधिनियम की धारा 74 के अंतर्गत जारी "
+    "की जाती है। करदाता द्वारा लिया गया इनपुट टैक्स क्रेडिट स्वीकार्य नहीं है और "
+    "ब्याज सहित वसूल किया जाना है।\n"
+)
+
+
+SUPPLIERS = [
+    "Shree Ganesh Traders Pvt. Ltd.", "Balaji Enterprises", "Om Sai Steel Corporation",
+    "Krishna Polymers LLP", "Mahalaxmi Agencies", "Rathi Iron Works",
+]
+
+
+def annexure_page(rng, rows=40, header=True):
+    lines = []
+    if header:
+        lines += ["Annexure-B", "Sr. Supplier GSTIN Invoice No. Date Taxable Value IGST CGST SGST"]
+    for number in range(1, rows + 1):
+        state = rng.randint(1, 37)
+        pan = "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ") for _ in range(5))
+        value = rng.randint(10_000, 9_000_000)
+        lines.append(
+            f"{number} M/s {rng.choice(SUPPLIERS)} {state:02d}{pan}{rng.randint(1000, 9999)}"
+            f"{rng.choice('ABCDEFGH')}1Z{rng.randint(1, 9)} INV/{number:03d}/18-19 {rng.randint(1, 28):02d}/"
+            f"{rng.randint(1, 12):02d}/2018 {value:,}.00 0.00 {value * 0.09:,.2f} {value * 0.09:,.2f}"
+        )
+    lines.append("Total 12,34,56,789.00 0.00 1,11,11,111.01 1,11,11,111.01")
+    return "\n".join(lines)
+
+
+def shifted(text, offset=3):
+    def shift(char):
+        if "a" <= char <= "z":
+            return chr((ord(char) - 97 + offset) % 26 + 97)
+        if "A" <= char <= "Z":
+            return chr((ord(char) - 65 + offset) % 26 + 65)
+        return char
+    return "".join(shift(char) for char in text)
+
+
+def symbol_mapped(text):
+    table = str.maketrans("aeiostn", "#$%&*@!")
+    return text.translate(table)
+
+
+def mojibake(text):
+    return text.replace("e", "é").replace("'", "’").encode("utf-8").decode("cp1252", "replace")
+
+
+def fixtures():
+    rng = random.Random(0)
+    return [
+        ("notice prose", PROSE * 4, True),
+        ("invoice annexure", annexure_page(rng), True),
+        ("annexure, short", annexure_page(rng, rows=6), True),
+        ("annexure, no header", annexure_page(rng, header=False), True),
+        ("hindi", HINDI * 4, True),
+        ("shifted letters", shifted(PROSE * 4), False),
+        ("symbol glyphs", symbol_mapped(PROSE * 4), False),
+        ("mojibake", mojibake(PROSE * 4), False),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'page':<20}{'ok':>5}{'expect':>8}{'dict':>7}{'alnum':>7}{'us/page':>9}  reason")
+    for name, text, expected in fixtures():
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            result = text_quality(text)
+        micros = 1e6 * (time.perf_counter() - started) / args.repeat
+        ratio = result["dictionary_ratio"]
+        failures += result["ok"] != expected
+        print(
+            f"{name:<20}{str(result['ok']):>5}{str(expected):>8}"
+            f"{'-' if ratio is None else f'{ratio:.2f}':>7}{result['alnum_ratio']:>7.2f}"
+            f"{micros:>9.0f}  {result['reason'] or ''}"
+        )
+
+    if failures:
+        print(f"\n{failures} verdict(s) differ from the expected routing")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
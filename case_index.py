@@ -0,0 +1,283 @@
+import os
+import re
+import json
+import sqlite3
+import argparse
+
+# ---------------------------------------------------------
+# OFFLINE CASE-LAW INDEX
+# ---------------------------------------------------------
+# A full-text (SQLite FTS5, BM25-ranked) index over a folder of judgment
+# texts we already hold, so research_support can answer common issues
+# (s.74 extended limitation, ITC denial under s.16(4), ...) locally and
+# only send Perplexity what the library does not cover. Each judgment is a
+# .txt / .md file; its court, year, citation and URL come from a sidecar
+# <name>.json or from "Key: value" lines at the top of the file. Rebuilds
+# are incremental: unchanged files (same size and mtime) are skipped.
+
+CASE_LAW_DIR = os.getenv("CASE_LAW_DIR", "case_law")
+CASE_INDEX_PATH = os.getenv(
+    "CASE_INDEX_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "legal_agent", "case_index.sqlite3"),
+)
+
+# Judgments returned per issue
+CASE_INDEX_TOP_K = 3
+
+# A judgment covers an issue when it contains this share of the issue's
+# content terms (numbers such as amounts and years are left out: "12,34,567"
+# and "2018-19" never appear in a judgment on the same point), at least this
+# many of them, and scores at least this BM25 score. A three-word issue
+# ("Excess ITC availed") is too vague to be answered locally.
+CASE_INDEX_MIN_COVERAGE = 0.6
+CASE_INDEX_MIN_MATCHED_TERMS = 4
+CASE_INDEX_MIN_SCORE = 5.0
+
+# BM25 column weights: a term in the title counts this much more than in the body
+TITLE_WEIGHT = 5.0
+
+CASE_FILE_EXTENSIONS = (".txt", ".md")
+METADATA_FIELDS = ("title", "court", "year", "citation", "url")
+METADATA_LINE = re.compile(r'^(title|court|year|citation|url)\s*:\s*(.+)$', re.IGNORECASE)
+TERM_PATTERN = re.compile(r'[a-z]{3,}|\d+')
+
+STOPWORDS = frozenset("""
+    the and for that with this from are was were been has have had not but its
+    their which who whom what when where under over into onto upon such any all
+    each per than then there these those also only may shall should would could
+    being other same said did does any notice alleged allegation allegations
+    noticee taxpayer issue issues whether period
+""".split())
+
+
+def _connect(index_path=None):
+    index_path = index_path or CASE_INDEX_PATH
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(index_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            title TEXT, court TEXT, year TEXT, citation TEXT, url TEXT
+        )
+        """
+    )
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS cases "
+        "USING fts5(title, body, tokenize='porter unicode61')"
+    )
+    return conn
+
+
+def read_judgment(path):
+    """
+    Returns:
+        tuple: (metadata dict, body text)
+    """
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        text = handle.read()
+
+    metadata = {}
+    sidecar = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(sidecar):
+        with open(sidecar, encoding="utf-8") as handle:
+            data = json.load(handle)
+        metadata = {field: str(data[field]) for field in METADATA_FIELDS if data.get(field)}
+    else:
+        lines = text.splitlines()
+        header = 0
+        for line in lines:
+            match = METADATA_LINE.match(line.strip())
+            if not match:
+                break
+            metadata[match.group(1).lower()] = match.group(2).strip()
+            header += 1
+        text = "\n".join(lines[header:])
+
+    metadata.setdefault(
+        "title", os.path.splitext(os.path.basename(path))[0].replace("_", " ")
+    )
+    return metadata, text
+
+
+def build_index(folder=None, index_path=None):
+    """
+    Index (or re-index) every judgment in folder.
+
+    Returns:
+        dict: { added, updated, removed, unchanged, documents }
+    """
+    folder = folder or CASE_LAW_DIR
+    counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+    paths = {}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.lower().endswith(CASE_FILE_EXTENSIONS):
+                path = os.path.abspath(os.path.join(root, name))
+                stat = os.stat(path)
+                paths[path] = (stat.st_size, stat.st_mtime)
+
+    conn = _connect(index_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        indexed = {
+            path: (doc_id, size, mtime)
+            for doc_id, path, size, mtime in conn.execute(
+                "SELECT id, path, size, mtime FROM documents"
+            )
+        }
+
+        for path, (doc_id, _, _) in indexed.items():
+            if path not in paths:
+                conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+                conn.execute("DELETE FROM cases WHERE rowid = ?", (doc_id,))
+                counts["removed"] += 1
+
+        for path, (size, mtime) in paths.items():
+            previous = indexed.get(path)
+            if previous and previous[1:] == (size, mtime):
+                counts["unchanged"] += 1
+                continue
+
+            metadata, body = read_judgment(path)
+            values = [metadata.get(field) for field in METADATA_FIELDS]
+            if previous:
+                doc_id = previous[0]
+                conn.execute("DELETE FROM cases WHERE rowid = ?", (doc_id,))
+                conn.execute(
+                    "UPDATE documents SET size = ?, mtime = ?, title = ?, court = ?, "
+                    "year = ?, citation = ?, url = ? WHERE id = ?",
+                    [size, mtime, *values, doc_id],
+                )
+                counts["updated"] += 1
+            else:
+                doc_id = conn.execute(
+                    "INSERT INTO documents (path, size, mtime, title, court, year, citation, url) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [path, size, mtime, *values],
+                ).lastrowid
+                counts["added"] += 1
+            conn.execute(
+                "INSERT INTO cases (rowid, title, body) VALUES (?, ?, ?)",
+                (doc_id, metadata["title"], body),
+            )
+
+        conn.execute("COMMIT")
+        counts["documents"] = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return counts
+
+
+def query_terms(text):
+    """Distinct searchable terms of an issue, in order (stopwords dropped)."""
+    terms = []
+    for term in TERM_PATTERN.findall(text.lower()):
+        if term not in STOPWORDS and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def search(query, limit=CASE_INDEX_TOP_K, index_path=None):
+    """
+    BM25-ranked judgments for a free-text query.
+
+    Returns:
+        list: dicts { title, court, year, citation, url, score, matched,
+              coverage, snippet } best first; score is positive (higher is
+              better), matched counts the query's content (non-numeric) terms
+              found in the judgment and coverage is their share. Empty when
+              there is no index.
+    """
+    terms = query_terms(query)
+    content_terms = [term for term in terms if not term.isdigit()]
+    index_path = index_path or CASE_INDEX_PATH
+    if not terms or not os.path.exists(index_path):
+        return []
+
+    try:
+        conn = _connect(index_path)
+    except sqlite3.Error:
+        return []
+
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT d.id, d.title, d.court, d.year, d.citation, d.url,
+                   bm25(cases, {TITLE_WEIGHT}, 1.0) AS rank,
+                   snippet(cases, 1, '', '', ' ... ', 32)
+            FROM cases JOIN documents d ON d.id = cases.rowid
+            WHERE cases MATCH ?
+            ORDER BY rank
+            LIMIT ?
+            """,
+            (" OR ".join(f'"{term}"' for term in terms), limit),
+        ).fetchall()
+
+        results = []
+        for doc_id, title, court, year, citation, url, rank, snippet in rows:
+            matched = sum(
+                1 for term in content_terms
+                if conn.execute(
+                    "SELECT 1 FROM cases WHERE cases MATCH ? AND rowid = ?",
+                    (f'"{term}"', doc_id),
+                ).fetchone()
+            )
+            results.append({
+                "title": title,
+                "court": court,
+                "year": year,
+                "citation": citation,
+                "url": url,
+                "score": -rank,
+                "matched": matched,
+                "coverage": matched / len(content_terms) if content_terms else 0.0,
+                "snippet": " ".join(snippet.split()),
+            })
+        return results
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
+
+
+def covering_judgments(issue, limit=CASE_INDEX_TOP_K, index_path=None):
+    """Judgments that cover an issue (see CASE_INDEX_MIN_COVERAGE); empty if none do."""
+    return [
+        hit for hit in search(issue, limit, index_path)
+        if hit["coverage"] >= CASE_INDEX_MIN_COVERAGE
+        and hit["matched"] >= CASE_INDEX_MIN_MATCHED_TERMS
+        and hit["score"] >= CASE_INDEX_MIN_SCORE
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline case-law index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="index a folder of judgment texts")
+    build.add_argument("folder", nargs="?", default=CASE_LAW_DIR)
+    query = commands.add_parser("search", help="search the index")
+    query.add_argument("query")
+    query.add_argument("--limit", type=int, default=CASE_INDEX_TOP_K)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(build_index(args.folder))
+        return
+
+    for hit in search(args.query, args.limit):
+        print(f"{hit['score']:6.2f}  {hit['coverage']:.0%}  {hit['title']} "
+              f"({hit['court'] or '?'}, {hit['year'] or '?'}) {hit['url'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import os
+import time
+import uuid
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from legal_agent import research_support, stream_draft_final_document, draft_reply_by_allegation
+
+# ---------------------------------------------------------
+# BACKGROUND RESEARCH AND DRAFT JOBS
+# ---------------------------------------------------------
+# Research and drafting run as jobs on one worker pool per server process
+# instead of inside the Streamlit script run, so a rerun (a tab switch,
+# any widget change) or a closed browser tab no longer kills the work
+# partway through. The UI keeps only the job ID (in the session and the
+# page URL) and polls the job, so a reconnecting tab picks up the same
+# job. How many drafts run at once is bounded by the pool, not by the
+# number of open tabs; the rest wait in the pool's queue.
+
+# Jobs running at once across all sessions
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", 4))
+
+# How long finished jobs (and their results) are kept for reconnecting tabs
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 24 * 3600))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_executor = ThreadPoolExecutor(max_workers=JOB_MAX_WORKERS, thread_name_prefix="draft-job")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class Job:
+    """
+    One research + draft run. The worker updates the attributes as it goes
+    and the UI reads them; results stay here until the job expires.
+    """
+
+    def __init__(self, owner, instructions, notice_summary, by_allegation):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.instructions = instructions
+        self.notice_summary = notice_summary
+        self.by_allegation = by_allegation
+
+        self.status = "queued"      # queued, running, done, failed, cancelled
+        self.stage = None           # research, draft
+        self.progress = 0
+        self.research_note = None
+        self.partial_draft = ""     # streamed draft so far
+        self.final_draft = None
+        self.error = None
+
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancelled = threading.Event()
+        self._future = None
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+def _draft(job):
+    if job.by_allegation:
+        job.final_draft = draft_reply_by_allegation(
+            job.instructions, job.notice_summary, job.research_note
+        )
+        return
+
+    stream = stream_draft_final_document(job.instructions, job.notice_summary, job.research_note)
+    job.progress = 75
+    for chunk in stream:
+        if job._cancelled.is_set():
+            return
+        job.partial_draft += chunk
+    job.final_draft = stream.result
+
+
+def _run(job):
+    if job._cancelled.is_set():
+        job.status = "cancelled"
+        job.finished = time.time()
+        return
+    job.status = "running"
+    job.started = time.time()
+    try:
+        job.stage, job.progress = "research", 10
+        job.research_note = research_support(job.instructions, job.notice_summary)
+
+        if not job._cancelled.is_set():
+            job.stage, job.progress = "draft", 50
+            _draft(job)
+
+        if job._cancelled.is_set():
+            job.status = "cancelled"
+        else:
+            job.status, job.progress = "done", 100
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished = time.time()
+
+
+def _prune(now):
+    # Called with _jobs_lock held
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if not job.active and job.finished and now - job.finished > JOB_RETENTION_SECONDS
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def submit_draft_job(owner, instructions, notice_summary, by_allegation=False) -> Job:
+    """
+    Queue research_support + drafting for a session.
+
+    Args:
+        owner: Session ID; a session has at most one active job, and
+               submitting again while it runs returns that job
+        instructions: The user's instructions
+        notice_summary: The notice summary (structured or prose)
+        by_allegation: Draft with draft_reply_by_allegation
+
+    Returns:
+        Job
+    """
+    with _jobs_lock:
+        _prune(time.time())
+        for job in _jobs.values():
+            if job.owner == owner and job.active:
+                return job
+
+        job = Job(owner, instructions, notice_summary, by_allegation)
+        _jobs[job.id] = job
+        # Run in a copy of the caller's context (e.g. its llm_scheduler user)
+        context = contextvars.copy_context()
+        job._future = _executor.submit(context.run, _run, job)
+        return job
+
+
+def get_job(job_id):
+    """The job with this ID, or None if unknown or expired."""
+    with _jobs_lock:
+        _prune(time.time())
+        return _jobs.get(job_id)
+
+
+def cancel_job(job_id):
+    """
+    Cancel a job. A queued job never starts; a running one stops between
+    stages or streamed chunks (a call already in flight still completes).
+    """
+    job = get_job(job_id)
+    if job is None or not job.active:
+        return
+    job._cancelled.set()
+    if job._future is not None and job._future.cancel():
+        job.status = "cancelled"
+        job.finished = time.time()
+
+
+def queue_position(job) -> int:
+    """How many queued jobs are ahead of job (0 once it is running)."""
+    if job.status != "queued":
+        return 0
+    with _jobs_lock:
+        return sum(
+            1 for other in _jobs.values()
+            if other.status == "queued" and other.created < job.created
+        )
+
+
+def job_stats():
+    """
+    Returns:
+        dict: { workers, running, queued, finished }
+    """
+    with _jobs_lock:
+        statuses = [job.status for job in _jobs.values()]
+    return {
+        "workers": JOB_MAX_WORKERS,
+        "running": statuses.count("running"),
+        "queued": statuses.count("queued"),
+        "finished": len(statuses) - statuses.count("running") - statuses.count("queued"),
+    }
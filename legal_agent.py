@@ -1,10 +1,22 @@
 import os
-import requests
+import re
+import json
+import asyncio
+import contextvars
 from io import BytesIO
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st  # Add this import
 from openai import OpenAI
 from docx import Document
 
+import case_index
+import llm_cache
+import llm_policy
+import llm_transport
+from statutes import detect_provisions, provisions_block
+from token_budget import STAGE_TOKEN_BUDGETS, PromptInput, count_tokens, fit_prompt
+
 # Load API keys from Streamlit Secrets (secure, never in GitHub)
 try:
     OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
@@ -15,30 +27,238 @@ try:
     PERPLEXITY_API_KEY = st.secrets["PERPLEXITY_API_KEY"]
 except (KeyError, FileNotFoundError):
     PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Retries are left to llm_policy so they share its deadline and backoff
+client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+CHATGPT_MODEL = "gpt-4o-mini"
+PERPLEXITY_MODEL = "sonar-pro"
+PERPLEXITY_URL = os.getenv("PERPLEXITY_URL", "https://api.perplexity.ai/chat/completions")
+
+# Token budget for each section in the map step (notices that don't fit the
+# "summarize" stage budget are summarised map-reduce style)
+SUMMARY_CHUNK_TOKENS = 6000
+
+# Map-step threads per notice: every section (and every merge group) gets
+# its own, so a long notice takes about as long as a short one; the provider
+# rate limits are enforced by llm_scheduler, this only bounds the threads
+SUMMARY_MAX_CONCURRENCY = 64
+
+# Parallel calls when a reply is drafted allegation by allegation
+DRAFT_MAX_CONCURRENCY = 8
+
+# -------------------------
+# Token accounting
+# -------------------------
+class LLMText(str):
+    """
+    Text returned by an LLM call, usable anywhere a str is, with token
+    accounting attached as .usage:
+    { input_tokens, output_tokens, calls, prompt_tokens, budget, trimmed }
+    input/output tokens are what the provider billed; prompt_tokens is our
+    own count of the (possibly trimmed) prompt before it was sent.
+    """
+
+    def __new__(cls, text, usage=None):
+        result = super().__new__(cls, text or "")
+        result.usage = dict(usage or {})
+        return result
+
+
+def _provider_usage(text, input_tokens, output_tokens) -> LLMText:
+    return LLMText(text, {
+        "input_tokens": input_tokens or 0,
+        "output_tokens": output_tokens or 0,
+        "calls": 1,
+    })
+
+
+def _cached_response(key):
+    """LLMText for a cache hit (nothing billed), or None."""
+    cached = llm_cache.cache_get(key)
+    if cached is None:
+        return None
+    text, usage = cached
+    return LLMText(text, {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "calls": 0,
+        "cache_hits": 1,
+        "saved_input_tokens": usage.get("input_tokens", 0),
+        "saved_output_tokens": usage.get("output_tokens", 0),
+    })
+
+
+def _with_report(result: LLMText, report: dict) -> LLMText:
+    return LLMText(result, {**result.usage, **report})
+
+
+class LLMStream:
+    """
+    Text chunks of a streamed LLM call. Iterate it (e.g. with st.write_stream)
+    to receive chunks as they arrive; once it is exhausted, .result holds
+    the complete LLMText with its usage, exactly as the non-streaming call
+    would have returned it.
+    """
+
+    def __init__(self, chunks, finish):
+        self._chunks = chunks
+        self._finish = finish
+        self.result = None
+
+    def __iter__(self):
+        parts = []
+        for chunk in self._chunks:
+            if chunk:
+                parts.append(chunk)
+                yield chunk
+        self.result = self._finish("".join(parts))
+
+
+def _map_concurrently(function, max_workers, *iterables) -> list:
+    """
+    executor.map over a thread pool, run in copies of the caller's context
+    so per-session settings (e.g. the llm_scheduler user) reach every call.
+    """
+    arguments = list(zip(*iterables))
+    contexts = [contextvars.copy_context() for _ in arguments]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(
+            lambda context, args: context.run(function, *args), contexts, arguments
+        ))
+
+
+def _combine_usage(results) -> dict:
+    counters = ("input_tokens", "output_tokens", "calls", "cache_hits",
+                "saved_input_tokens", "saved_output_tokens")
+    usage = {key: 0 for key in counters}
+    usage["trimmed"] = {}
+    for result in results:
+        for key in counters:
+            usage[key] += result.usage.get(key, 0)
+        for name, removed in result.usage.get("trimmed", {}).items():
+            usage["trimmed"][name] = usage["trimmed"].get(name, 0) + removed
+    return usage
 
 # -------------------------
 # ChatGPT (Drafting)
 # -------------------------
-def ask_chatgpt(prompt: str) -> str:
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}]
+def _chatgpt_result(response) -> LLMText:
+    usage = response.usage
+    return _provider_usage(
+        response.choices[0].message.content,
+        usage.prompt_tokens if usage else None,
+        usage.completion_tokens if usage else None,
+    )
+
+
+def ask_chatgpt(prompt: str, use_cache: bool = True, stage: str = None) -> LLMText:
+    """
+    One ChatGPT completion, answered from the response cache when possible.
+    stage selects the llm_policy deadline (retries included).
+    """
+    messages = [{"role": "user", "content": prompt}]
+
+    key = llm_cache.request_key("openai", CHATGPT_MODEL, messages)
+    if use_cache:
+        cached = _cached_response(key)
+        if cached is not None:
+            return cached
+
+    response = llm_policy.call(
+        "openai",
+        lambda timeout: client.chat.completions.create(
+            model=CHATGPT_MODEL,
+            messages=messages,
+            timeout=timeout,
+        ),
+        stage,
+        tokens=count_tokens(prompt),
     )
-    return response.choices[0].message.content
+    result = _chatgpt_result(response)
+    llm_cache.cache_put(key, result, result.usage)
+    return result
+
+
+async def ask_chatgpt_async(prompt: str, use_cache: bool = True, stage: str = None) -> LLMText:
+    """ask_chatgpt on the pooled async transport, for running calls concurrently."""
+    messages = [{"role": "user", "content": prompt}]
+
+    key = llm_cache.request_key("openai", CHATGPT_MODEL, messages)
+    if use_cache:
+        cached = await asyncio.to_thread(_cached_response, key)
+        if cached is not None:
+            return cached
+
+    async_client = llm_transport.get_async_openai_client(OPENAI_API_KEY)
+    response = await llm_policy.call_async(
+        "openai",
+        lambda timeout: async_client.chat.completions.create(
+            model=CHATGPT_MODEL,
+            messages=messages,
+            timeout=timeout,
+        ),
+        stage,
+        tokens=count_tokens(prompt),
+    )
+    result = _chatgpt_result(response)
+    await asyncio.to_thread(llm_cache.cache_put, key, result, result.usage)
+    return result
+
+
+def stream_chatgpt(prompt: str, use_cache: bool = True, stage: str = None) -> LLMStream:
+    """
+    Streaming ask_chatgpt: chunks arrive as generated; shares its cache.
+    Only opening the stream is retried; a stream that breaks midway raises.
+    """
+    messages = [{"role": "user", "content": prompt}]
+
+    key = llm_cache.request_key("openai", CHATGPT_MODEL, messages)
+    if use_cache:
+        cached = _cached_response(key)
+        if cached is not None:
+            return LLMStream([cached], lambda text: cached)
+
+    usage = {}
+
+    def chunks():
+        response = llm_policy.call(
+            "openai",
+            lambda timeout: client.chat.completions.create(
+                model=CHATGPT_MODEL,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=timeout,
+            ),
+            stage,
+            hedge=False,
+            tokens=count_tokens(prompt),
+        )
+        for chunk in response:
+            if chunk.usage:
+                usage["input"] = chunk.usage.prompt_tokens
+                usage["output"] = chunk.usage.completion_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def finish(text):
+        result = _provider_usage(text, usage.get("input"), usage.get("output"))
+        llm_cache.cache_put(key, result, result.usage)
+        return result
+
+    return LLMStream(chunks(), finish)
 
 # -------------------------
 # Perplexity (Case law research)
 # -------------------------
-def ask_perplexity(prompt: str) -> str:
-    url = "https://api.perplexity.ai/chat/completions"
+def _perplexity_request(prompt: str):
     headers = {
         "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
         "Content-Type": "application/json"
     }
 
     data = {
-        "model": "sonar-pro",
+        "model": PERPLEXITY_MODEL,
         "messages": [{
             "role": "user",
             "content": f"""
@@ -55,16 +275,289 @@ def ask_perplexity(prompt: str) -> str:
             """
         }]
     }
+    return headers, data
+
+
+def _perplexity_result(body: dict) -> LLMText:
+    usage = body.get("usage") or {}
+    return _provider_usage(
+        body["choices"][0]["message"]["content"],
+        usage.get("prompt_tokens"),
+        usage.get("completion_tokens"),
+    )
+
+
+def _post_perplexity(data: dict, headers: dict, timeout: float, stream: bool = False):
+    response = llm_transport.get_session().post(
+        PERPLEXITY_URL, json=data, headers=headers, stream=stream, timeout=timeout
+    )
+    try:
+        response.raise_for_status()
+    except Exception:
+        response.close()
+        raise
+    return response
+
+
+def ask_perplexity(prompt: str, use_cache: bool = True, stage: str = None) -> LLMText:
+    """
+    One Perplexity completion, answered from the response cache when possible.
+    stage selects the llm_policy deadline (retries included).
+    """
+    headers, data = _perplexity_request(prompt)
+
+    key = llm_cache.request_key("perplexity", data["model"], data["messages"])
+    if use_cache:
+        cached = _cached_response(key)
+        if cached is not None:
+            return cached
+
+    response = llm_policy.call(
+        "perplexity",
+        lambda timeout: _post_perplexity(data, headers, timeout),
+        stage,
+        tokens=count_tokens(data["messages"][0]["content"]),
+    )
+    result = _perplexity_result(response.json())
+    llm_cache.cache_put(key, result, result.usage)
+    return result
+
+
+async def ask_perplexity_async(prompt: str, use_cache: bool = True, stage: str = None) -> LLMText:
+    """ask_perplexity on the pooled async transport, for running calls concurrently."""
+    headers, data = _perplexity_request(prompt)
+
+    key = llm_cache.request_key("perplexity", data["model"], data["messages"])
+    if use_cache:
+        cached = await asyncio.to_thread(_cached_response, key)
+        if cached is not None:
+            return cached
+
+    async def post(timeout):
+        response = await llm_transport.get_async_http_client().post(
+            PERPLEXITY_URL, json=data, headers=headers, timeout=timeout
+        )
+        response.raise_for_status()
+        return response
+
+    response = await llm_policy.call_async(
+        "perplexity", post, stage, tokens=count_tokens(data["messages"][0]["content"])
+    )
+    result = _perplexity_result(response.json())
+    await asyncio.to_thread(llm_cache.cache_put, key, result, result.usage)
+    return result
+
+
+def stream_perplexity(prompt: str, use_cache: bool = True, stage: str = None) -> LLMStream:
+    """
+    Streaming ask_perplexity over server-sent events; shares its cache.
+    Only opening the stream is retried; a stream that breaks midway raises.
+    """
+    headers, data = _perplexity_request(prompt)
+
+    key = llm_cache.request_key("perplexity", data["model"], data["messages"])
+    if use_cache:
+        cached = _cached_response(key)
+        if cached is not None:
+            return LLMStream([cached], lambda text: cached)
+
+    usage = {}
+
+    def chunks():
+        with llm_policy.call(
+            "perplexity",
+            lambda timeout: _post_perplexity({**data, "stream": True}, headers, timeout, stream=True),
+            stage,
+            hedge=False,
+            tokens=count_tokens(data["messages"][0]["content"]),
+        ) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                event = json.loads(payload)
+                usage.update(event.get("usage") or {})
+                choices = event.get("choices") or [{}]
+                yield (choices[0].get("delta") or {}).get("content")
 
-    response = requests.post(url, json=data, headers=headers)
-    response.raise_for_status()
-    return response.json()["choices"][0]["message"]["content"]
+    def finish(text):
+        result = _provider_usage(text, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        llm_cache.cache_put(key, result, result.usage)
+        return result
+
+    return LLMStream(chunks(), finish)
 
 # -------------------------
 # Summarize GST Notice
 # -------------------------
-def summarize_notice(pdf_text: str) -> str:
-    prompt = f"""
+SUMMARY_HEADINGS = """
+    - Main allegations
+    - Period involved
+    - Sections / provisions invoked (if visible)
+    - Basis of demand (facts + law)
+    - Evidence relied upon
+    - Any procedural lapses
+"""
+
+
+def split_into_chunks(text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> list:
+    """Split text on paragraph (then line) boundaries into token-budgeted chunks."""
+    # Chunk on characters at the text's own chars-per-token ratio (one count,
+    # not one per paragraph); each section is measured again before sending
+    max_chars = int(max_tokens * len(text) / max(count_tokens(text), 1)) or 1
+    chunks, current, current_len = [], [], 0
+
+    for paragraph in text.split("\n\n"):
+        # Paragraphs longer than a whole chunk are split on lines, then hard-cut
+        pieces = [paragraph]
+        if len(paragraph) > max_chars:
+            pieces = []
+            for line in paragraph.split("\n"):
+                pieces.extend(
+                    line[i:i + max_chars] for i in range(0, max(len(line), 1), max_chars)
+                )
+
+        for piece in pieces:
+            if current and current_len + len(piece) > max_chars:
+                chunks.append("\n\n".join(current))
+                current, current_len = [], 0
+            current.append(piece)
+            current_len += len(piece) + 2
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _section_prompt(section: str, index: int, total: int) -> str:
+    return f"""
+    You are a GST legal assistant.
+
+    Below is part {index} of {total} of a GST notice. Summarise ONLY what
+    appears in this part, under these headings (write "Not in this part"
+    where nothing applies):
+    {SUMMARY_HEADINGS}
+    Keep amounts, dates, GSTINs, section numbers and document references exact.
+    Do NOT draft a reply. Only summarise.
+
+    Text:
+    {section}
+    """
+
+
+def _summarize_section(section: str, index: int, total: int, use_cache: bool = True) -> LLMText:
+    prompt, report = fit_prompt(
+        lambda section: _section_prompt(section, index, total),
+        [PromptInput("section", section, priority=0, min_tokens=0)],
+        STAGE_TOKEN_BUDGETS["summarize_section"],
+    )
+    return _with_report(ask_chatgpt(prompt, use_cache=use_cache, stage="summarize_section"), report)
+
+
+def _provisions_note(provisions: str) -> str:
+    if not provisions:
+        return ""
+    return (
+        "Provisions cited in the notice (found and resolved locally; use these\n"
+        "    exact references under \"Sections / provisions invoked\"):\n" + provisions
+    )
+
+
+def _merge_prompt(partial_summaries: str, provisions: str = "") -> str:
+    return f"""
+    You are a GST legal assistant.
+
+    The following are summaries of consecutive parts of ONE GST notice.
+    Merge them into a single clear, structured summary with these headings:
+    {SUMMARY_HEADINGS}
+    Combine duplicates, keep every distinct allegation, amount and provision,
+    and drop "Not in this part" entries. Do NOT add anything that is not in
+    the partial summaries.
+
+    {_provisions_note(provisions)}
+
+    Do NOT draft a reply. Only summarise.
+
+    Partial summaries:
+    {partial_summaries}
+    """
+
+
+def _numbered_parts(partial_summaries: list) -> str:
+    return "\n\n".join(
+        f"PART {index}:\n{summary}"
+        for index, summary in enumerate(partial_summaries, start=1)
+    )
+
+
+def _merge_request(partial_summaries: list, provisions: str = ""):
+    # The provisions give way first; the partial summaries are grouped by
+    # _reduce_summaries so that they fit without trimming
+    return fit_prompt(
+        _merge_prompt,
+        [
+            PromptInput(
+                "partial_summaries", _numbered_parts(partial_summaries), priority=1, min_tokens=0
+            ),
+            PromptInput("provisions", provisions, priority=0, min_tokens=0),
+        ],
+        STAGE_TOKEN_BUDGETS["summarize_merge"],
+    )
+
+
+def _merge_groups(summaries: list, budget: int) -> list:
+    """Consecutive groups of summaries whose merge prompt fits in budget tokens."""
+    overhead = count_tokens(_merge_prompt(""))
+    groups, current, used = [], [], overhead
+    for summary in summaries:
+        tokens = count_tokens(f"PART {len(current) + 1}:\n{summary}\n\n")
+        if current and used + tokens > budget:
+            groups.append(current)
+            current, used = [], overhead
+        current.append(summary)
+        used += tokens
+    groups.append(current)
+    return groups
+
+
+def _merge_group(group: list, use_cache: bool) -> LLMText:
+    if len(group) == 1:
+        return group[0]
+    prompt, report = _merge_request(group)
+    return _with_report(ask_chatgpt(prompt, use_cache=use_cache, stage="summarize_merge"), report)
+
+
+def _reduce_summaries(partial_summaries: list, provisions: str, use_cache: bool):
+    """
+    Hierarchical reduce: merge consecutive groups of summaries that fit the
+    merge budget (concurrently), then merge those results, until one merge
+    prompt holds them all. No section summary is ever trimmed away.
+
+    Returns:
+        tuple: (summaries for the final merge, intermediate merge results)
+    """
+    budget = STAGE_TOKEN_BUDGETS["summarize_merge"] - count_tokens(_provisions_note(provisions))
+    level, merged = list(partial_summaries), []
+    while True:
+        groups = _merge_groups(level, budget)
+        if len(groups) == 1:
+            return level, merged
+        if len(groups) == len(level):
+            # Every summary fills a prompt alone: merge pairs so the level still shrinks
+            groups = [level[start:start + 2] for start in range(0, len(level), 2)]
+        level = _map_concurrently(
+            _merge_group,
+            min(len(groups), SUMMARY_MAX_CONCURRENCY),
+            groups,
+            [use_cache] * len(groups),
+        )
+        merged.extend(result for group, result in zip(groups, level) if len(group) > 1)
+
+
+def _summary_prompt(pdf_text: str, provisions: str = "") -> str:
+    return f"""
     You are a GST legal assistant.
 
     Summarise the following GST notice in a clear, structured way. Extract:
@@ -75,18 +568,328 @@ def summarize_notice(pdf_text: str) -> str:
     - Evidence relied upon
     - Any procedural lapses
 
+    {_provisions_note(provisions)}
+
     Do NOT draft a reply. Only summarise.
 
     Text:
     {pdf_text}
     """
-    return ask_chatgpt(prompt)
+
+
+def _summary_request(pdf_text: str, chunked: bool, use_cache: bool):
+    """
+    Prompt for the final summary call, its budget report, the map-step and
+    intermediate merge results that were needed to build it (empty for
+    single-call summaries) and the provisions the notice cites.
+    """
+    provisions = detect_provisions(pdf_text)
+    block = provisions_block(provisions)
+    budget = STAGE_TOKEN_BUDGETS["summarize"]
+    if chunked is None:
+        chunked = count_tokens(_summary_prompt(pdf_text)) > budget
+
+    sections = split_into_chunks(pdf_text) if chunked else []
+    if len(sections) > 1:
+        partial_summaries = _map_concurrently(
+            _summarize_section,
+            min(len(sections), SUMMARY_MAX_CONCURRENCY),
+            sections,
+            range(1, len(sections) + 1),
+            [len(sections)] * len(sections),
+            [use_cache] * len(sections),
+        )
+        to_merge, merged = _reduce_summaries(partial_summaries, block, use_cache)
+        prompt, report = _merge_request(to_merge, block)
+        return prompt, report, partial_summaries + merged, provisions
+
+    prompt, report = fit_prompt(
+        _summary_prompt,
+        [
+            PromptInput("pdf_text", pdf_text, priority=0, min_tokens=0),
+            PromptInput("provisions", block, priority=1, min_tokens=0),
+        ],
+        budget,
+    )
+    return prompt, report, [], provisions
+
+
+def _summary_stage(partial_summaries: list) -> str:
+    return "summarize_merge" if partial_summaries else "summarize"
+
+
+def _finish_summary(result: LLMText, report: dict, partial_summaries: list,
+                    provisions: list) -> LLMText:
+    result = _with_report(result, report)
+    if partial_summaries:
+        result = LLMText(result, {
+            **_combine_usage(partial_summaries + [result]),
+            "prompt_tokens": report["prompt_tokens"],
+            "budget": report["budget"],
+        })
+    result.provisions = provisions
+    return result
+
+
+def summarize_notice(pdf_text: str, chunked: bool = None, use_cache: bool = True) -> LLMText:
+    """
+    Summarise a GST notice.
+
+    Notices that don't fit the "summarize" budget (or chunked=True) are split
+    into token-budgeted sections that are all summarised at once (within the
+    provider limits llm_scheduler enforces) and then merged; when the
+    section summaries don't fit one merge prompt they are merged in groups
+    first, and the group results merged. Token usage of every call made is
+    summed into the result's .usage. use_cache=False bypasses the response
+    cache (e.g. to regenerate). The provisions the notice cites (see
+    statutes) are given to the final call and kept as .provisions.
+    """
+    prompt, report, partial_summaries, provisions = _summary_request(pdf_text, chunked, use_cache)
+    result = ask_chatgpt(prompt, use_cache=use_cache, stage=_summary_stage(partial_summaries))
+    return _finish_summary(result, report, partial_summaries, provisions)
+
+
+def stream_summarize_notice(pdf_text: str, chunked: bool = None, use_cache: bool = True) -> LLMStream:
+    """
+    Streaming summarize_notice. For long notices the map step (and any
+    intermediate merges) still run before the first chunk; only the final
+    call is streamed.
+    """
+    prompt, report, partial_summaries, provisions = _summary_request(pdf_text, chunked, use_cache)
+    stream = stream_chatgpt(prompt, use_cache=use_cache, stage=_summary_stage(partial_summaries))
+    return LLMStream(
+        stream, lambda text: _finish_summary(stream.result, report, partial_summaries, provisions)
+    )
+
+# -------------------------
+# Structured notice record
+# -------------------------
+# The prose summary is pasted into every later prompt, where the model has
+# to re-read it each time. The structured mode extracts a compact record
+# once per notice instead; research and drafting are given the record as
+# JSON, and the readable summary is rendered from it locally. Long notices
+# are extracted section by section and the records merged here, so no
+# reduce call is needed.
+
+# Amounts, dates and references are kept as strings, exactly as written
+NoticeRecord = namedtuple("NoticeRecord", [
+    "gstin", "taxpayer", "notice_type", "reference", "notice_date", "reply_due",
+    "period", "sections", "demands", "allegations", "evidence", "procedural_lapses",
+])
+NOTICE_LIST_FIELDS = ("sections", "demands", "allegations", "evidence", "procedural_lapses")
+
+NOTICE_RECORD_TEMPLATE = """{
+      "gstin": "", "taxpayer": "", "notice_type": "", "reference": "",
+      "notice_date": "", "reply_due": "", "period": "",
+      "sections": ["Section 73(1) of the CGST Act, 2017", "..."],
+      "demands": [{"head": "IGST / CGST / SGST / interest / penalty ...", "amount": "..."}],
+      "allegations": ["one sentence each, with amount, period and provision"],
+      "evidence": ["documents and data relied upon"],
+      "procedural_lapses": ["defects in the notice or proceedings, if any"]
+    }"""
+
+
+def _record_prompt(pdf_text: str, part: str = "", provisions: str = "") -> str:
+    return f"""
+    You are a GST legal assistant.
+
+    Extract the key details of the GST notice below{part} into this JSON
+    structure. Leave a field empty ("" or []) when the text does not state
+    it. Keep amounts, dates, GSTINs, section numbers and document references
+    exactly as written. Do NOT draft a reply.
+
+    {NOTICE_RECORD_TEMPLATE}
+
+    {_provisions_note(provisions)}
+
+    Respond with the JSON object only.
+
+    Text:
+    {pdf_text}
+    """
+
+
+def _parse_notice_record(text: str):
+    """NoticeRecord from a JSON reply, or None if there is no usable object."""
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    def as_list(value):
+        return value if isinstance(value, list) else [value] if value else []
+
+    fields = {}
+    for name in NoticeRecord._fields:
+        value = data.get(name)
+        if name == "demands":
+            fields[name] = [
+                {
+                    "head": str(item.get("head", "")).strip(),
+                    "amount": str(item.get("amount", "")).strip(),
+                }
+                if isinstance(item, dict) else {"head": str(item).strip(), "amount": ""}
+                for item in as_list(value)
+            ]
+        elif name in NOTICE_LIST_FIELDS:
+            fields[name] = [str(item).strip() for item in as_list(value) if str(item).strip()]
+        else:
+            fields[name] = str(value or "").strip()
+    return NoticeRecord(**fields)
+
+
+def merge_notice_records(records: list) -> NoticeRecord:
+    """One record from per-section records: first value of each field, union of lists."""
+    fields = {}
+    for name in NoticeRecord._fields:
+        if name not in NOTICE_LIST_FIELDS:
+            fields[name] = next(
+                (getattr(record, name) for record in records if getattr(record, name)), ""
+            )
+            continue
+
+        merged, seen = [], set()
+        for record in records:
+            for item in getattr(record, name):
+                key = json.dumps(item, sort_keys=True) if isinstance(item, dict) else item
+                key = " ".join(key.split()).casefold()
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(item)
+        fields[name] = merged
+    return NoticeRecord(**fields)
+
+
+def notice_record_json(record: NoticeRecord) -> str:
+    """Compact JSON of the non-empty fields, for use in later prompts."""
+    return json.dumps(
+        {name: value for name, value in record._asdict().items() if value},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def render_notice_record(record: NoticeRecord) -> str:
+    """Readable markdown summary of a notice record."""
+    lines = []
+    for label, value in (
+        ("GSTIN", record.gstin),
+        ("Taxpayer", record.taxpayer),
+        ("Notice", ", ".join(v for v in (record.notice_type, record.reference) if v)),
+        ("Date of notice", record.notice_date),
+        ("Reply due", record.reply_due),
+        ("Period involved", record.period),
+    ):
+        if value:
+            lines.append(f"**{label}:** {value}  ")
+
+    demands = [
+        f"{demand['head']}: {demand['amount']}" if demand["amount"] else demand["head"]
+        for demand in record.demands
+    ]
+    for heading, items in (
+        ("Main allegations", record.allegations),
+        ("Sections / provisions invoked", record.sections),
+        ("Demand", demands),
+        ("Evidence relied upon", record.evidence),
+        ("Procedural lapses", record.procedural_lapses),
+    ):
+        if items:
+            lines.append(f"\n#### {heading}")
+            lines.extend(f"- {item}" for item in items)
+    return "\n".join(lines).strip()
+
+
+def _extract_record_section(section: str, index: int, total: int, use_cache: bool = True) -> LLMText:
+    part = f" (part {index} of {total}; only what appears in this part)"
+    prompt, report = fit_prompt(
+        lambda section: _record_prompt(section, part),
+        [PromptInput("section", section, priority=0, min_tokens=0)],
+        STAGE_TOKEN_BUDGETS["summarize_section"],
+    )
+    return _with_report(ask_chatgpt(prompt, use_cache=use_cache, stage="summarize_section"), report)
+
+
+def summarize_notice_structured(pdf_text: str, chunked: bool = None, use_cache: bool = True) -> LLMText:
+    """
+    Summarise a GST notice as a structured record.
+
+    Returns:
+        LLMText: the summary rendered from the record, with the NoticeRecord
+                 as .record (research_support and the drafting functions use
+                 it in place of the prose) and the cited provisions as
+                 .provisions. Falls back to summarize_notice if no record
+                 could be parsed.
+    """
+    provisions = detect_provisions(pdf_text)
+    budget = STAGE_TOKEN_BUDGETS["summarize"]
+    if chunked is None:
+        chunked = count_tokens(_record_prompt(pdf_text)) > budget
+
+    sections = split_into_chunks(pdf_text) if chunked else []
+    if len(sections) > 1:
+        results = _map_concurrently(
+            _extract_record_section,
+            min(len(sections), SUMMARY_MAX_CONCURRENCY),
+            sections,
+            range(1, len(sections) + 1),
+            [len(sections)] * len(sections),
+            [use_cache] * len(sections),
+        )
+    else:
+        prompt, report = fit_prompt(
+            lambda pdf_text, provisions: _record_prompt(pdf_text, provisions=provisions),
+            [
+                PromptInput("pdf_text", pdf_text, priority=0, min_tokens=0),
+                PromptInput("provisions", provisions_block(provisions), priority=1, min_tokens=0),
+            ],
+            budget,
+        )
+        results = [
+            _with_report(ask_chatgpt(prompt, use_cache=use_cache, stage="summarize"), report)
+        ]
+
+    records = [record for record in map(_parse_notice_record, results) if record is not None]
+    if not records:
+        fallback = summarize_notice(pdf_text, chunked, use_cache)
+        summary = LLMText(fallback, _combine_usage(results + [fallback]))
+        summary.provisions = provisions
+        return summary
+
+    record = merge_notice_records(records)
+    usage = _combine_usage(results)
+    usage["prompt_tokens"] = sum(result.usage.get("prompt_tokens", 0) for result in results)
+    summary = LLMText(render_notice_record(record), usage)
+    summary.record = record
+    summary.provisions = provisions
+    return summary
+
+
+def _summary_for_prompt(notice_summary: str) -> str:
+    """
+    The compact record when the summary has one, else the summary itself,
+    followed by the provisions the notice cites with their local text.
+    """
+    record = getattr(notice_summary, "record", None)
+    text = notice_record_json(record) if record is not None else notice_summary
+    provisions = getattr(notice_summary, "provisions", None)
+    if provisions is None:
+        # Summaries from elsewhere (e.g. pasted in): the summary's own citations
+        provisions = detect_provisions(notice_summary)
+    if not provisions:
+        return text
+    return f"{text}\n\nProvisions cited (local provisions table):\n{provisions_block(provisions)}"
 
 # -------------------------
 # Research using Perplexity
 # -------------------------
-def research_support(instructions: str, notice_summary: str) -> str:
-    prompt = f"""
+def _research_prompt(instructions: str, notice_summary: str) -> str:
+    return f"""
     The user wants to perform the following legal task in a GST matter:
 
     User instructions:
@@ -111,13 +914,126 @@ def research_support(instructions: str, notice_summary: str) -> str:
 
     Provide a structured research note with headings and bullet points.
     """
-    return ask_perplexity(prompt)
+
+
+# Issues looked up in the local case-law index per research call
+MAX_RESEARCH_ISSUES = 8
+
+BULLET_PATTERN = re.compile(r'^\s*(?:[-*\u2022]|\d+[.)])\s+(.+)$')
+# "**Period involved:** FY 2018-19": a bold label with its content on the same line
+INLINE_HEADING_PATTERN = re.compile(r'^\*\*([^*]+?)\*\*\s*:?\s*(.*)$')
+# Bold labels that are summary headings (not "**Excess ITC:** ..." allegations)
+SUMMARY_SECTION_NAMES = tuple(
+    re.sub(r'\s*\(.*\)', '', line.strip(" -")).lower()
+    for line in SUMMARY_HEADINGS.strip().splitlines()
+)
+
+
+def _is_summary_heading(label: str) -> bool:
+    label = " ".join(label.lower().replace("/", " / ").split()).rstrip(" :")
+    return any(name.startswith(label) or name.endswith(label) for name in SUMMARY_SECTION_NAMES)
+
+
+def _research_issues(notice_summary: str) -> list:
+    """
+    The notice's issues: the record's allegations for a structured summary,
+    else the bullets under the "allegations" heading of a prose summary.
+    """
+    record = getattr(notice_summary, "record", None)
+    if record is not None:
+        return list(record.allegations)[:MAX_RESEARCH_ISSUES]
+
+    issues, in_allegations = [], False
+    for line in str(notice_summary).splitlines():
+        if not line.strip():
+            continue
+        bullet = BULLET_PATTERN.match(line)
+        text = bullet.group(1).strip() if bullet else line.strip()
+        inline = INLINE_HEADING_PATTERN.match(text)
+        # Plain lines, "1. Main allegations:" and "2. **Period involved:** ..."
+        # style bullets are headings
+        if inline and _is_summary_heading(inline.group(1)):
+            in_allegations = "allegation" in inline.group(1).lower()
+            if in_allegations and inline.group(2):
+                issues.append(inline.group(2).strip(" *"))
+        elif not bullet or text.rstrip("*").endswith(":"):
+            in_allegations = "allegation" in text.lower()
+        elif in_allegations:
+            issues.append(text.replace("**", "").strip(" *"))
+    return issues[:MAX_RESEARCH_ISSUES]
+
+
+def _local_research_note(covered: list) -> str:
+    """Markdown research note for issues answered from the case-law index."""
+    lines = ["## Case law from the local library", ""]
+    for issue, judgments in covered:
+        lines.append(f"### {issue}")
+        for judgment in judgments:
+            forum = ", ".join(part for part in (judgment["court"], judgment["year"]) if part)
+            heading = f"- **{judgment['title']}**"
+            if forum:
+                heading += f" ({forum})"
+            if judgment["citation"]:
+                heading += f", {judgment['citation']}"
+            lines.append(heading)
+            lines.append(f"  - Relevant extract: \"{judgment['snippet']}\"")
+            lines.append(f"  - URL: {judgment['url'] or 'No verified reference found'}")
+        lines.append("")
+    return "\n".join(lines).strip()
+
+
+def research_support(
+    instructions: str, notice_summary: str, use_cache: bool = True, use_local_index: bool = True
+) -> LLMText:
+    """
+    Research note for the notice. Issues the offline case-law index covers
+    (see case_index) are answered from it; only the rest go to Perplexity,
+    and Perplexity is not called at all when every issue is covered.
+
+    Returns:
+        LLMText: the note; .usage["local_issues"] counts issues answered locally
+    """
+    covered, uncovered = [], []
+    for issue in _research_issues(notice_summary) if use_local_index else []:
+        judgments = case_index.covering_judgments(issue)
+        if judgments:
+            covered.append((issue, judgments))
+        else:
+            uncovered.append(issue)
+
+    local_note = _local_research_note(covered) if covered else ""
+    if covered and not uncovered:
+        usage = _combine_usage([])
+        usage["local_issues"] = len(covered)
+        return LLMText(local_note, usage)
+
+    if covered:
+        instructions += (
+            "\n\nCase law for the other issues is already on file. Research ONLY these issues:\n"
+            + "\n".join(f"- {issue}" for issue in uncovered)
+        )
+
+    # The summary gives way before the user's instructions
+    prompt, report = fit_prompt(
+        _research_prompt,
+        [
+            PromptInput("instructions", instructions, priority=1, min_tokens=500),
+            PromptInput(
+                "notice_summary", _summary_for_prompt(notice_summary), priority=0, min_tokens=1000
+            ),
+        ],
+        STAGE_TOKEN_BUDGETS["research"],
+    )
+    result = _with_report(ask_perplexity(prompt, use_cache=use_cache, stage="research"), report)
+    if not covered:
+        return result
+    return LLMText(f"{local_note}\n\n{result}", {**result.usage, "local_issues": len(covered)})
 
 # -------------------------
 # Draft final document
 # -------------------------
-def draft_final_document(instructions: str, notice_summary: str, research_note: str) -> str:
-    prompt = f"""
+def _draft_prompt(instructions: str, notice_summary: str, research_note: str) -> str:
+    return f"""
     You are a GST legal drafting assistant.
 
     TASK:
@@ -145,7 +1061,224 @@ def draft_final_document(instructions: str, notice_summary: str, research_note:
 
     Draft the final document now.
     """
-    return ask_chatgpt(prompt)
+
+
+def _draft_request(instructions: str, notice_summary: str, research_note: str):
+    # The (usually longest) research note is trimmed first, then the summary;
+    # the user's instructions are kept intact as long as possible
+    return fit_prompt(
+        _draft_prompt,
+        [
+            PromptInput("instructions", instructions, priority=2, min_tokens=500),
+            PromptInput(
+                "notice_summary", _summary_for_prompt(notice_summary), priority=1, min_tokens=1500
+            ),
+            PromptInput("research_note", research_note, priority=0, min_tokens=2000),
+        ],
+        STAGE_TOKEN_BUDGETS["draft"],
+    )
+
+
+def draft_final_document(
+    instructions: str, notice_summary: str, research_note: str, use_cache: bool = True
+) -> LLMText:
+    prompt, report = _draft_request(instructions, notice_summary, research_note)
+    return _with_report(ask_chatgpt(prompt, use_cache=use_cache, stage="draft"), report)
+
+
+def stream_draft_final_document(
+    instructions: str, notice_summary: str, research_note: str, use_cache: bool = True
+) -> LLMStream:
+    """Streaming draft_final_document; .result is set once the stream ends."""
+    prompt, report = _draft_request(instructions, notice_summary, research_note)
+    stream = stream_chatgpt(prompt, use_cache=use_cache, stage="draft")
+    return LLMStream(stream, lambda text: _with_report(stream.result, report))
+
+# -------------------------
+# Draft SCN reply allegation by allegation
+# -------------------------
+# A single drafting call takes time proportional to the whole reply. An SCN
+# reply is really one answer per allegation, so the allegations are listed
+# first (one short call), then the preamble, the prayer and every answer are
+# drafted concurrently and assembled here. Paragraphs are numbered locally
+# after assembly, so numbering is continuous whatever each call returned.
+
+# A model's own enumerator ("3.", "2.1.", "(4)", "5)", "Para 6:"); a bare
+# leading number is content ("15 invoices issued by ...") and stays
+PARAGRAPH_NUMBER_PATTERN = re.compile(
+    r'^\s*(?:para(?:graph)?\.?\s*\(?\d+(?:\.\d+)*[.):]?|\(?\d+(?:\.\d+)*[.)])\s+',
+    re.IGNORECASE,
+)
+
+
+def _allegations_prompt(notice_summary: str) -> str:
+    return f"""
+    You are a GST legal assistant.
+
+    List every distinct allegation or issue raised in the GST notice
+    summarised below, in the order they appear. Keep each to one sentence
+    with its amount, period and provision where given.
+
+    Respond with a JSON array of strings and nothing else.
+
+    GST notice summary:
+    {notice_summary}
+    """
+
+
+def _parse_allegations(text: str) -> list:
+    """Allegations from a JSON array reply, falling back to one per bullet/line."""
+    match = re.search(r'\[.*\]', text, re.DOTALL)
+    if match:
+        try:
+            items = json.loads(match.group(0))
+            return [str(item).strip() for item in items if str(item).strip()]
+        except ValueError:
+            pass
+    lines = (re.sub(r'^\s*([-*\u2022]|\d+[.)])\s*', '', line).strip() for line in text.splitlines())
+    return [line for line in lines if line]
+
+
+def extract_allegations(notice_summary: str, use_cache: bool = True) -> LLMText:
+    """
+    List the allegations in a notice summary. A structured summary already
+    has them, so no call is made.
+
+    Returns:
+        LLMText: the raw reply, with the parsed list as .allegations
+    """
+    record = getattr(notice_summary, "record", None)
+    if record is not None and record.allegations:
+        result = LLMText("\n".join(record.allegations))
+        result.allegations = list(record.allegations)
+        return result
+
+    prompt, report = fit_prompt(
+        _allegations_prompt,
+        [PromptInput("notice_summary", notice_summary, priority=0, min_tokens=1000)],
+        STAGE_TOKEN_BUDGETS["draft_allegations"],
+    )
+    result = _with_report(ask_chatgpt(prompt, use_cache=use_cache, stage="draft_allegations"), report)
+    result.allegations = _parse_allegations(result)
+    return result
+
+
+def _draft_part_prompt(task: str, instructions: str, notice_summary: str, research_note: str) -> str:
+    return f"""
+    You are a GST legal drafting assistant preparing ONE PART of a reply to
+    a show cause notice. Other parts are drafted separately.
+
+    YOUR PART:
+    {task}
+
+    User instructions:
+    {instructions}
+
+    GST notice summary:
+    {notice_summary}
+
+    Research note (with case laws and URLs):
+    {research_note}
+
+    RULES:
+    - Do NOT hallucinate.
+    - Do NOT invent case laws or URLs.
+    - You may ONLY rely on case laws and URLs explicitly present in the research note.
+    - If you make a legal point without a supporting case law, explicitly say "No verified reference available".
+    - Maintain formal legal tone.
+    - Write only your part: no title, no headings, no paragraph numbers.
+    - Separate paragraphs with a blank line.
+    """
+
+
+def _draft_part(task: str, instructions: str, notice_summary: str, research_note: str,
+                use_cache: bool = True) -> LLMText:
+    prompt, report = fit_prompt(
+        lambda **texts: _draft_part_prompt(task, **texts),
+        [
+            PromptInput("instructions", instructions, priority=2, min_tokens=500),
+            PromptInput(
+                "notice_summary", _summary_for_prompt(notice_summary), priority=1, min_tokens=1000
+            ),
+            PromptInput("research_note", research_note, priority=0, min_tokens=1500),
+        ],
+        STAGE_TOKEN_BUDGETS["draft_part"],
+    )
+    return _with_report(ask_chatgpt(prompt, use_cache=use_cache, stage="draft_part"), report)
+
+
+def _numbered_paragraphs(text: str, start: int):
+    """Paragraphs of text renumbered from start; returns (lines, next number)."""
+    paragraphs = [
+        PARAGRAPH_NUMBER_PATTERN.sub('', paragraph.strip(), count=1)
+        for paragraph in re.split(r'\n\s*\n', text.strip())
+        if paragraph.strip()
+    ]
+    lines = [f"{number}. {paragraph}" for number, paragraph in enumerate(paragraphs, start=start)]
+    return lines, start + len(paragraphs)
+
+
+def assemble_reply(preamble: str, allegations: list, answers: list, prayer: str) -> str:
+    """Join the drafted parts into one reply with continuous paragraph numbering."""
+    sections = ["PRELIMINARY SUBMISSIONS"]
+    lines, number = _numbered_paragraphs(preamble, 1)
+    sections.extend(lines)
+
+    for index, (allegation, answer) in enumerate(zip(allegations, answers), start=1):
+        sections.append(f"REPLY TO ALLEGATION {index}: {allegation}")
+        lines, number = _numbered_paragraphs(answer, number)
+        sections.extend(lines)
+
+    sections.append("PRAYER")
+    lines, number = _numbered_paragraphs(prayer, number)
+    sections.extend(lines)
+    return "\n\n".join(sections)
+
+
+def draft_reply_by_allegation(
+    instructions: str, notice_summary: str, research_note: str, use_cache: bool = True
+) -> LLMText:
+    """
+    Draft an SCN reply with one concurrent call per allegation.
+
+    Wall-clock time is one short listing call (none for a structured
+    summary) plus the slowest single part, instead of one completion as
+    long as the whole reply. Falls back to
+    draft_final_document when no allegations can be listed.
+
+    Returns:
+        LLMText: the assembled reply; .usage sums every call made and
+                 .allegations lists what was answered
+    """
+    listing = extract_allegations(notice_summary, use_cache=use_cache)
+    allegations = listing.allegations
+    if not allegations:
+        return draft_final_document(instructions, notice_summary, research_note, use_cache)
+
+    tasks = [
+        "The opening of the reply: who is replying, to which notice (number, "
+        "date, period, provisions), and the general submissions and denials "
+        "that apply to every allegation.",
+        "The closing prayer clause: the specific reliefs sought (dropping "
+        "the proceedings, demand, interest and penalty as applicable, and a "
+        "personal hearing).",
+    ] + [
+        f"The reply to this allegation only, on facts and on law:\n    {allegation}"
+        for allegation in allegations
+    ]
+
+    parts = _map_concurrently(
+        lambda task: _draft_part(task, instructions, notice_summary, research_note, use_cache),
+        DRAFT_MAX_CONCURRENCY,
+        tasks,
+    )
+
+    preamble, prayer, answers = parts[0], parts[1], parts[2:]
+    usage = _combine_usage([listing] + parts)
+    usage["prompt_tokens"] = sum(result.usage.get("prompt_tokens", 0) for result in [listing] + parts)
+    result = LLMText(assemble_reply(preamble, allegations, answers, prayer), usage)
+    result.allegations = allegations
+    return result
 
 # -------------------------
 # Word document export
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+# ---------------------------------------------------------
+# PERSISTENT LLM RESPONSE CACHE
+# ---------------------------------------------------------
+# Completions are stored in SQLite keyed by a hash of provider, model,
+# messages and request parameters, so Streamlit reruns, double-clicks and
+# re-drafts of the same matter are answered locally. Entries expire after
+# LLM_CACHE_TTL_SECONDS, and the least recently used ones are evicted once
+# the stored text passes LLM_CACHE_MAX_BYTES. WAL mode and a busy timeout
+# make the file safe to share between processes. Hit / miss counters are
+# kept in the same file so they add up across sessions.
+
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "legal_agent", "llm_responses.sqlite3"),
+)
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def request_key(provider, model, messages, params=None):
+    payload = json.dumps(
+        {"provider": provider, "model": model, "messages": messages, "params": params or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(LLM_CACHE_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(LLM_CACHE_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            usage TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+    conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    return conn
+
+
+def _bump(conn, name):
+    conn.execute(
+        "INSERT INTO stats (name, value) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+        (name,),
+    )
+
+
+def cache_get(key):
+    """Return (text, usage) for a fresh entry, or None on a miss."""
+    try:
+        conn = _connect()
+    except sqlite3.Error:
+        return None
+
+    now = time.time()
+    try:
+        row = conn.execute(
+            "SELECT text, usage FROM responses WHERE key = ? AND created >= ?",
+            (key, now - LLM_CACHE_TTL_SECONDS),
+        ).fetchone()
+        if row is None:
+            _bump(conn, "misses")
+            return None
+
+        conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        _bump(conn, "hits")
+        return row[0], json.loads(row[1])
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def cache_put(key, text, usage):
+    """Store a response, dropping expired and least recently used entries as needed."""
+    try:
+        conn = _connect()
+    except sqlite3.Error:
+        return
+
+    now = time.time()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, text, usage, size, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, text, json.dumps(usage), len(text.encode("utf-8")), now, now),
+        )
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - LLM_CACHE_TTL_SECONDS,))
+        _evict(conn)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+
+
+def _evict(conn):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= LLM_CACHE_MAX_BYTES:
+        return
+
+    # Free down to 90% of the limit so we don't evict on every insert
+    to_free = total - int(LLM_CACHE_MAX_BYTES * 0.9)
+    victims = []
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+        victims.append((key,))
+        to_free -= size
+        if to_free <= 0:
+            break
+    conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+
+def cache_stats():
+    """
+    Returns:
+        dict: { hits, misses, hit_rate, entries, bytes }
+    """
+    try:
+        conn = _connect()
+    except sqlite3.Error:
+        return {"hits": 0, "misses": 0, "hit_rate": 0.0, "entries": 0, "bytes": 0}
+
+    try:
+        counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+    finally:
+        conn.close()
+
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "entries": entries,
+        "bytes": size,
+    }
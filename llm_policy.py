@@ -0,0 +1,394 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import llm_scheduler
+from llm_transport import HTTP_TIMEOUT_SECONDS, TRANSPORT_ERRORS
+
+# ---------------------------------------------------------
+# CALL POLICY (deadlines, retries, hedging, circuit breaking)
+# ---------------------------------------------------------
+# Every provider call made by legal_agent goes through call() / call_async().
+# A call gets one overall deadline for its stage, retries included. 429s,
+# 5xx and connection errors are retried with jittered exponential backoff,
+# waiting at least as long as the provider's Retry-After. Optionally, a
+# second identical request is sent once the first has taken longer than
+# the provider's recent latency percentile, and whichever answers first
+# wins. A per-provider circuit breaker stops calling a provider that keeps
+# failing, and lets one trial request through after a cooldown. Each
+# attempt first waits for a slot from llm_scheduler (rate limits), and
+# that wait counts against the deadline.
+
+# Overall seconds allowed per legal_agent stage, retries included
+STAGE_DEADLINES_SECONDS = {
+    "summarize": 180,
+    "summarize_section": 120,
+    "summarize_merge": 150,
+    "research": 150,
+    "draft": 300,
+    "draft_allegations": 60,
+    "draft_part": 180,
+}
+DEFAULT_DEADLINE_SECONDS = HTTP_TIMEOUT_SECONDS
+
+# Attempts per call (first try included) and backoff between them
+MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 4))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+# HTTP statuses worth retrying; anything else (400, 401, ...) fails at once
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Hedged requests cost a second completion, so they are opt-in
+HEDGE_REQUESTS = os.getenv("LLM_HEDGE_REQUESTS", "0") == "1"
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Consecutive failures that open a provider's circuit, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 30.0
+
+# Transport failures plus per-attempt timeouts of async calls
+_TRANSIENT_ERRORS = TRANSPORT_ERRORS + (asyncio.TimeoutError,)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The stage deadline passed before the provider answered."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's circuit is open after repeated failures."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial."""
+
+    def __init__(self, threshold=None, cooldown=None):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < (self.cooldown or BREAKER_COOLDOWN_SECONDS):
+            return "open"
+        return "half-open"
+
+    def before_call(self, provider):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "open" or self.probing:
+                raise CircuitOpenError(f"{provider} circuit is open after {self.failures} failures")
+            self.probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures, self.opened_at, self.probing = 0, None, False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= (self.threshold or BREAKER_FAILURE_THRESHOLD):
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release(self):
+        """End a trial request that neither proved nor disproved the provider."""
+        with self._lock:
+            self.probing = False
+
+
+_breakers = {}
+_latencies = {}
+_counters = {}
+_state_lock = threading.Lock()
+
+# Threads for hedged sync calls (the original request runs here too, so it can be raced)
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+def _breaker(provider) -> CircuitBreaker:
+    with _state_lock:
+        return _breakers.setdefault(provider, CircuitBreaker())
+
+
+def _count(provider, name, amount=1):
+    with _state_lock:
+        counters = _counters.setdefault(provider, {})
+        counters[name] = counters.get(name, 0) + amount
+
+
+def _record_latency(provider, seconds):
+    with _state_lock:
+        _latencies.setdefault(provider, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def _percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def hedge_delay(provider):
+    """Seconds after which a hedge is sent, or None when hedging is off or unwarranted."""
+    if not HEDGE_REQUESTS:
+        return None
+    with _state_lock:
+        samples = list(_latencies.get(provider, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return _percentile(samples, HEDGE_PERCENTILE)
+
+
+def retry_after_seconds(headers):
+    """Seconds asked for by Retry-After / retry-after-ms, or None."""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_code(exc):
+    response = getattr(exc, "response", None)
+    return getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+
+
+def classify(exc):
+    """
+    Returns:
+        tuple: (retryable, counts_as_provider_failure, retry_after_seconds)
+    """
+    if isinstance(exc, _TRANSIENT_ERRORS):
+        return True, True, None
+
+    response = getattr(exc, "response", None)
+    status = _status_code(exc)
+    if status is None:
+        return False, False, None
+
+    retryable = status in RETRY_STATUS_CODES
+    # A 429 means "slow down", not "broken"; only 5xx trip the breaker
+    return retryable, status >= 500, retry_after_seconds(getattr(response, "headers", None))
+
+
+def backoff_seconds(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than Retry-After."""
+    ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _deadline_for(stage):
+    return time.monotonic() + STAGE_DEADLINES_SECONDS.get(stage, DEFAULT_DEADLINE_SECONDS)
+
+
+def _after_failure(provider, breaker, exc, attempt, deadline, stage):
+    """Seconds to wait before the next attempt; re-raises when there is none."""
+    retryable, provider_failure, retry_after = classify(exc)
+    if provider_failure:
+        breaker.record_failure()
+    else:
+        breaker.release()
+    if not retryable or attempt >= MAX_ATTEMPTS:
+        raise exc
+
+    delay = backoff_seconds(attempt, retry_after)
+    if _status_code(exc) == 429:
+        # Hold everyone's requests to this provider, not just this caller's
+        llm_scheduler.pause(provider, delay)
+    if time.monotonic() + delay >= deadline:
+        raise DeadlineExceeded(
+            f"{provider} {stage or 'call'} deadline reached after {attempt} attempt(s)"
+        ) from exc
+    _count(provider, "retries")
+    return delay
+
+
+def _attempt_timeout(provider, breaker, deadline, stage):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        breaker.release()
+        raise DeadlineExceeded(f"{provider} {stage or 'call'} deadline reached")
+    return min(remaining, HTTP_TIMEOUT_SECONDS)
+
+
+def _wait_for_slot(provider, tokens, breaker, deadline, stage):
+    """Wait for a rate-limit slot, then return the time left for the attempt."""
+    try:
+        llm_scheduler.acquire(provider, tokens, timeout=deadline - time.monotonic())
+    except llm_scheduler.QueueTimeout as exc:
+        breaker.release()
+        raise DeadlineExceeded(
+            f"{provider} {stage or 'call'} deadline reached waiting for a rate-limit slot"
+        ) from exc
+    return _attempt_timeout(provider, breaker, deadline, stage)
+
+
+def call(provider, send, stage=None, hedge=True, tokens=0):
+    """
+    Run one provider request under the call policy.
+
+    Args:
+        provider: 'openai' or 'perplexity' (keys the breaker and latency stats)
+        send: Callable taking a timeout in seconds and returning the result;
+              it must raise on HTTP errors
+        stage: Key into STAGE_DEADLINES_SECONDS
+        hedge: Allow a hedged duplicate request (False for streams)
+        tokens: Prompt tokens, charged to the provider's tokens-per-minute limit
+    """
+    deadline = _deadline_for(stage)
+    breaker = _breaker(provider)
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        breaker.before_call(provider)
+        _attempt_timeout(provider, breaker, deadline, stage)
+        timeout = _wait_for_slot(provider, tokens, breaker, deadline, stage)
+        _count(provider, "attempts")
+        started = time.monotonic()
+        try:
+            delay_hedge = hedge_delay(provider) if hedge else None
+            if delay_hedge is None or delay_hedge >= timeout:
+                result = send(timeout)
+            else:
+                result = _hedged(provider, send, timeout, delay_hedge, tokens)
+        except Exception as exc:
+            if isinstance(exc, _TRANSIENT_ERRORS) and time.monotonic() >= deadline:
+                breaker.release()
+                raise DeadlineExceeded(f"{provider} {stage or 'call'} deadline reached") from exc
+            time.sleep(_after_failure(provider, breaker, exc, attempt, deadline, stage))
+            continue
+
+        _record_latency(provider, time.monotonic() - started)
+        breaker.record_success()
+        return result
+
+
+def _hedged(provider, send, timeout, hedge_after, tokens):
+    primary = _hedge_executor.submit(send, timeout)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done or not llm_scheduler.scheduler(provider).try_acquire(tokens):
+        return primary.result()
+
+    _count(provider, "hedges")
+    hedge = _hedge_executor.submit(send, timeout - hedge_after)
+    pending, error = {primary, hedge}, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    _count(provider, "hedge_wins")
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def call_async(provider, send, stage=None, hedge=True, tokens=0):
+    """call() for coroutines: send(timeout) returns an awaitable."""
+    deadline = _deadline_for(stage)
+    breaker = _breaker(provider)
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        breaker.before_call(provider)
+        _attempt_timeout(provider, breaker, deadline, stage)
+        timeout = await asyncio.to_thread(
+            _wait_for_slot, provider, tokens, breaker, deadline, stage
+        )
+        _count(provider, "attempts")
+        started = time.monotonic()
+        try:
+            delay_hedge = hedge_delay(provider) if hedge else None
+            if delay_hedge is None or delay_hedge >= timeout:
+                result = await asyncio.wait_for(send(timeout), timeout)
+            else:
+                result = await _hedged_async(provider, send, timeout, delay_hedge, tokens)
+        except Exception as exc:
+            if isinstance(exc, _TRANSIENT_ERRORS) and time.monotonic() >= deadline:
+                breaker.release()
+                raise DeadlineExceeded(f"{provider} {stage or 'call'} deadline reached") from exc
+            await asyncio.sleep(_after_failure(provider, breaker, exc, attempt, deadline, stage))
+            continue
+
+        _record_latency(provider, time.monotonic() - started)
+        breaker.record_success()
+        return result
+
+
+async def _hedged_async(provider, send, timeout, hedge_after, tokens):
+    primary = asyncio.ensure_future(asyncio.wait_for(send(timeout), timeout))
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    if done or not llm_scheduler.scheduler(provider).try_acquire(tokens):
+        return await primary
+
+    _count(provider, "hedges")
+    hedge = asyncio.ensure_future(asyncio.wait_for(send(timeout - hedge_after), timeout - hedge_after))
+    pending, error = {primary, hedge}, None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        _count(provider, "hedge_wins")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def policy_stats():
+    """
+    Returns:
+        dict: per provider { attempts, retries, hedges, hedge_wins, breaker,
+              p50_seconds, p95_seconds }
+    """
+    with _state_lock:
+        providers = set(_counters) | set(_breakers) | set(_latencies)
+        snapshot = {
+            provider: (dict(_counters.get(provider, {})), list(_latencies.get(provider, ())))
+            for provider in providers
+        }
+
+    stats = {}
+    for provider, (counters, samples) in snapshot.items():
+        stats[provider] = {
+            "attempts": counters.get("attempts", 0),
+            "retries": counters.get("retries", 0),
+            "hedges": counters.get("hedges", 0),
+            "hedge_wins": counters.get("hedge_wins", 0),
+            "breaker": _breaker(provider).state,
+            "p50_seconds": _percentile(samples, 0.5) if samples else None,
+            "p95_seconds": _percentile(samples, 0.95) if samples else None,
+        }
+    return stats
@@ -0,0 +1,316 @@
+import os
+import time
+import sqlite3
+import threading
+import contextvars
+from collections import OrderedDict, deque
+
+# ---------------------------------------------------------
+# PROVIDER RATE LIMITER AND REQUEST SCHEDULER
+# ---------------------------------------------------------
+# Every provider request waits here for a slot under that provider's
+# requests-per-minute and tokens-per-minute limits (token buckets refilled
+# continuously), so bursts from many Streamlit sessions are smoothed out to
+# the provider's limit instead of turning into 429 storms. Waiting requests
+# are queued per user and served round-robin, so one user's 20-part draft
+# cannot starve another user's summary. A 429 pauses the provider for its
+# Retry-After. With LLM_SCHEDULER_PATH set, the buckets live in SQLite and
+# are shared by every process using that file (fair queueing stays per
+# process).
+
+
+def _limit(name, default):
+    return int(os.getenv(name, default))
+
+
+# Per-provider limits; 0 disables that limit
+PROVIDER_LIMITS = {
+    "openai": {
+        "rpm": _limit("LLM_RPM_OPENAI", 500),
+        "tpm": _limit("LLM_TPM_OPENAI", 200_000),
+    },
+    "perplexity": {
+        "rpm": _limit("LLM_RPM_PERPLEXITY", 50),
+        "tpm": _limit("LLM_TPM_PERPLEXITY", 0),
+    },
+}
+
+# Seconds of allowance a bucket can bank for a burst (60 = a full minute's worth)
+BUCKET_BURST_SECONDS = 60
+
+# Output tokens assumed per request when charging the tokens-per-minute bucket
+OUTPUT_TOKEN_ESTIMATE = 1000
+
+# Optional SQLite file shared by several app processes
+LLM_SCHEDULER_PATH = os.getenv("LLM_SCHEDULER_PATH")
+
+# How often waiters re-check shared buckets that other processes may refill
+SHARED_POLL_SECONDS = 0.25
+
+# Recent waits kept per provider for the stats
+WAIT_WINDOW = 500
+
+_current_user = contextvars.ContextVar("llm_scheduler_user", default="default")
+
+
+class QueueTimeout(TimeoutError):
+    """No slot was granted before the caller's timeout."""
+
+
+def set_user(user):
+    """Queue this context's requests under user (e.g. the Streamlit session)."""
+    _current_user.set(str(user))
+
+
+def _take(levels, paused_until, needs, limits, now):
+    """
+    Token-bucket step shared by the local and SQLite stores.
+
+    Args:
+        levels: {kind: (level, updated)} for this provider (updated in place)
+        paused_until: Wall-clock time before which nothing is granted
+        needs: {kind: amount} wanted now
+        limits: {kind: per-minute limit}
+
+    Returns:
+        float: 0 if taken, else seconds until it could be
+    """
+    wait = paused_until - now
+    refilled = {}
+    for kind, amount in needs.items():
+        limit = limits.get(kind)
+        if not limit:
+            continue
+        rate = limit / 60
+        capacity = rate * BUCKET_BURST_SECONDS
+        level, updated = levels.get(kind, (capacity, now))
+        level = min(capacity, level + (now - updated) * rate)
+        amount = min(amount, capacity)
+        refilled[kind] = (level, amount)
+        if level < amount:
+            wait = max(wait, (amount - level) / rate)
+
+    taken = wait <= 0
+    for kind, (level, amount) in refilled.items():
+        levels[kind] = (level - amount if taken else level, now)
+    return 0.0 if taken else wait
+
+
+class _LocalBuckets:
+    def __init__(self):
+        self._levels = {}
+        self._paused = {}
+
+    def try_take(self, provider, needs, limits):
+        return _take(
+            self._levels.setdefault(provider, {}), self._paused.get(provider, 0.0),
+            needs, limits, time.time(),
+        )
+
+    def pause(self, provider, until):
+        self._paused[provider] = max(self._paused.get(provider, 0.0), until)
+
+    def paused_until(self, provider):
+        return self._paused.get(provider, 0.0)
+
+
+class _SharedBuckets:
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "provider TEXT, kind TEXT, level REAL NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (provider, kind))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pauses (provider TEXT PRIMARY KEY, until REAL NOT NULL)"
+        )
+        return conn
+
+    def try_take(self, provider, needs, limits):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            levels = {
+                kind: (level, updated)
+                for kind, level, updated in conn.execute(
+                    "SELECT kind, level, updated FROM buckets WHERE provider = ?", (provider,)
+                )
+            }
+            wait = _take(levels, self._paused_until(conn, provider), needs, limits, time.time())
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (provider, kind, level, updated) VALUES (?, ?, ?, ?)",
+                [(provider, kind, level, updated) for kind, (level, updated) in levels.items()],
+            )
+            conn.execute("COMMIT")
+            return wait
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Never block the app on the shared file; fall back to no limit
+            return 0.0
+        finally:
+            conn.close()
+
+    def _paused_until(self, conn, provider):
+        row = conn.execute("SELECT until FROM pauses WHERE provider = ?", (provider,)).fetchone()
+        return row[0] if row else 0.0
+
+    def pause(self, provider, until):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO pauses (provider, until) VALUES (?, ?) "
+                "ON CONFLICT(provider) DO UPDATE SET until = MAX(until, excluded.until)",
+                (provider, until),
+            )
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+
+    def paused_until(self, provider):
+        conn = self._connect()
+        try:
+            return self._paused_until(conn, provider)
+        except sqlite3.Error:
+            return 0.0
+        finally:
+            conn.close()
+
+
+_buckets = _SharedBuckets(LLM_SCHEDULER_PATH) if LLM_SCHEDULER_PATH else _LocalBuckets()
+
+
+class ProviderScheduler:
+    """Fair (round-robin by user) queue in front of one provider's buckets."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()
+        self._waits = deque(maxlen=WAIT_WINDOW)
+        self.granted = 0
+
+    def acquire(self, tokens, user=None, timeout=None):
+        """Block until a request of ~tokens may be sent; returns seconds waited."""
+        user = user or _current_user.get()
+        ticket = {"tokens": tokens, "granted": False}
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+
+        with self._cond:
+            self._queues.setdefault(user, deque()).append(ticket)
+            while True:
+                retry_in = self._dispatch()
+                if ticket["granted"]:
+                    waited = time.monotonic() - started
+                    self._waits.append(waited)
+                    return waited
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    self._withdraw(user, ticket)
+                    raise QueueTimeout(f"no {self.provider} slot within {timeout:.1f}s")
+
+                waits = [retry_in or SHARED_POLL_SECONDS]
+                if LLM_SCHEDULER_PATH:
+                    waits.append(SHARED_POLL_SECONDS)
+                if deadline is not None:
+                    waits.append(deadline - time.monotonic())
+                self._cond.wait(max(0.0, min(waits)))
+
+    def try_acquire(self, tokens, user=None):
+        """Take a slot only if one is free now and nobody is queued (for hedges)."""
+        with self._cond:
+            if self._queues:
+                return False
+            return _buckets.try_take(self.provider, self._needs(tokens), self._limits()) == 0
+
+    def _limits(self):
+        return PROVIDER_LIMITS.get(self.provider, {})
+
+    def _needs(self, tokens):
+        return {"rpm": 1, "tpm": tokens + OUTPUT_TOKEN_ESTIMATE}
+
+    def _dispatch(self):
+        # Serve queue heads user by user; a served user moves to the back
+        while self._queues:
+            user, queue = next(iter(self._queues.items()))
+            ticket = queue[0]
+            wait = _buckets.try_take(self.provider, self._needs(ticket["tokens"]), self._limits())
+            if wait > 0:
+                return wait
+
+            ticket["granted"] = True
+            self.granted += 1
+            queue.popleft()
+            del self._queues[user]
+            if queue:
+                self._queues[user] = queue
+            self._cond.notify_all()
+        return None
+
+    def _withdraw(self, user, ticket):
+        queue = self._queues.get(user)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[user]
+        self._cond.notify_all()
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            depth = sum(len(queue) for queue in self._queues.values())
+            users = len(self._queues)
+        return {
+            "queue_depth": depth,
+            "waiting_users": users,
+            "granted": self.granted,
+            "wait_p50_seconds": waits[len(waits) // 2] if waits else 0.0,
+            "wait_p95_seconds": waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+            "wait_max_seconds": waits[-1] if waits else 0.0,
+            "paused_for_seconds": max(0.0, _buckets.paused_until(self.provider) - time.time()),
+            "limits": dict(self._limits()),
+        }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def scheduler(provider) -> ProviderScheduler:
+    with _schedulers_lock:
+        if provider not in _schedulers:
+            _schedulers[provider] = ProviderScheduler(provider)
+        return _schedulers[provider]
+
+
+def acquire(provider, tokens, timeout=None):
+    """Wait for a slot for one request of ~tokens prompt tokens; returns seconds waited."""
+    return scheduler(provider).acquire(tokens, timeout=timeout)
+
+
+def pause(provider, seconds):
+    """Hold every request to provider for seconds (e.g. after a 429 with Retry-After)."""
+    _buckets.pause(provider, time.time() + seconds)
+    scheduler(provider).wake()
+
+
+def scheduler_stats():
+    """
+    Returns:
+        dict: per provider { queue_depth, waiting_users, granted,
+              wait_p50_seconds, wait_p95_seconds, wait_max_seconds,
+              paused_for_seconds, limits }
+    """
+    return {provider: scheduler(provider).stats() for provider in PROVIDER_LIMITS}
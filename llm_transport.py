@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, APIConnectionError
+
+try:
+    import httpx
+except ImportError:  # recent openai releases depend on the httpx2 fork instead
+    import httpx2 as httpx
+
+# ---------------------------------------------------------
+# SHARED HTTP TRANSPORT
+# ---------------------------------------------------------
+# One keep-alive connection pool per process for the sync path, and one per
+# event loop for the async path, so repeated calls skip the DNS lookup and
+# TCP/TLS handshake. Async clients are bound to the loop that created them,
+# hence the per-loop registry. Each loop's clients are closed when the loop
+# shuts down (asyncio.run finalises async generators before closing the
+# loop), so finished loops don't keep their connections open.
+
+# Connections kept open per host by the sync session
+HTTP_POOL_MAXSIZE = 16
+
+# Per-request timeout in seconds (connect + read)
+HTTP_TIMEOUT_SECONDS = 120
+
+# Connection-level failures (no HTTP status) of every client used here;
+# OpenAI's timeout error is a subclass of APIConnectionError
+TRANSPORT_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    httpx.TransportError,
+    APIConnectionError,
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+_async_http_clients = weakref.WeakKeyDictionary()
+_async_openai_clients = weakref.WeakKeyDictionary()
+_async_client_closers = weakref.WeakKeyDictionary()
+
+
+def get_session() -> requests.Session:
+    """Process-wide pooled requests session (thread-safe to share for POSTs)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+async def _close_clients_with_loop():
+    """Suspended until the running loop finalises its async generators."""
+    try:
+        yield
+    finally:
+        loop = asyncio.get_running_loop()
+        _async_openai_clients.pop(loop, None)
+        _async_client_closers.pop(loop, None)
+        http_client = _async_http_clients.pop(loop, None)
+        if http_client is not None:
+            await http_client.aclose()
+
+
+def get_async_http_client():
+    """Pooled async HTTP client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    http_client = _async_http_clients.get(loop)
+    if http_client is None:
+        http_client = DefaultAsyncHttpxClient(timeout=HTTP_TIMEOUT_SECONDS)
+        _async_http_clients[loop] = http_client
+
+        # Advance the closer to its yield so the loop tracks it and runs its
+        # finally block on shutdown (nothing before the yield awaits)
+        closer = _close_clients_with_loop()
+        try:
+            closer.asend(None).send(None)
+        except StopIteration:
+            pass
+        _async_client_closers[loop] = closer
+    return http_client
+
+
+def get_async_openai_client(api_key) -> AsyncOpenAI:
+    """AsyncOpenAI client for the running event loop, sharing its connection pool."""
+    loop = asyncio.get_running_loop()
+    openai_client = _async_openai_clients.get(loop)
+    if openai_client is None:
+        # Retries are left to llm_policy so they share its deadline and backoff
+        openai_client = AsyncOpenAI(
+            api_key=api_key, http_client=get_async_http_client(), max_retries=0
+        )
+        _async_openai_clients[loop] = openai_client
+    return openai_client
@@ -1,35 +1,487 @@
+import os
+import sys
+import time
+import shutil
+import resource
+import tempfile
+import sqlite3
+import hashlib
+import json
+import itertools
+import math
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 import fitz  # PyMuPDF
-import easyocr
+import numpy as np
 from io import BytesIO
 import streamlit as st
 
+from text_quality import is_garbled
+from text_normalize import normalize_pages, zone_for_position
+
 # Minimum characters required for valid text extraction
 MIN_TEXT_LENGTH = 50
 
+# Pages with less text-layer text than this are OCR'd in hybrid mode (if
+# there is anything on them to recognise, see _page_needs_ocr)
+MIN_PAGE_TEXT_LENGTH = 25
+
+# Vector paths on a page without images before it is worth OCR-ing (text
+# drawn as outlines); a few rules or a signature line are not
+OCR_MIN_DRAWINGS = 20
+
+# OCR render resolution: pages are scaled to roughly OCR_PIXEL_BUDGET pixels
+# (an A4 page at the old fixed 1.3x), clamped to a sane scale range
+OCR_PIXEL_BUDGET = 850_000
+OCR_MIN_RENDER_SCALE = 0.8
+OCR_MAX_RENDER_SCALE = 2.0
+
+# Render OCR pages as single-channel grayscale (a third of the RGB pixels)
+OCR_GRAYSCALE = True
+
+# Languages passed to EasyOCR
+OCR_LANGUAGES = ['en']
+
+# Pages per detector call in batched OCR mode
+OCR_BATCH_SIZE = 4
+
+# Default upper bound on OCR worker processes (leave one core for Streamlit)
+OCR_MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# On-disk extraction cache (shared by all Streamlit sessions and workers)
+EXTRACTION_CACHE_PATH = os.getenv(
+    "EXTRACTION_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "legal_agent", "extraction.sqlite3"),
+)
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
 
 # ---------------------------------------------------------
 # CACHED OCR LOADER (loads only once in Streamlit)
 # ---------------------------------------------------------
+# easyocr pulls in torch and torchvision, which dominate cold-start time,
+# so it is only imported the first time a page actually needs OCR.
+def _load_ocr_reader():
+    import easyocr
+
+    return easyocr.Reader(OCR_LANGUAGES, verbose=False)
+
+
 @st.cache_resource
 def get_ocr_reader():
-    return easyocr.Reader(['en'], verbose=False)
+    return _load_ocr_reader()
+
+
+# Torch threads per in-process OCR call (None leaves torch's default of one
+# per core). Callers running several extractions at once share one reader,
+# so they cap this to keep concurrent calls x threads near the core count.
+_ocr_threads = None
+
+
+def set_ocr_threads(threads):
+    """Cap the torch threads each in-process OCR call may use."""
+    global _ocr_threads
+    _ocr_threads = threads
+
+
+def _shared_ocr_reader():
+    """The cached reader, with the thread cap applied to the calling thread."""
+    reader = get_ocr_reader()
+    if _ocr_threads:
+        import torch
+        # OpenMP's thread count is per calling thread, so set it on each
+        torch.set_num_threads(_ocr_threads)
+    return reader
+
+
+# ---------------------------------------------------------
+# PERSISTENT EXTRACTION CACHE
+# ---------------------------------------------------------
+# Per-page OCR lines (with their header / body / footer zones, as JSON) are
+# stored in SQLite keyed by the SHA-256 of the PDF bytes, the page number
+# and a parameter string (method, render scale, languages).
+# SQLite's WAL mode and busy timeout make the file safe to share between
+# Streamlit sessions and OCR worker processes. When the stored text grows
+# past EXTRACTION_CACHE_MAX_BYTES the least recently used pages are dropped.
+
+def pdf_content_hash(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def _ocr_cache_params():
+    return (
+        f"ocr|budget={OCR_PIXEL_BUDGET}"
+        f"|scale={OCR_MIN_RENDER_SCALE}-{OCR_MAX_RENDER_SCALE}"
+        f"|gray={OCR_GRAYSCALE}|lang={','.join(OCR_LANGUAGES)}|zoned"
+    )
+
+
+def _lines_to_cache(lines):
+    return json.dumps(lines, ensure_ascii=False)
+
+
+def _lines_from_cache(text):
+    return [(line, zone) for line, zone in json.loads(text)]
+
+
+def _cache_connect():
+    os.makedirs(os.path.dirname(EXTRACTION_CACHE_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(EXTRACTION_CACHE_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS page_text (
+            doc_hash TEXT NOT NULL,
+            params TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            accessed REAL NOT NULL,
+            PRIMARY KEY (doc_hash, params, page)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS page_text_accessed ON page_text (accessed)")
+    return conn
+
+
+def cache_get_pages(doc_hash, params, page_numbers):
+    """Return {page_number: text} for the pages already in the cache."""
+    if not page_numbers:
+        return {}
+
+    try:
+        conn = _cache_connect()
+    except sqlite3.Error:
+        return {}
+
+    try:
+        placeholders = ",".join("?" * len(page_numbers))
+        rows = conn.execute(
+            f"SELECT page, text FROM page_text "
+            f"WHERE doc_hash = ? AND params = ? AND page IN ({placeholders})",
+            (doc_hash, params, *page_numbers),
+        ).fetchall()
+        if rows:
+            conn.execute(
+                f"UPDATE page_text SET accessed = ? "
+                f"WHERE doc_hash = ? AND params = ? AND page IN ({placeholders})",
+                (time.time(), doc_hash, params, *page_numbers),
+            )
+        return dict(rows)
+    except sqlite3.Error:
+        return {}
+    finally:
+        conn.close()
+
+
+def cache_put_pages(doc_hash, params, page_texts):
+    """Store {page_number: text} and evict old pages if over the size limit."""
+    if not page_texts:
+        return
+
+    try:
+        conn = _cache_connect()
+    except sqlite3.Error:
+        return
+
+    now = time.time()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT OR REPLACE INTO page_text "
+            "(doc_hash, params, page, text, size, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (doc_hash, params, number, text, len(text.encode("utf-8")), now)
+                for number, text in page_texts.items()
+            ],
+        )
+        _cache_evict(conn)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+
+
+def _cache_evict(conn):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM page_text").fetchone()[0]
+    if total <= EXTRACTION_CACHE_MAX_BYTES:
+        return
+
+    # Free down to 90% of the limit so we don't evict on every insert
+    to_free = total - int(EXTRACTION_CACHE_MAX_BYTES * 0.9)
+    victims = []
+    for rowid, size in conn.execute("SELECT rowid, size FROM page_text ORDER BY accessed"):
+        victims.append((rowid,))
+        to_free -= size
+        if to_free <= 0:
+            break
+    conn.executemany("DELETE FROM page_text WHERE rowid = ?", victims)
+
+
+# ---------------------------------------------------------
+# OCR HELPERS
+# ---------------------------------------------------------
+def ocr_render_scale(page, pixel_budget=None):
+    """Scale factor that renders the page at about pixel_budget pixels."""
+    pixel_budget = pixel_budget or OCR_PIXEL_BUDGET
+    rect = page.rect
+    scale = math.sqrt(pixel_budget / max(rect.width * rect.height, 1.0))
+    return min(OCR_MAX_RENDER_SCALE, max(OCR_MIN_RENDER_SCALE, scale))
+
+
+def render_page_array(page, pixel_budget=None, grayscale=None):
+    """
+    Render a page straight into a numpy array for EasyOCR.
+
+    The array is a view over the pixmap's sample buffer (no PPM encode /
+    decode round trip), so the returned pixmap must be kept alive for as
+    long as the array is used.
+
+    Returns:
+        tuple: (array, pixmap)
+    """
+    grayscale = OCR_GRAYSCALE if grayscale is None else grayscale
+    scale = ocr_render_scale(page, pixel_budget)
+
+    pix = page.get_pixmap(
+        matrix=fitz.Matrix(scale, scale),
+        colorspace=fitz.csGRAY if grayscale else fitz.csRGB,
+        alpha=False,
+    )
+    rows = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)
+    array = rows[:, :pix.width * pix.n]
+    if pix.n > 1:
+        array = array.reshape(pix.height, pix.width, pix.n)
+
+    return array, pix
+
+
+def _zoned_ocr_lines(result, height):
+    """
+    OCR boxes (EasyOCR detail=1 output) as (line, zone) tuples, zoned by the
+    box's vertical position like text-layer blocks.
+    """
+    lines = []
+    for box, text, _ in result or []:
+        ys = [point[1] for point in box]
+        lines.append((text, zone_for_position(min(ys), max(ys), height)))
+    return lines
+
+
+def _ocr_page(reader, page):
+    """Render a single page and return its zoned OCR lines ([] if nothing found)."""
+    array, pix = render_page_array(page)
+
+    lines = _zoned_ocr_lines(reader.readtext(array, detail=1), array.shape[0])
+    del array, pix
+    return lines
+
+
+def _ocr_pages_serial(pdf_document, page_numbers):
+    """OCR the given pages one after another in this process."""
+    reader = _shared_ocr_reader()
+    return [_ocr_page(reader, pdf_document[number]) for number in page_numbers]
+
+
+def _ocr_pages_batched(pdf_document, page_numbers, batch_size):
+    """
+    OCR the given pages batch_size at a time with EasyOCR's readtext_batched.
+
+    The detector stacks a batch into one tensor, so only renders of the same
+    shape can share a call; consecutive same-shaped pages are grouped rather
+    than resized, which keeps the text identical to the per-page path.
+    """
+    reader = _shared_ocr_reader()
+    pages = []
+
+    for start in range(0, len(page_numbers), batch_size):
+        rendered = [
+            render_page_array(pdf_document[number])
+            for number in page_numbers[start:start + batch_size]
+        ]
+        for _, group in itertools.groupby(rendered, key=lambda item: item[0].shape):
+            arrays = [array for array, _ in group]
+            height = arrays[0].shape[0]
+            for result in reader.readtext_batched(arrays, detail=1):
+                pages.append(_zoned_ocr_lines(result, height))
+        del rendered
+
+    return pages
+
+
+# Per-process state for OCR pool workers (set by _init_ocr_worker)
+_worker_reader = None
+_worker_document = None
+
+
+def _init_ocr_worker(pdf_bytes, threads_per_worker):
+    """Pool initializer: each worker opens the PDF and loads its own reader."""
+    global _worker_reader, _worker_document
+
+    import torch
+    torch.set_num_threads(threads_per_worker)
+
+    _worker_reader = _load_ocr_reader()
+    _worker_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+def _ocr_worker_page(page_number):
+    return _ocr_page(_worker_reader, _worker_document[page_number])
+
+
+def _ocr_pages_parallel(pdf_bytes, page_numbers, max_workers):
+    """
+    OCR the given pages across a pool of worker processes.
+
+    Results are returned in the same order as page_numbers. Workers are
+    started with 'spawn' so torch never inherits a forked thread pool.
+    """
+    workers = min(max_workers, len(page_numbers))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_ocr_worker,
+        initargs=(pdf_bytes, threads_per_worker),
+    ) as executor:
+        return list(executor.map(_ocr_worker_page, page_numbers))
+
+
+def _ocr_pages_uncached(pdf_document, pdf_bytes, page_numbers, parallel, max_workers, batch_size):
+    max_workers = max_workers or OCR_MAX_WORKERS
+
+    if parallel and max_workers > 1 and len(page_numbers) > 1:
+        try:
+            return _ocr_pages_parallel(pdf_bytes, page_numbers, max_workers)
+        except (BrokenProcessPool, OSError):
+            pass
+
+    if batch_size and batch_size > 1 and len(page_numbers) > 1:
+        return _ocr_pages_batched(pdf_document, page_numbers, batch_size)
+
+    return _ocr_pages_serial(pdf_document, page_numbers)
+
+
+def _ocr_pages(
+    pdf_document,
+    pdf_bytes,
+    page_numbers,
+    parallel=False,
+    max_workers=None,
+    use_cache=True,
+    batch_size=None,
+):
+    """
+    OCR the given pages, in parallel or in batches when requested and worthwhile.
+
+    Returns one list of zoned (line, zone) tuples per page.
+
+    Pages already in the extraction cache are not OCR'd again. Falls back
+    to the serial path for single pages, a single worker, or when the
+    process pool cannot be started.
+    """
+    if not use_cache:
+        return _ocr_pages_uncached(
+            pdf_document, pdf_bytes, page_numbers, parallel, max_workers, batch_size
+        )
+
+    doc_hash = pdf_content_hash(pdf_bytes)
+    params = _ocr_cache_params()
+    cached = {
+        number: _lines_from_cache(text)
+        for number, text in cache_get_pages(doc_hash, params, page_numbers).items()
+    }
+
+    missing = [number for number in page_numbers if number not in cached]
+    if missing:
+        fresh = dict(zip(
+            missing,
+            _ocr_pages_uncached(
+                pdf_document, pdf_bytes, missing, parallel, max_workers, batch_size
+            ),
+        ))
+        cache_put_pages(
+            doc_hash, params,
+            {number: _lines_to_cache(lines) for number, lines in fresh.items()},
+        )
+        cached.update(fresh)
+
+    return [cached[number] for number in page_numbers]
+
+
+def _zoned_page_lines(page):
+    """Text-layer lines tagged header / body / footer from PyMuPDF block positions."""
+    height = page.rect.height
+    lines = []
+    for _, y0, _, y1, text, _, block_type in page.get_text("blocks"):
+        if block_type != 0:
+            continue
+        zone = zone_for_position(y0, y1, height)
+        lines.extend((line, zone) for line in text.splitlines())
+    return lines
+
+
+def _lines_text(lines):
+    return "\n".join(line for line, _ in lines).strip()
+
+
+def _page_needs_ocr(page, text, min_page_text):
+    """
+    Hybrid routing test: the text layer is garbled, or too short and the
+    page has images (a scan) or enough vector paths to hold text. A blank
+    separator or "Sd/-" page stays on the text layer, so text-only notices
+    never load EasyOCR.
+    """
+    if len(text) >= min_page_text:
+        return is_garbled(text)
+    return bool(page.get_images()) or len(page.get_drawings()) >= OCR_MIN_DRAWINGS
 
 
 # ---------------------------------------------------------
 # MAIN EXTRACTION FUNCTION
 # ---------------------------------------------------------
-def extract_text_from_pdf(file, use_ocr_first=False):
+def extract_text_from_pdf(
+    file,
+    use_ocr_first=False,
+    parallel_ocr=False,
+    max_workers=None,
+    hybrid=False,
+    min_page_text=MIN_PAGE_TEXT_LENGTH,
+    use_cache=True,
+    ocr_batch_size=None,
+):
     """
     Extract text from a PDF using:
-    1. PyMuPDF (fast for text-based PDFs)
+    1. PyMuPDF (fast for text-based PDFs); pages whose text layer looks
+       garbled (broken font encoding) are OCR'd instead
     2. EasyOCR (for scanned PDFs)
 
     Args:
         file: Uploaded file object from Streamlit
         use_ocr_first: Force OCR even if text exists
+        parallel_ocr: Spread OCR pages across a pool of worker processes
+        max_workers: Upper bound on OCR workers (defaults to OCR_MAX_WORKERS)
+        hybrid: Route each page separately, OCR-ing only pages whose
+            text layer is shorter than min_page_text (on a page with
+            images) or looks garbled
+        min_page_text: Per-page text-layer threshold used by hybrid mode
+        use_cache: Reuse OCR text stored in the on-disk extraction cache
+        ocr_batch_size: Pages per batched OCR call (e.g. OCR_BATCH_SIZE);
+            None or 1 keeps one call per page
+
+    Repeated letterheads/footers, page numbers and layout whitespace are
+    stripped from the text (see text_normalize); chars_removed reports
+    how much was saved.
 
     Returns:
-        dict: { success, text, method, error }
+        dict: { success, text, method, page_methods, chars_removed, error }
     """
 
     # Read PDF once
@@ -45,25 +497,104 @@ def extract_text_from_pdf(file, use_ocr_first=False):
             'error': f'Could not read PDF: {str(e)}'
         }
 
+    # ---------------------------------------------------------
+    # HYBRID STRATEGY: PER-PAGE TEXT LAYER / OCR ROUTING
+    # ---------------------------------------------------------
+    if hybrid and not use_ocr_first:
+        try:
+            page_lines = [_zoned_page_lines(page) for page in pdf_document]
+            page_texts = [_lines_text(lines) for lines in page_lines]
+            page_methods = [
+                'ocr' if _page_needs_ocr(page, text, min_page_text) else 'fitz'
+                for page, text in zip(pdf_document, page_texts)
+            ]
+
+            ocr_page_numbers = [
+                number for number, method in enumerate(page_methods)
+                if method == 'ocr'
+            ]
+            if ocr_page_numbers:
+                ocr_lines = _ocr_pages(
+                    pdf_document,
+                    pdf_bytes,
+                    ocr_page_numbers,
+                    parallel=parallel_ocr,
+                    max_workers=max_workers,
+                    use_cache=use_cache,
+                    batch_size=ocr_batch_size,
+                )
+                for number, lines in zip(ocr_page_numbers, ocr_lines):
+                    page_lines[number] = lines
+
+            page_texts, chars_removed = normalize_pages(page_lines)
+            final_text = "\n".join(text for text in page_texts if text).strip()
+
+            if len(final_text) >= MIN_TEXT_LENGTH:
+                used_methods = set(page_methods)
+                return {
+                    'success': True,
+                    'text': final_text,
+                    'method': used_methods.pop() if len(used_methods) == 1 else 'hybrid',
+                    'page_methods': page_methods,
+                    'chars_removed': chars_removed,
+                    'error': None
+                }
+
+            return {
+                'success': False,
+                'text': None,
+                'method': None,
+                'error': 'Very little text extracted from text layer or OCR.'
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'text': None,
+                'method': None,
+                'error': f'Error extracting text: {str(e)}'
+            }
+
     # ---------------------------------------------------------
     # STRATEGY 1: PyMuPDF TEXT EXTRACTION
     # ---------------------------------------------------------
     if not use_ocr_first:
         try:
-            text_chunks = []
+            page_lines = [_zoned_page_lines(page) for page in pdf_document]
+            page_methods = [
+                'ocr' if is_garbled(_lines_text(lines)) else 'fitz' for lines in page_lines
+            ]
 
-            for page in pdf_document:
-                page_text = page.get_text()
-                if page_text:
-                    text_chunks.append(page_text)
+            # Broken font encodings are re-read from the rendered page
+            garbled_page_numbers = [
+                number for number, method in enumerate(page_methods) if method == 'ocr'
+            ]
+            if garbled_page_numbers:
+                ocr_lines = _ocr_pages(
+                    pdf_document,
+                    pdf_bytes,
+                    garbled_page_numbers,
+                    parallel=parallel_ocr,
+                    max_workers=max_workers,
+                    use_cache=use_cache,
+                    batch_size=ocr_batch_size,
+                )
+                for number, lines in zip(garbled_page_numbers, ocr_lines):
+                    page_lines[number] = lines
+
+            page_texts, chars_removed = normalize_pages(page_lines)
+            text_chunks = [text for text in page_texts if text]
 
             extracted_text = "\n".join(text_chunks).strip()
 
             if len(extracted_text) >= MIN_TEXT_LENGTH:
+                used_methods = set(page_methods)
                 return {
                     'success': True,
                     'text': extracted_text,
-                    'method': 'fitz',
+                    'method': used_methods.pop() if len(used_methods) == 1 else 'hybrid',
+                    'page_methods': page_methods,
+                    'chars_removed': chars_removed,
                     'error': None
                 }
 
@@ -95,17 +626,17 @@ def extract_text_from_pdf(file, use_ocr_first=False):
     # STRATEGY 2: OCR EXTRACTION
     # ---------------------------------------------------------
     try:
-        reader = get_ocr_reader()
-        ocr_text_chunks = []
-
-        for page in pdf_document:
-            # Lower DPI for faster OCR (1.3x is optimal)
-            pix = page.get_pixmap(matrix=fitz.Matrix(1.3, 1.3))
-            img_bytes = pix.tobytes("ppm")
-
-            result = reader.readtext(img_bytes, detail=0)
-            if result:
-                ocr_text_chunks.append("\n".join(result))
+        page_lines = _ocr_pages(
+            pdf_document,
+            pdf_bytes,
+            list(range(pdf_document.page_count)),
+            parallel=parallel_ocr,
+            max_workers=max_workers,
+            use_cache=use_cache,
+            batch_size=ocr_batch_size,
+        )
+        page_texts, chars_removed = normalize_pages(page_lines)
+        ocr_text_chunks = [text for text in page_texts if text]
 
         final_text = "\n".join(ocr_text_chunks).strip()
 
@@ -114,6 +645,8 @@ def extract_text_from_pdf(file, use_ocr_first=False):
                 'success': True,
                 'text': final_text,
                 'method': 'ocr',
+                'page_methods': ['ocr'] * pdf_document.page_count,
+                'chars_removed': chars_removed,
                 'error': None
             }
 
@@ -130,4 +663,352 @@ def extract_text_from_pdf(file, use_ocr_first=False):
             'text': None,
             'method': None,
             'error': f'OCR error: {str(e)}'
-        }
\ No newline at end of file
+        }
+
+# ---------------------------------------------------------
+# STREAMING (PAGE-BY-PAGE) EXTRACTION
+# ---------------------------------------------------------
+def iter_pdf_pages(
+    file,
+    use_ocr_first=False,
+    hybrid=False,
+    min_page_text=MIN_PAGE_TEXT_LENGTH,
+    use_cache=True,
+):
+    """
+    Extract a PDF one page at a time, yielding each page as soon as it is done.
+
+    Pages are routed the same way as extract_text_from_pdf: text layer only,
+    OCR only (use_ocr_first), or per page (hybrid). Only one page is rendered
+    at a time, so OCR intermediates never pile up in memory.
+
+    Args:
+        file: Uploaded file object from Streamlit
+        use_ocr_first: Force OCR even if text exists
+        hybrid: OCR only pages whose text layer is shorter than min_page_text
+            (on a page with images) or looks garbled
+        min_page_text: Per-page text-layer threshold used by hybrid mode
+        use_cache: Reuse OCR text stored in the on-disk extraction cache
+
+    Yields:
+        dict: { page, page_count, text, lines, method, seconds }
+            (page is 1-based; lines are the zoned lines build_extraction_result
+            uses for normalization)
+
+    Raises:
+        ValueError: If the PDF cannot be opened
+    """
+    try:
+        file.seek(0)
+        pdf_bytes = file.read()
+        pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception as e:
+        raise ValueError(f'Could not read PDF: {str(e)}') from e
+
+    doc_hash = pdf_content_hash(pdf_bytes) if use_cache else None
+    yield from _iter_document_pages(
+        pdf_document, doc_hash, use_ocr_first, hybrid, min_page_text
+    )
+
+
+def _iter_document_pages(pdf_document, doc_hash, use_ocr_first, hybrid, min_page_text):
+    """Per-page routing shared by the streaming extractors (doc_hash=None disables the cache)."""
+    use_cache = doc_hash is not None
+    params = _ocr_cache_params()
+    page_count = pdf_document.page_count
+
+    for number, page in enumerate(pdf_document):
+        started = time.perf_counter()
+
+        lines = [] if use_ocr_first else _zoned_page_lines(page)
+        text = _lines_text(lines)
+        method = 'fitz'
+
+        if use_ocr_first or (hybrid and _page_needs_ocr(page, text, min_page_text)):
+            method = 'ocr'
+            cached = cache_get_pages(doc_hash, params, [number]) if use_cache else {}
+            if number in cached:
+                lines = _lines_from_cache(cached[number])
+            else:
+                lines = _ocr_page(_shared_ocr_reader(), page)
+                if use_cache:
+                    cache_put_pages(doc_hash, params, {number: _lines_to_cache(lines)})
+            text = _lines_text(lines)
+
+        yield {
+            'page': number + 1,
+            'page_count': page_count,
+            'text': text,
+            'lines': lines,
+            'method': method,
+            'seconds': time.perf_counter() - started,
+        }
+
+
+def build_extraction_result(page_results):
+    """
+    Combine the pages yielded by iter_pdf_pages into the same result dict
+    that extract_text_from_pdf returns (normalization included).
+    """
+    page_methods = [result['method'] for result in page_results]
+    page_texts, chars_removed = normalize_pages(
+        [result['lines'] for result in page_results]
+    )
+    final_text = "\n".join(text for text in page_texts if text).strip()
+
+    if len(final_text) >= MIN_TEXT_LENGTH:
+        used_methods = set(page_methods)
+        return {
+            'success': True,
+            'text': final_text,
+            'method': used_methods.pop() if len(used_methods) == 1 else 'hybrid',
+            'page_methods': page_methods,
+            'chars_removed': chars_removed,
+            'error': None
+        }
+
+    if page_methods and all(method == 'ocr' for method in page_methods):
+        error = 'OCR extracted very little text.'
+    elif final_text:
+        error = 'Very little text extracted. Try enabling OCR.'
+    else:
+        error = 'No text extracted. Try enabling OCR.'
+
+    return {
+        'success': False,
+        'text': None,
+        'method': None,
+        'error': error
+    }
+
+
+# ---------------------------------------------------------
+# PER-SESSION EXTRACTION MEMO
+# ---------------------------------------------------------
+# Streamlit reruns app.py on every interaction while the upload stays set.
+# The finished extraction result is kept per upload (by content hash) and
+# force-OCR flag, so a rerun costs one hash instead of re-reading (and
+# re-OCR-ing or re-fetching from the page cache) every page. Flipping the
+# flag extracts once for the new setting; pages already OCR'd come from
+# the page cache and flipping back is free. Only the current upload is
+# kept: a different file replaces it.
+class ExtractionMemo:
+    def __init__(self):
+        self._doc_hash = None
+        self._results = {}
+
+    def key(self, pdf_bytes, use_ocr_first):
+        """Memo key for an upload extracted with (or without) forced OCR."""
+        return pdf_content_hash(pdf_bytes), bool(use_ocr_first)
+
+    def get(self, key):
+        """The stored extraction result for key, or None."""
+        if key[0] != self._doc_hash:
+            return None
+        return self._results.get(key[1])
+
+    def put(self, key, result):
+        if key[0] != self._doc_hash:
+            self._doc_hash = key[0]
+            self._results = {}
+        self._results[key[1]] = result
+
+
+# ---------------------------------------------------------
+# LOW-MEMORY EXTRACTION (VERY LARGE PDFs)
+# ---------------------------------------------------------
+def _current_rss_bytes():
+    """Resident set size of this process right now (peak RSS if unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _vm_hwm_bytes():
+    """Kernel high-water mark of this process's RSS (Linux /proc only)."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    raise ValueError("VmHWM not reported")
+
+
+def _peak_rss_monitor(interval=0.01):
+    """
+    Start measuring this process's peak RSS.
+
+    On Linux the kernel's high-water mark is reset (clear_refs "5") and
+    read back as VmHWM, which catches the in-page peak of a render or OCR
+    call. Elsewhere a background thread samples the RSS every interval
+    seconds.
+
+    Returns:
+        callable: Stops the measurement and returns the peak in bytes
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        _vm_hwm_bytes()
+        return _vm_hwm_bytes
+    except (OSError, ValueError):
+        pass
+
+    peak = [_current_rss_bytes()]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            peak[0] = max(peak[0], _current_rss_bytes())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+
+    def stop():
+        done.set()
+        sampler.join()
+        return max(peak[0], _current_rss_bytes())
+
+    return stop
+
+
+def _file_content_hash(path):
+    """Same digest as pdf_content_hash, computed without loading the file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_text_low_memory(
+    file,
+    output=None,
+    use_ocr_first=False,
+    hybrid=True,
+    min_page_text=MIN_PAGE_TEXT_LENGTH,
+    use_cache=True,
+):
+    """
+    Extract a PDF without ever holding the whole document or its text in memory.
+
+    The upload is copied to a temporary file (or a path is opened directly)
+    so MuPDF reads pages from disk on demand. Pages are processed one at a
+    time, each pixmap is released as soon as its page is OCR'd, MuPDF's
+    resource store is trimmed, and page text is written to output as it
+    is produced.
+
+    Args:
+        file: Path to a PDF, or an uploaded / binary file object
+        output: Text file object to write to (a temp file is created if None)
+        use_ocr_first: Force OCR even if text exists
+        hybrid: OCR only pages whose text layer is shorter than min_page_text
+            (on a page with images) or looks garbled
+        min_page_text: Per-page text-layer threshold used by hybrid mode
+        use_cache: Reuse OCR text stored in the on-disk extraction cache
+
+    Returns:
+        dict: { success, text, text_path, chars, chars_removed, method,
+                page_methods, peak_rss_bytes, error }  (text is always None; read text_path)
+    """
+    peak_rss = _peak_rss_monitor()
+    temp_path = None
+
+    try:
+        if isinstance(file, (str, os.PathLike)):
+            pdf_path = os.fspath(file)
+        else:
+            file.seek(0)
+            # MuPDF reads the document from disk, so copy it there once
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as on_disk:
+                temp_path = pdf_path = on_disk.name
+                shutil.copyfileobj(file, on_disk)
+        pdf_document = fitz.open(pdf_path, filetype="pdf")
+    except Exception as e:
+        if temp_path:
+            os.unlink(temp_path)
+        return {
+            'success': False,
+            'text': None,
+            'method': None,
+            'peak_rss_bytes': peak_rss(),
+            'error': f'Could not read PDF: {str(e)}'
+        }
+
+    created_output = output is None
+    if created_output:
+        output = tempfile.NamedTemporaryFile(
+            mode="w", encoding="utf-8", suffix=".txt", delete=False
+        )
+
+    page_methods = []
+    chars = 0
+    chars_removed = 0
+    try:
+        doc_hash = _file_content_hash(pdf_path) if use_cache else None
+
+        for page_result in _iter_document_pages(
+            pdf_document, doc_hash, use_ocr_first, hybrid, min_page_text
+        ):
+            page_methods.append(page_result['method'])
+            # Cross-page boilerplate needs every page up front, so only the
+            # per-page clean-up (page numbers, whitespace) applies here
+            [text], removed = normalize_pages([page_result['lines']])
+            chars_removed += removed
+            if text:
+                if chars:
+                    output.write("\n")
+                output.write(text)
+                chars += len(text)
+
+            fitz.TOOLS.store_shrink(100)
+
+        output.flush()
+    except Exception as e:
+        if created_output:
+            output.close()
+            os.unlink(output.name)
+        return {
+            'success': False,
+            'text': None,
+            'method': None,
+            'peak_rss_bytes': peak_rss(),
+            'error': f'Error extracting text: {str(e)}'
+        }
+    finally:
+        pdf_document.close()
+        if temp_path:
+            os.unlink(temp_path)
+
+    if created_output:
+        output.close()
+
+    if chars < MIN_TEXT_LENGTH:
+        if created_output:
+            os.unlink(output.name)
+        if use_ocr_first or (page_methods and all(method == 'ocr' for method in page_methods)):
+            error = 'OCR extracted very little text.'
+        else:
+            error = 'Very little text extracted. Try enabling OCR.'
+        return {
+            'success': False,
+            'text': None,
+            'method': None,
+            'peak_rss_bytes': peak_rss(),
+            'error': error
+        }
+
+    used_methods = set(page_methods)
+    return {
+        'success': True,
+        'text': None,
+        'text_path': getattr(output, 'name', None),
+        'chars': chars,
+        'chars_removed': chars_removed,
+        'method': used_methods.pop() if len(used_methods) == 1 else 'hybrid',
+        'page_methods': page_methods,
+        'peak_rss_bytes': peak_rss(),
+        'error': None
+    }
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+from collections import namedtuple
+from functools import lru_cache
+
+# ---------------------------------------------------------
+# STATUTE REFERENCE DETECTION
+# ---------------------------------------------------------
+# Notices name the provisions they invoke ("Section 73(1) of the CGST Act,
+# 2017", "Rule 86A", "Notification No. 13/2022-Central Tax", "Circular No.
+# 183/15/2022-GST"). They are found here with one compiled pattern (a
+# 500-page notice takes about a fifth of a second) and resolved against a local
+# provisions table, so the summary and drafting prompts carry exact
+# references without asking a model to find or explain them. The built-in
+# table holds the headings of the provisions GST notices cite most; full
+# text (or more entries) can be loaded from the JSON file at STATUTES_PATH,
+# shaped like PROVISIONS_TABLE.
+
+STATUTES_PATH = os.getenv("STATUTES_PATH", "statutes.json")
+
+# Provisions listed in a prompt (most cited first)
+MAX_PROMPT_PROVISIONS = 25
+
+# Sections without a named Act are taken to be CGST Act sections, rules CGST Rules
+DEFAULT_ACTS = {"section": "CGST Act", "rule": "CGST Rules"}
+
+PROVISIONS_TABLE = {
+    "CGST Act": {
+        "2": "Definitions",
+        "7": "Scope of supply",
+        "9": "Levy and collection",
+        "10": "Composition levy",
+        "12": "Time of supply of goods",
+        "13": "Time of supply of services",
+        "15": "Value of taxable supply",
+        "16": "Eligibility and conditions for taking input tax credit",
+        "17": "Apportionment of credit and blocked credits",
+        "18": "Availability of credit in special circumstances",
+        "22": "Persons liable for registration",
+        "29": "Cancellation or suspension of registration",
+        "31": "Tax invoice",
+        "34": "Credit and debit notes",
+        "35": "Accounts and other records",
+        "37": "Furnishing details of outward supplies",
+        "39": "Furnishing of returns",
+        "44": "Annual return",
+        "49": "Payment of tax, interest, penalty and other amounts",
+        "50": "Interest on delayed payment of tax",
+        "54": "Refund of tax",
+        "61": "Scrutiny of returns",
+        "62": "Assessment of non-filers of returns",
+        "63": "Assessment of unregistered persons",
+        "65": "Audit by tax authorities",
+        "66": "Special audit",
+        "67": "Power of inspection, search and seizure",
+        "73": "Determination of tax not paid or short paid or erroneously refunded or "
+              "input tax credit wrongly availed or utilised for any reason other than "
+              "fraud or any wilful-misstatement or suppression of facts",
+        "74": "Determination of tax not paid or short paid or erroneously refunded or "
+              "input tax credit wrongly availed or utilised by reason of fraud or any "
+              "wilful-misstatement or suppression of facts",
+        "75": "General provisions relating to determination of tax",
+        "76": "Tax collected but not paid to Government",
+        "79": "Recovery of tax",
+        "83": "Provisional attachment to protect revenue in certain cases",
+        "107": "Appeals to Appellate Authority",
+        "112": "Appeals to Appellate Tribunal",
+        "122": "Penalty for certain offences",
+        "125": "General penalty",
+        "126": "General disciplines related to penalty",
+        "127": "Power to impose penalty in certain cases",
+        "129": "Detention, seizure and release of goods and conveyances in transit",
+        "130": "Confiscation of goods or conveyances and levy of penalty",
+        "132": "Punishment for certain offences",
+        "140": "Transitional arrangements for input tax credit",
+        "155": "Burden of proof",
+        "160": "Assessment proceedings, etc., not to be invalid on certain grounds",
+        "169": "Service of notice in certain circumstances",
+    },
+    "CGST Rules": {
+        "36": "Documentary requirements and conditions for claiming input tax credit",
+        "37": "Reversal of input tax credit in the case of non-payment of consideration",
+        "42": "Manner of determination of input tax credit in respect of inputs or "
+              "input services and reversal thereof",
+        "43": "Manner of determination of input tax credit in respect of capital "
+              "goods and reversal thereof in certain cases",
+        "86A": "Conditions of use of amount available in electronic credit ledger",
+        "89": "Application for refund of tax, interest, penalty, fees or any other amount",
+        "138": "Information to be furnished prior to commencement of movement of "
+               "goods and generation of e-way bill",
+        "142": "Notice and order for demand of amounts payable under the Act",
+        "159": "Provisional attachment of property",
+    },
+    "IGST Act": {
+        "5": "Levy and collection",
+        "7": "Inter-State supply",
+        "8": "Intra-State supply",
+        "16": "Zero rated supply",
+        "20": "Application of provisions of Central Goods and Services Tax Act",
+    },
+    "Circular": {
+        "171/03/2022-GST": "Clarification on various issues relating to applicability of "
+                           "demand and penalty provisions in respect of transactions "
+                           "involving fake invoices",
+        "183/15/2022-GST": "Clarification to deal with difference in input tax credit "
+                           "availed in FORM GSTR-3B as compared to that detailed in "
+                           "FORM GSTR-2A for FY 2017-18 and 2018-19",
+    },
+    "Notification": {},
+}
+
+# One cited provision; act is the Act / Rules (or "Notification" / "Circular")
+Provision = namedtuple("Provision", ["kind", "act", "number", "citation", "count", "text"])
+
+_NUMBER = r'\d{1,3}(?!\d)[A-Z]?(?:\s?\([0-9a-zA-Z]{1,4}\))*'
+# A number with at least one sub-clause, e.g. "16(4)"
+_SUBCLAUSE_NUMBER = r'\d{1,3}(?!\d)[A-Z]?(?:\s?\([0-9a-zA-Z]{1,4}\))+'
+
+
+def _number_list(keyword, plural=False):
+    """
+    One or more numbers ("16(2)(c), 16(4)"). After a conjunction ("and",
+    "or", "&", "r/w") the next number needs the keyword again ("and section
+    20") or a sub-clause ("and 16(4)"), unless it ends a comma list ("73, 74
+    and 122") or the keyword was plural ("Sections 73 and 74"): "Section 50
+    and 20 days" cites only section 50.
+    """
+    conjunction = r'\s*(?:&|(?i:and|or|r/w|read\s+with))\s*'
+    if plural:
+        return rf'{_NUMBER}(?:(?:\s*(?:,|/)\s*|,?{conjunction})(?:{keyword}\s*)?{_NUMBER})*'
+    return (
+        rf'{_NUMBER}(?:'
+        rf'\s*(?:,|/)\s*(?:{keyword}\s*)?{_NUMBER}(?:,?{conjunction}(?:{keyword}\s*)?{_NUMBER})?'
+        rf'|{conjunction}(?:{keyword}\s*{_NUMBER}|{_SUBCLAUSE_NUMBER})'
+        rf')*'
+    )
+
+
+_SECTION_KEYWORD = r'(?i:sections?|secs?\.?|u/s\.?)'
+_RULE_KEYWORD = r'(?i:rules?)'
+
+# One pass over the text finds all four kinds (one combined pattern is
+# several times faster than a pass per kind)
+REFERENCE_PATTERN = re.compile(
+    rf'\b(?=[sSrRnNcCuU])(?:'
+    rf'(?:(?P<sections>(?i:sections|secs\.?|u/ss\.?))|{_SECTION_KEYWORD})[\s.:-]*'
+    rf'(?P<section>(?(sections){_number_list(_SECTION_KEYWORD, plural=True)}|{_number_list(_SECTION_KEYWORD)}))'
+    rf'|(?:(?P<rules>(?i:rules))|{_RULE_KEYWORD})[\s.:-]*'
+    rf'(?P<rule>(?(rules){_number_list(_RULE_KEYWORD, plural=True)}|{_number_list(_RULE_KEYWORD)}))'
+    r'|(?i:notification)\s*(?i:no\.?|number)?\s*(?P<notification>\d{1,3}/\d{4})\s*[-–]?\s*'
+    r'(?P<tax>(?i:central|integrated|union\s+territory|state)\s+(?i:tax)(?:\s*\((?i:rate)\))?)?'
+    r'|(?i:circular)\s*(?i:no\.?|number)?\s*(?P<circular>\d{1,4}/\d{1,3}/\d{4})(?:\s*[-–]\s*(?i:gst))?)'
+)
+NUMBER_PATTERN = re.compile(_NUMBER)
+ACT_PATTERN = re.compile(
+    r'\s*,?\s*(?i:of|under)\s+(?i:the\s+)?(?i:'
+    r'(?P<cgst_rules>(?:CGST|Central\s+Goods\s+and\s+Services\s+Tax)\s+Rules)'
+    r'|(?P<cgst>(?:CGST|Central\s+Goods\s+and\s+Services\s+Tax)\s+Act)'
+    r'|(?P<igst>(?:IGST|Integrated\s+Goods\s+and\s+Services\s+Tax)\s+Act)'
+    r'|(?P<sgst>(?:SGST|[a-z]+\s+(?:State\s+)?Goods\s+and\s+Services\s+Tax)\s+Act))'
+)
+ACT_NAMES = {"cgst_rules": "CGST Rules", "cgst": "CGST Act", "igst": "IGST Act", "sgst": "SGST Act"}
+
+
+@lru_cache(maxsize=1)
+def provisions_table() -> dict:
+    """PROVISIONS_TABLE with the entries of STATUTES_PATH (if present) merged over it."""
+    table = {act: dict(entries) for act, entries in PROVISIONS_TABLE.items()}
+    if os.path.exists(STATUTES_PATH):
+        with open(STATUTES_PATH, encoding="utf-8") as handle:
+            for act, entries in json.load(handle).items():
+                table.setdefault(act, {}).update(entries)
+    return table
+
+
+def lookup(act: str, number: str) -> str:
+    """Text of a provision, falling back to its parent section; "" if not in the table."""
+    table = provisions_table()
+    # State GST Acts mirror the CGST Act's section numbering
+    entries = table.get(act) or (table["CGST Act"] if act == "SGST Act" else {})
+    while number:
+        if number in entries:
+            return entries[number]
+        if "(" not in number:
+            return ""
+        number = number[:number.rindex("(")]
+    return ""
+
+
+def _citation(kind: str, act: str, number: str) -> str:
+    if kind == "notification":
+        return f"Notification No. {number}"
+    if kind == "circular":
+        return f"Circular No. {number}"
+    return f"{kind.title()} {number} of the {act}"
+
+
+def detect_provisions(text: str) -> list:
+    """
+    Sections, rules, notifications and circulars cited in text.
+
+    Returns:
+        list: Provision tuples, most cited first (then in order of first
+              citation); text is "" when the provision is not in the table
+    """
+    found = {}
+
+    def add(kind, act, number, position):
+        key = (kind, act, number)
+        if key in found:
+            found[key][0] += 1
+        else:
+            found[key] = [1, position]
+
+    for match in REFERENCE_PATTERN.finditer(text):
+        if match.group("notification"):
+            tax = " ".join(match.group("tax").split()).title() if match.group("tax") else ""
+            number = match.group("notification") + (f"-{tax}" if tax else "")
+            add("notification", "Notification", number, match.start())
+            continue
+        if match.group("circular"):
+            add("circular", "Circular", f"{match.group('circular')}-GST", match.start())
+            continue
+
+        kind = "section" if match.group("section") else "rule"
+        act_match = ACT_PATTERN.match(text, match.end(), match.end() + 80)
+        act = ACT_NAMES[act_match.lastgroup] if act_match else DEFAULT_ACTS[kind]
+        for number in NUMBER_PATTERN.findall(match.group(kind)):
+            add(kind, act, number.replace(" ", ""), match.start())
+
+    ordered = sorted(found.items(), key=lambda item: (-item[1][0], item[1][1]))
+    return [
+        Provision(kind, act, number, _citation(kind, act, number), count, lookup(act, number))
+        for (kind, act, number), (count, _) in ordered
+    ]
+
+
+def provisions_block(provisions: list, max_items: int = MAX_PROMPT_PROVISIONS) -> str:
+    """Prompt lines for the cited provisions; "" when there are none."""
+    lines = []
+    for provision in provisions[:max_items]:
+        line = f"- {provision.citation}"
+        if provision.count > 1:
+            line += f" (cited {provision.count} times)"
+        lines.append(f"{line}: {provision.text or 'not in the local provisions table'}")
+    return "\n".join(lines)
@@ -0,0 +1,103 @@
+import re
+
+# ---------------------------------------------------------
+# TEXT NORMALIZATION (letterheads, footers, page numbers, whitespace)
+# ---------------------------------------------------------
+# Every page of a notice repeats the letterhead, DIN line and footer, and
+# layout leaves long runs of whitespace. None of it helps the LLM, so it is
+# stripped before text leaves pdf_utils. Lines are tagged with the zone of
+# the page they came from ('header', 'body' or 'footer') from their
+# position on the page (text-layer blocks or OCR boxes); only header and
+# footer lines are candidates for removal, and the first copy of a repeated
+# line is kept so details like the DIN still appear once. Repeats must match
+# exactly, apart from a trailing page counter: lines that differ only in
+# their figures (totals, amounts) are different lines.
+
+# Top / bottom fraction of the page treated as header / footer
+HEADER_FOOTER_BAND = 0.12
+
+# A header/footer line repeated on this share of pages (and at least this
+# many pages) is boilerplate
+REPEAT_MIN_PAGE_RATIO = 0.5
+REPEAT_MIN_PAGES = 3
+
+PAGE_NUMBER_PATTERN = re.compile(
+    r'^(page\s*(no\.?)?\s*)?[-–(]?\s*\d{1,3}\s*((of|/)\s*\d{1,4})?\s*[-–)]?$',
+    re.IGNORECASE,
+)
+INLINE_SPACE_PATTERN = re.compile(r'[ \t\u00a0\u2000-\u200b]+')
+PAGE_COUNTER_PATTERN = re.compile(
+    r'\s*[-–(]?\s*(page\s*(no\.?)?\s*\d{1,4}(\s*(of|/)\s*\d{1,4})?|\d{1,4}\s+of\s+\d{1,4})\s*[-–)]?$',
+    re.IGNORECASE,
+)
+
+
+def zone_for_position(y0, y1, page_height):
+    """Zone of a text block from its vertical position on the page."""
+    if y1 <= page_height * HEADER_FOOTER_BAND:
+        return 'header'
+    if y0 >= page_height * (1 - HEADER_FOOTER_BAND):
+        return 'footer'
+    return 'body'
+
+
+def _collapse_spaces(line):
+    return INLINE_SPACE_PATTERN.sub(' ', line).strip()
+
+
+def _boilerplate_key(line):
+    # "Office of the Commissioner, Page 3 of 40" and "..., Page 4 of 40" are
+    # the same footer; any other difference (an amount, a date) is not
+    return PAGE_COUNTER_PATTERN.sub('', line.lower())
+
+
+def normalize_pages(pages):
+    """
+    Strip repeated headers/footers and page numbers, and collapse whitespace.
+
+    Args:
+        pages: One list of (line, zone) tuples per page
+
+    Returns:
+        tuple: (list of normalized page texts, characters removed)
+    """
+    original_chars = sum(len("\n".join(line for line, _ in lines)) for lines in pages)
+    pages = [
+        [(_collapse_spaces(line), zone) for line, zone in lines]
+        for lines in pages
+    ]
+
+    # Count how many pages each header/footer line appears on
+    page_counts = {}
+    for lines in pages:
+        for key in {
+            (_boilerplate_key(line), zone)
+            for line, zone in lines
+            if line and zone != 'body'
+        }:
+            page_counts[key] = page_counts.get(key, 0) + 1
+
+    min_pages = max(REPEAT_MIN_PAGES, int(len(pages) * REPEAT_MIN_PAGE_RATIO + 0.999))
+    boilerplate = {key for key, count in page_counts.items() if count >= min_pages}
+
+    seen = set()
+    texts = []
+    for lines in pages:
+        kept = []
+        for line, zone in lines:
+            if zone != 'body':
+                if PAGE_NUMBER_PATTERN.match(line):
+                    continue
+                key = (_boilerplate_key(line), zone)
+                if key in boilerplate:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+
+            # Keep single blank lines as paragraph breaks, drop the rest
+            if line or (kept and kept[-1]):
+                kept.append(line)
+
+        texts.append("\n".join(kept).strip())
+
+    return texts, original_chars - sum(len(text) for text in texts)
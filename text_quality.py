@@ -0,0 +1,182 @@
+import re
+
+# ---------------------------------------------------------
+# TEXT-LAYER QUALITY CHECK
+# ---------------------------------------------------------
+# Government PDFs often ship with broken font encodings, so get_text()
+# returns plenty of characters that are not real text. These checks run on
+# the text alone (no rendering) and cost microseconds per page, so every
+# text-layer page can be screened before it is trusted over OCR.
+#
+# Tabular pages (invoice annexures: GSTINs, invoice numbers, dates, amounts)
+# have a perfect text layer but almost no dictionary words, so tokens with
+# digits or other non-letters are left out of the word count, and a low
+# dictionary share only marks a page garbled when something else backs it
+# up: symbols inside the words, stray bad or mojibake characters, or words
+# that turn into English when their letters are shifted (a font whose
+# glyphs map to the wrong code points by a fixed offset).
+
+# Replacement characters, C0/C1 control codes and private-use code points
+BAD_CHAR_PATTERN = re.compile(r'[\ufffd\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f\ue000-\uf8ff]')
+
+# UTF-8 read as Latin-1/cp1252 (e.g. "Ã©", "â€™")
+MOJIBAKE_PATTERN = re.compile(r'[\u00c2\u00c3\u00e2][\u0080-\u00bf\u2018-\u203a\u20ac]')
+
+# A word is a whitespace token of letters only, once edge punctuation is trimmed
+WORD_PATTERN = re.compile(r'[A-Za-z]{2,}')
+TOKEN_EDGE_PUNCTUATION = "\"'()[]{}<>,.;:!?"
+DIGIT_PATTERN = re.compile(r'\d')
+
+# Letters and digits in Latin or Indic scripts are not symbols
+SYMBOL_PATTERN = re.compile(r'[^\sA-Za-z0-9\u0900-\u0dff]')
+INDIC_PATTERN = re.compile(r'[\u0900-\u0dff]')
+
+# Pages failing any of these are treated as garbage
+MAX_BAD_CHAR_RATIO = 0.02
+MAX_MOJIBAKE_RATIO = 0.01
+MIN_ALNUM_RATIO = 0.55
+MIN_DICTIONARY_WORD_RATIO = 0.12
+
+# A low dictionary share counts only with one of these (softer) signals:
+# symbols in tokens without digits, any bad / mojibake characters, or a
+# letter shift that makes this many times more words known (and enough)
+MAX_WORD_SYMBOL_RATIO = 0.08
+MIN_SHIFTED_GAIN = 3.0
+
+# Distinct words tried under each letter shift
+SHIFT_SAMPLE_WORDS = 60
+
+# Long pages are judged on a sample of this many characters
+QUALITY_SAMPLE_CHARS = 2000
+
+# Dictionary check is skipped for pages with fewer Latin words than this
+MIN_WORDS_FOR_DICTIONARY = 15
+
+# Common English function words plus vocabulary found in nearly every GST notice
+DICTIONARY_WORDS = frozenset("""
+a about above act acts after against all also am amount an and any appeal applicable are as at
+authority be been before being between both but by can case cause central cgst charged claim
+commissioner credit date dated day days demand department details did do does due during each
+either entity evidence fact facts for from goods government gst gstin had has have he hearing
+her here him his hereby however if igst in input interest into invoice invoices is issued it its
+law may mentioned more must no not notice of office officer on only or order other our out over
+paid party payable payment penalty per period person proceedings provided provisions reasons
+received reference registered registration reply return returns rule rules said same section
+sections sgst shall she should show so state statement such supplier supply tax taxable taxpayer
+than that the their them then there thereof these they this those through time to total under
+until upon utgst value vide was we were what when where whereas which while who why will with
+within without would year you your
+""".split())
+
+
+def _sample(text):
+    """Start and middle of the page, so a clean letterhead can't mask a broken body."""
+    if len(text) <= QUALITY_SAMPLE_CHARS:
+        return text
+    half = QUALITY_SAMPLE_CHARS // 2
+    middle = len(text) // 2
+    return text[:half] + "\n" + text[middle:middle + half]
+
+
+def _words(tokens):
+    """Letter-only tokens (codes, numbers and dates are not words)."""
+    words = []
+    for token in tokens:
+        token = token.strip(TOKEN_EDGE_PUNCTUATION)
+        if WORD_PATTERN.fullmatch(token):
+            words.append(token.lower())
+    return words
+
+
+def _dictionary_share(words):
+    return sum(1 for word in words if word in DICTIONARY_WORDS) / len(words)
+
+
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+SHIFT_TABLES = [
+    str.maketrans(_LETTERS, _LETTERS[offset:] + _LETTERS[:offset]) for offset in range(1, 26)
+]
+
+
+def _looks_shifted(words, dictionary_ratio):
+    """True if shifting every letter by one fixed offset turns the words into English."""
+    sample = list(dict.fromkeys(words))[:SHIFT_SAMPLE_WORDS]
+    joined = " ".join(sample)
+    best = max(
+        _dictionary_share(joined.translate(table).split()) for table in SHIFT_TABLES
+    )
+    return (
+        best >= MIN_DICTIONARY_WORD_RATIO
+        and best >= MIN_SHIFTED_GAIN * max(dictionary_ratio, 0.01)
+    )
+
+
+def _word_symbol_ratio(tokens):
+    """Symbol share of the tokens that carry no digits (where codes and amounts can't explain them)."""
+    plain = "".join(token for token in tokens if not DIGIT_PATTERN.search(token))
+    if not plain:
+        return 0.0
+    return len(SYMBOL_PATTERN.findall(plain)) / len(plain)
+
+
+def text_quality(text):
+    """
+    Score a page's text layer.
+
+    Returns:
+        dict: { ok, bad_char_ratio, mojibake_ratio, alnum_ratio,
+                dictionary_ratio, reason }  (dictionary_ratio is over
+                letter-only words; None when the check was skipped)
+    """
+    text = _sample(text)
+    visible = len("".join(text.split()))
+    if visible == 0:
+        return {
+            'ok': True,
+            'bad_char_ratio': 0.0,
+            'mojibake_ratio': 0.0,
+            'alnum_ratio': 0.0,
+            'dictionary_ratio': None,
+            'reason': None
+        }
+
+    bad_char_ratio = len(BAD_CHAR_PATTERN.findall(text)) / visible
+    mojibake_ratio = len(MOJIBAKE_PATTERN.findall(text)) / visible
+    alnum_ratio = 1.0 - len(SYMBOL_PATTERN.findall(text)) / visible
+
+    # Hindi / regional-language pages carry few Latin words, so only judge mostly-Latin pages
+    dictionary_ratio = None
+    tokens = text.split()
+    words = _words(tokens)
+    if len(words) >= MIN_WORDS_FOR_DICTIONARY and len(INDIC_PATTERN.findall(text)) < len(words):
+        dictionary_ratio = _dictionary_share(words)
+
+    if bad_char_ratio > MAX_BAD_CHAR_RATIO:
+        reason = 'replacement or control characters'
+    elif mojibake_ratio > MAX_MOJIBAKE_RATIO:
+        reason = 'mojibake'
+    elif alnum_ratio < MIN_ALNUM_RATIO:
+        reason = 'mostly symbols'
+    elif dictionary_ratio is not None and dictionary_ratio < MIN_DICTIONARY_WORD_RATIO and (
+        bad_char_ratio > 0
+        or mojibake_ratio > 0
+        or _word_symbol_ratio(tokens) > MAX_WORD_SYMBOL_RATIO
+        or _looks_shifted(words, dictionary_ratio)
+    ):
+        reason = 'few dictionary words'
+    else:
+        reason = None
+
+    return {
+        'ok': reason is None,
+        'bad_char_ratio': bad_char_ratio,
+        'mojibake_ratio': mojibake_ratio,
+        'alnum_ratio': alnum_ratio,
+        'dictionary_ratio': dictionary_ratio,
+        'reason': reason
+    }
+
+
+def is_garbled(text):
+    """True if the text looks like a broken text layer rather than real text."""
+    return not text_quality(text)['ok']
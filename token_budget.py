@@ -0,0 +1,113 @@
+from collections import namedtuple
+from functools import lru_cache
+
+# ---------------------------------------------------------
+# TOKEN COUNTING AND PROMPT BUDGETS
+# ---------------------------------------------------------
+# Every legal_agent prompt is measured before it is sent. If it is over its
+# stage budget, inputs are trimmed lowest priority first (never below their
+# floor), keeping the head and tail of each and marking the cut, so the same
+# inputs always produce the same prompt.
+
+# Prompt-token budget per legal_agent stage
+STAGE_TOKEN_BUDGETS = {
+    "summarize": 14000,
+    "summarize_section": 7000,
+    "summarize_merge": 12000,
+    "research": 8000,
+    "draft": 16000,
+    "draft_allegations": 8000,
+    "draft_part": 10000,
+}
+
+# Share of a trimmed input kept from its start (the rest comes from its end)
+TRIM_HEAD_SHARE = 0.7
+
+# Rough characters-per-token ratio used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+# One prompt input: lower priority is trimmed first; min_tokens is its floor
+PromptInput = namedtuple("PromptInput", ["name", "text", "priority", "min_tokens"])
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    # tiktoken is optional; its BPE file is fetched on first use, so load lazily
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of text within max_tokens, marking the cut."""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+
+    # Scale by this text's own chars-per-token ratio, then tighten if needed
+    keep_chars = int(len(text) * max_tokens / tokens)
+    while True:
+        head = int(keep_chars * TRIM_HEAD_SHARE)
+        tail = keep_chars - head
+        trimmed = (
+            text[:head]
+            + f"\n[... {tokens - max_tokens} tokens omitted to fit the prompt budget ...]\n"
+            + (text[-tail:] if tail else "")
+        )
+        if count_tokens(trimmed) <= max_tokens or keep_chars == 0:
+            return trimmed
+        keep_chars = int(keep_chars * 0.9)
+
+
+def fit_prompt(build_prompt, inputs, budget: int):
+    """
+    Build a prompt that fits in budget tokens.
+
+    Args:
+        build_prompt: Callable taking one keyword argument per input name
+        inputs: List of PromptInput
+        budget: Maximum prompt tokens
+
+    Returns:
+        tuple: (prompt, report) where report is
+               { prompt_tokens, budget, trimmed: {name: tokens_removed} }
+    """
+    texts = {item.name: item.text for item in inputs}
+    trimmed = {}
+
+    prompt = build_prompt(**texts)
+    prompt_tokens = count_tokens(prompt)
+
+    # Lowest priority first; among equals, later inputs go first
+    order = sorted(
+        enumerate(inputs), key=lambda pair: (pair[1].priority, -pair[0])
+    )
+    for _, item in order:
+        excess = prompt_tokens - budget
+        if excess <= 0:
+            break
+
+        current = count_tokens(texts[item.name])
+        target = max(item.min_tokens, current - excess)
+        if target >= current:
+            continue
+
+        texts[item.name] = trim_to_tokens(texts[item.name], target)
+        trimmed[item.name] = current - count_tokens(texts[item.name])
+        prompt = build_prompt(**texts)
+        prompt_tokens = count_tokens(prompt)
+
+    return prompt, {
+        "prompt_tokens": prompt_tokens,
+        "budget": budget,
+        "trimmed": trimmed,
+    }
@@ -1,5 +1,10 @@
+import uuid
 import streamlit as st
 from styles import create_status_indicator, create_step_badge
+from llm_cache import cache_stats
+from llm_scheduler import scheduler_stats
+from jobs import job_stats
+from pdf_utils import ExtractionMemo
 
 
 def render_sidebar_navigation():
@@ -64,6 +69,20 @@ def render_sidebar_navigation():
     with st.expander("⚙ Settings", expanded=False):
         st.markdown("**Theme**: Dark Mode (Professional)")
         st.markdown("**API**: OpenAI + Perplexity")
+        stats = cache_stats()
+        st.markdown(
+            f"**Response cache**: {stats['hits']} hits / {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%})"
+        )
+        for provider, queue in scheduler_stats().items():
+            st.markdown(
+                f"**{provider.title()} queue**: {queue['queue_depth']} waiting "
+                f"({queue['waiting_users']} users) · p95 wait {queue['wait_p95_seconds']:.1f}s"
+            )
+        jobs = job_stats()
+        st.markdown(
+            f"**Draft jobs**: {jobs['running']}/{jobs['workers']} running, {jobs['queued']} queued"
+        )
         st.markdown("**Version**: 1.0")
 
     st.markdown(
@@ -159,6 +178,58 @@ def render_status_badge(status, label):
     )
 
 
+def render_token_usage(result):
+    """
+    Render a one-line token usage caption for an LLM result (if it has one).
+    """
+    usage = getattr(result, "usage", None)
+    if not usage:
+        return
+
+    caption = (
+        f"🔢 Tokens: {usage.get('input_tokens', 0):,} in / "
+        f"{usage.get('output_tokens', 0):,} out"
+        f" · {usage.get('calls', 1)} call(s)"
+    )
+    if usage.get("cache_hits"):
+        caption += f" · {usage['cache_hits']} from cache"
+    if usage.get("local_issues"):
+        caption += f" · {usage['local_issues']} issue(s) from local case law"
+    if usage.get("trimmed"):
+        caption += " · trimmed to budget: " + ", ".join(usage["trimmed"])
+    st.caption(caption)
+
+
+JOB_STAGE_TITLES = {
+    "research": "### 🔍 Step 1/2: Researching Case Laws & Provisions",
+    "draft": "### 📝 Step 2/2: Drafting Legal Document",
+}
+
+
+def render_job_status(job, queue_position=0):
+    """
+    Render the state of a background research/draft job (see jobs).
+    """
+    if job.status == "queued":
+        st.info(
+            f"⏳ Waiting for a free drafting slot ({queue_position} job(s) ahead)..."
+            if queue_position else "⏳ Starting..."
+        )
+    elif job.status == "running":
+        st.markdown(JOB_STAGE_TITLES.get(job.stage, "### ⏳ Working..."))
+        st.progress(job.progress)
+        st.caption(
+            f"Running for {job.elapsed():.0f}s. You can switch tabs or close this page; "
+            "the draft keeps going and will be here when you come back."
+        )
+        if job.partial_draft:
+            st.markdown(job.partial_draft)
+    elif job.status == "failed":
+        st.error(f"❌ Draft generation failed: {job.error}")
+    elif job.status == "cancelled":
+        st.warning("Draft generation was cancelled.")
+
+
 def render_loading_message(step_name, substeps):
     """
     Enhanced loading indicator with step details.
@@ -229,6 +300,12 @@ def init_session_state():
         "current_step": 1,
         "steps_completed": set(),
         "ui_expand_states": {},
+        # Identifies this browser session to the LLM request scheduler
+        "session_id": uuid.uuid4().hex,
+        # Background research/draft job (see jobs); also kept in the page URL
+        "job_id": None,
+        # Extraction of the current upload, reused across reruns
+        "extraction_memo": ExtractionMemo(),
     }
 
     for key, value in defaults.items():